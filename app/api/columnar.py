@@ -0,0 +1,105 @@
+"""
+列式响应格式
+
+行式响应中每一行都重复 `"styles": {"字段": {"color": "#..."}}`，而实际出现的
+颜色只有少数几种。列式格式按列输出数据，并把颜色去重为调色板，单元格样式
+只保存调色板下标：
+
+    {
+        "columns": {"fund_code": ["161226", ...], "premium_rate": [4.84, ...]},
+        "palette": ["#ff0000", "#008000"],
+        "styles": {
+            "premium_rate": {"color": [0, 1, null, ...]},
+            "fund_name": {"color": null}        # 整列无颜色时直接为 null
+        }
+    }
+
+客户端可用 expand_columnar 还原为与 to_dict 一致的行式数据。
+"""
+
+from typing import Dict, List, Optional
+
+
+def to_columnar(model, items: list, fields=None) -> Dict:
+    """
+    将模型实例列表转换为列式结构
+
+    Args:
+        model: 数据模型类（需提供 DATA_FIELDS / STYLE_FIELDS 元数据）
+        items: 模型实例或按列查询的结果行
+        fields: 字段投影，None 表示全部字段（含 styles）
+    """
+    columns = {}
+    for name, attr, convert in model.DATA_FIELDS:
+        if fields is not None and name not in fields:
+            continue
+        if convert:
+            columns[name] = [convert(getattr(item, attr)) for item in items]
+        else:
+            columns[name] = [getattr(item, attr) for item in items]
+
+    palette: List[str] = []
+    palette_index: Dict[str, int] = {}
+
+    def lookup(color: Optional[str]) -> Optional[int]:
+        if color is None:
+            return None
+        index = palette_index.get(color)
+        if index is None:
+            index = palette_index[color] = len(palette)
+            palette.append(color)
+        return index
+
+    styles = {}
+    with_styles = fields is None or "styles" in fields
+    for name, props in model.STYLE_FIELDS:
+        if not with_styles or (fields is not None and name not in fields):
+            continue
+        field_styles = {}
+        for prop, attr in props:
+            indexes = [lookup(getattr(item, attr)) for item in items]
+            # 整列均无样式时压缩为 null
+            field_styles[prop] = indexes if any(i is not None for i in indexes) else None
+        styles[name] = field_styles
+
+    return {
+        "columns": columns,
+        "palette": palette,
+        # 未请求样式时为 null
+        "styles": styles if with_styles else None,
+    }
+
+
+def expand_columnar(data: Dict) -> List[Dict]:
+    """
+    将列式结构还原为行式数据（与 to_dict 输出一致）
+
+    Args:
+        data: to_columnar 的输出（或响应中的 data 字段）
+    """
+    columns = data["columns"]
+    palette = data["palette"]
+    styles = data["styles"]
+
+    names = list(columns)
+    count = len(columns[names[0]]) if names else 0
+
+    rows = []
+    for row_index in range(count):
+        row = {name: columns[name][row_index] for name in names}
+        if styles is None:
+            rows.append(row)
+            continue
+        row["styles"] = {
+            name: {
+                prop: (
+                    palette[indexes[row_index]]
+                    if indexes is not None and indexes[row_index] is not None
+                    else None
+                )
+                for prop, indexes in props.items()
+            }
+            for name, props in styles.items()
+        }
+        rows.append(row)
+    return rows
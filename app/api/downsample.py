@@ -0,0 +1,104 @@
+"""
+时间序列降采样
+
+LTTB (Largest-Triangle-Three-Buckets)：把 n 个点压缩为 threshold 个点，每个桶
+选出与相邻桶构成三角形面积最大的点，保留曲线的峰谷形状，适合图表展示。
+"""
+
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+EPOCH = datetime(1970, 1, 1)
+
+# 输出精度: 字段 -> 小数位
+SERIES_FIELDS = (("premium_rate", 3), ("price", 4), ("nav", 4))
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    LTTB 降采样
+
+    Args:
+        xs: 横坐标（单调递增，如时间戳）
+        ys: 纵坐标
+        threshold: 目标点数
+
+    Returns:
+        选中点的下标（递增，包含首尾）
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:threshold]
+
+    selected = [0]
+    # 除首尾外的点均分为 threshold - 2 个桶
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= n - 1:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        # 当前桶中与 (a, 下一桶平均点) 构成三角形面积最大的点
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        max_area = -1.0
+        chosen = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                chosen = j
+
+        selected.append(chosen)
+        a = chosen
+
+    selected.append(n - 1)
+    return selected
+
+
+def _round(value, digits: int):
+    return round(value, digits) if value is not None else None
+
+
+def to_series(points_list: Sequence, points: int) -> Dict[str, Dict]:
+    """
+    历史查询结果转为按数据集分组的列式序列，超过 points 个点时按溢价率做 LTTB 降采样
+
+    Args:
+        points_list: history.query_history 的结果（按 dataset、时间排序）
+        points: 每个数据集最多返回点数
+    """
+    grouped: Dict[str, List] = {}
+    for point in points_list:
+        grouped.setdefault(point.dataset, []).append(point)
+
+    series = {}
+    for dataset, items in grouped.items():
+        source_count = len(items)
+        if len(items) > points:
+            # 降采样时忽略溢价率为空的点
+            items = [point for point in items if point.premium_rate is not None]
+            xs = [(point.time - EPOCH).total_seconds() for point in items]
+            ys = [point.premium_rate for point in items]
+            items = [items[i] for i in lttb(xs, ys, points)]
+
+        data = {
+            "count": len(items),
+            "source_count": source_count,
+            "time": [point.time.isoformat() for point in items],
+        }
+        for name, digits in SERIES_FIELDS:
+            data[name] = [_round(getattr(point, name), digits) for point in items]
+        series[dataset] = data
+
+    return series
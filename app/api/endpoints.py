@@ -2,45 +2,239 @@
 API 接口定义
 """
 
-from datetime import datetime
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import json
+import math
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Union
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, or_, select
 
 from app.config import get_settings
-from app.database import get_db
-from app.models import LOFData, ScrapeLog, QDIIData, LOFIndexData
+from app.database import SessionLocal, get_db
+from app.models import LOFData, ScrapeLog, ScrapeJob, ScrapeRun, QDIIData, LOFIndexData, PremiumHistory, DATASET_MODELS
 from app.scheduler import get_scheduler
+from app.leader import get_leader_election
+from app.breaker import breaker_status
+from app.jobs import ACTIVE_STATUSES, last_scrape_times, parse_datasets, queue_summary, submit_job
+from app.tracing import current_traceparent
+from app.api.columnar import to_columnar
+from app.api.query import ListQuery, parse_fields, paginate, select_columns, order_clauses, build_sort_keys
+from app.snapshot import begin_snapshot_read, get_last_success_log
+from app.fund_index import get_fund_index
+from app.history import SECONDS_PER_DAY, query_history
+from app.api.downsample import to_series
+from app.push import Subscription, encode_event, get_push_broker
+from app.changes import covers, load_changes
+from app.auth import get_rate_limiter, get_token_registry
+from app.scrape_stats import dataset_rows, duration_trend, phase_breakdown, window_summary
+from app.profiling import list_profiles, profile_file
+from app.request_profiling import get_request_profiler
+from app.metrics import SERIALIZE_LATENCY
+from app.api.export import (
+    MEDIA_TYPES, export_filename, history_export_columns, select_export_columns, stream_export
+)
 
 router = APIRouter()
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 settings = get_settings()
 
+# 等待按需抓取完成时查询任务状态的间隔（秒）
+JOB_WAIT_POLL = 1.0
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """验证 API Token"""
-    if credentials.credentials != settings.api_token:
+# 批量查询最多基金数
+MAX_BATCH_FUNDS = 500
+
+# 历史查询默认时间范围（天）
+DEFAULT_HISTORY_DAYS = 30
+
+# resolution=raw 时最多返回的原始记录数
+MAX_RAW_HISTORY_POINTS = 5000
+
+# resolution=auto 时数据库聚合的桶数 = points * 该倍数，再做 LTTB 降采样
+AUTO_BUCKET_OVERSAMPLE = 4
+
+# 时间桶单位（秒）
+BUCKET_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# 抓取统计的默认时间窗口
+DEFAULT_STATS_WINDOWS = "1d,7d,30d"
+
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """验证 API Token，返回 Token 名称"""
+    name = get_token_registry().identify(credentials.credentials)
+    if name is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return name
+
+
+def verify_stream_token(
+    token: Optional[str] = Query(default=None, description="API Token（EventSource 无法设置请求头时使用）"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> str:
+    """验证推送接口 Token（支持 Authorization 头或 ?token= 参数），返回 Token 名称"""
+    name = get_token_registry().identify(credentials.credentials if credentials else token)
+    if name is None:
         raise HTTPException(status_code=401, detail="Invalid token")
-    return credentials.credentials
+    return name
+
+
+def check_rate_limit(token_name: str, endpoint_class: str):
+    """按 (Token, 接口类别) 限流，超限返回 429"""
+    retry_after = get_rate_limiter().acquire(token_name, endpoint_class)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+
+def query_access(token: str = Depends(verify_token)) -> str:
+    """认证 + 限流：读取数据库的接口"""
+    check_rate_limit(token, "query")
+    return token
+
+
+def lookup_access(token: str = Depends(verify_token)) -> str:
+    """认证 + 限流：内存基金索引查询"""
+    check_rate_limit(token, "lookup")
+    return token
+
+
+def export_access(token: str = Depends(verify_token)) -> str:
+    """认证 + 限流：流式导出"""
+    check_rate_limit(token, "export")
+    return token
+
 
+def stream_access(token: str = Depends(verify_stream_token)) -> str:
+    """认证 + 限流：推送连接"""
+    check_rate_limit(token, "stream")
+    return token
 
-def get_last_scrape_time(db: Session) -> Optional[datetime]:
-    """获取最后一次成功抓取的时间"""
-    log = db.query(ScrapeLog).filter(
-        ScrapeLog.status == "success"
-    ).order_by(desc(ScrapeLog.scrape_time)).first()
+
+def get_last_scrape_time(db: Session, dataset: Optional[str] = None) -> Optional[datetime]:
+    """获取（某个数据集）最后一次成功抓取的时间"""
+    query = db.query(ScrapeLog).filter(ScrapeLog.status == "success")
+    if dataset:
+        # 按数据集记录日志之前的日志 dataset 为空（全部数据集）
+        query = query.filter(or_(ScrapeLog.dataset == dataset, ScrapeLog.dataset.is_(None)))
+    log = query.order_by(desc(ScrapeLog.scrape_time)).first()
     
     return log.scrape_time if log else None
 
 
+def build_dataset_data(model, items: list, format: str = "rows",
+                       fields: Optional[tuple] = None) -> dict:
+    """序列化单个数据集（行式/列式，支持字段投影）"""
+    data = {"count": len(items)}
+    start = time.perf_counter()
+    
+    if format == "columnar":
+        data["format"] = "columnar"
+        data.update(to_columnar(model, items, fields))
+    else:
+        data["items"] = [model.serialize(item, fields) for item in items]
+    
+    SERIALIZE_LATENCY.labels(model.__tablename__, format).observe(time.perf_counter() - start)
+    return data
+
+
+def build_list_response(model, items: list, update_time: Optional[datetime],
+                        format: str = "rows", fields: Optional[tuple] = None,
+                        paginated: bool = False, next_cursor: Optional[str] = None) -> dict:
+    """构建列表接口的统一响应（支持行式/列式输出、字段投影、游标分页）"""
+    data = {
+        "update_time": update_time.isoformat() if update_time else None,
+    }
+    
+    if paginated:
+        data["next_cursor"] = next_cursor
+    
+    data.update(build_dataset_data(model, items, format, fields))
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": data
+    }
+
+
+def build_status_data(db: Session, last_success: Optional[ScrapeLog] = None) -> dict:
+    """服务状态数据（/status 与 /snapshot 共用）"""
+    # 获取最后一次抓取记录
+    last_log = db.query(ScrapeLog).order_by(
+        desc(ScrapeLog.scrape_time)
+    ).first()
+    
+    # 获取数据条数
+    record_count = db.query(LOFData).count()
+    
+    # 获取下次抓取时间
+    scheduler = get_scheduler()
+    next_scrape = scheduler.get_next_run_time()
+    leader = get_leader_election()
+    
+    if last_success is None:
+        last_success = get_last_success_log(db)
+    
+    # 各数据集独立调度：最近成功抓取与下一次抓取时间
+    next_due = scheduler.get_next_due()
+    datasets = {}
+    for name in DATASET_MODELS:
+        last_time = get_last_scrape_time(db, name)
+        datasets[name] = {
+            "last_update": last_time.isoformat() if last_time else None,
+            "next_scrape": next_due[name].isoformat() if name in next_due else None,
+        }
+    
+    # 执行中的抓取任务与实时进度（worker 定期保存）
+    running = db.query(ScrapeJob).filter(ScrapeJob.status == "running").order_by(ScrapeJob.id).first()
+    current_job = None
+    if running is not None:
+        current_job = {
+            "id": running.id,
+            "datasets": running.datasets.split(",") if running.datasets else None,
+            "worker": running.worker,
+            "started_at": running.started_at.isoformat() if running.started_at else None,
+            "progress": running.progress,
+        }
+    
+    return {
+        "last_update": last_log.scrape_time.isoformat() if last_log else None,
+        "last_status": last_log.status if last_log else None,
+        "last_error": last_log.error_message if last_log and last_log.status == "failed" else None,
+        "record_count": record_count,
+        "next_scrape": next_scrape.isoformat() if next_scrape else None,
+        "version": last_success.id if last_success else None,
+        "datasets": datasets,
+        "circuit_breaker": breaker_status(db),
+        "current_job": current_job,
+        "node": leader.node_id,
+        "scheduler_leader": leader.is_leader
+    }
+
+
 @router.get("/lof/list")
 def get_lof_list(
     min_premium: float = Query(default=None, description="最小溢价率(%)，默认使用配置值"),
     status: str = Query(default="all", description="申购状态: all/limited/open/suspended"),
+    format: str = Query(default="rows", pattern="^(rows|columnar)$", description="响应格式: rows/columnar"),
+    fields: Optional[str] = Query(default=None, description="字段投影，逗号分隔，如 fund_code,fund_name,premium_rate；包含 styles 时返回所选字段的样式"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000, description="每页条数（按排序规则的游标分页）"),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的 next_cursor"),
+    list_query: ListQuery = Depends(),
     db: Session = Depends(get_db),
-    token: str = Depends(verify_token)
+    token: str = Depends(query_access)
 ):
     """
     获取 LOF 溢价数据
@@ -52,118 +246,272 @@ def get_lof_list(
     if min_premium is None:
         min_premium = settings.default_min_premium
     
-    # 构建查询
-    query = db.query(LOFData).filter(LOFData.premium_rate >= min_premium)
+    selected = parse_fields(LOFData, fields)
+    sort_keys = list_query.sort_keys(LOFData)
+    
+    # 构建查询（只选出投影字段所需的列）
+    query = db.query(*select_columns(LOFData, selected, sort_keys))
+    query = query.filter(LOFData.premium_rate >= min_premium, *list_query.filters(LOFData))
     
     # 申购状态筛选
     if status != "all":
         query = query.filter(LOFData.apply_status == status)
     
-    # 按溢价率倒序排列
-    query = query.order_by(desc(LOFData.premium_rate))
-    
-    # 执行查询
-    items = query.all()
+    # 排序（默认溢价率倒序）并分页
+    items, next_cursor = paginate(query, sort_keys, limit, cursor)
     
     # 获取最后更新时间
-    update_time = get_last_scrape_time(db)
+    update_time = get_last_scrape_time(db, "lof")
     
-    return {
-        "code": 0,
-        "message": "success",
-        "data": {
-            "update_time": update_time.isoformat() if update_time else None,
-            "count": len(items),
-            "items": [item.to_dict() for item in items]
-        }
-    }
+    return build_list_response(
+        LOFData, items, update_time, format, selected,
+        paginated=bool(limit or cursor), next_cursor=next_cursor
+    )
 
 
 @router.get("/lof/all")
 def get_lof_all(
     status: str = Query(default="all", description="申购状态: all/limited/open/suspended"),
+    format: str = Query(default="rows", pattern="^(rows|columnar)$", description="响应格式: rows/columnar"),
+    fields: Optional[str] = Query(default=None, description="字段投影，逗号分隔，如 fund_code,fund_name,premium_rate；包含 styles 时返回所选字段的样式"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000, description="每页条数（按排序规则的游标分页）"),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的 next_cursor"),
+    list_query: ListQuery = Depends(),
     db: Session = Depends(get_db),
-    token: str = Depends(verify_token)
+    token: str = Depends(query_access)
 ):
     """
     获取全部 LOF 数据
     
-    - 不做溢价率筛选
-    - 按溢价率倒序排列
+    - 不做默认溢价率筛选
+    - 默认按溢价率倒序排列
     """
-    # 构建查询
-    query = db.query(LOFData)
+    selected = parse_fields(LOFData, fields)
+    sort_keys = list_query.sort_keys(LOFData)
+    
+    # 构建查询（只选出投影字段所需的列）
+    query = db.query(*select_columns(LOFData, selected, sort_keys))
+    query = query.filter(*list_query.filters(LOFData))
     
     # 申购状态筛选
     if status != "all":
         query = query.filter(LOFData.apply_status == status)
     
-    # 按溢价率倒序排列
-    query = query.order_by(desc(LOFData.premium_rate))
+    # 排序（默认溢价率倒序）并分页
+    items, next_cursor = paginate(query, sort_keys, limit, cursor)
     
-    # 执行查询
-    items = query.all()
+    # 获取最后更新时间
+    update_time = get_last_scrape_time(db, "lof")
+    
+    return build_list_response(
+        LOFData, items, update_time, format, selected,
+        paginated=bool(limit or cursor), next_cursor=next_cursor
+    )
+
+
+@router.get("/qdii/commodity")
+def get_qdii_commodity(
+    format: str = Query(default="rows", pattern="^(rows|columnar)$", description="响应格式: rows/columnar"),
+    fields: Optional[str] = Query(default=None, description="字段投影，逗号分隔，如 fund_code,fund_name,premium_rate；包含 styles 时返回所选字段的样式"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000, description="每页条数（按排序规则的游标分页）"),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的 next_cursor"),
+    list_query: ListQuery = Depends(),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """
+    获取 QDII 商品数据 (原始格式)
     
+    - 默认按实时溢价率倒序排列
+    """
     # 获取最后更新时间
-    update_time = get_last_scrape_time(db)
+    update_time = get_last_scrape_time(db, "qdii")
+    
+    selected = parse_fields(QDIIData, fields)
+    sort_keys = list_query.sort_keys(QDIIData)
+    
+    # 筛选、排序（默认溢价率倒序）并分页
+    query = db.query(*select_columns(QDIIData, selected, sort_keys))
+    query = query.filter(*list_query.filters(QDIIData))
+    items, next_cursor = paginate(query, sort_keys, limit, cursor)
+    
+    return build_list_response(
+        QDIIData, items, update_time, format, selected,
+        paginated=bool(limit or cursor), next_cursor=next_cursor
+    )
+
+
+@router.get("/lof/index")
+def get_lof_index(
+    format: str = Query(default="rows", pattern="^(rows|columnar)$", description="响应格式: rows/columnar"),
+    fields: Optional[str] = Query(default=None, description="字段投影，逗号分隔，如 fund_code,fund_name,premium_rate；包含 styles 时返回所选字段的样式"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000, description="每页条数（按排序规则的游标分页）"),
+    cursor: Optional[str] = Query(default=None, description="上一页返回的 next_cursor"),
+    list_query: ListQuery = Depends(),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """
+    获取指数 LOF 数据 (按溢价率倒序，原始格式)
+    """
+    # 获取最后更新时间
+    update_time = get_last_scrape_time(db, "lof_index")
+    
+    selected = parse_fields(LOFIndexData, fields)
+    sort_keys = list_query.sort_keys(LOFIndexData)
+    
+    # 筛选、排序（默认溢价率倒序）并分页
+    query = db.query(*select_columns(LOFIndexData, selected, sort_keys))
+    query = query.filter(*list_query.filters(LOFIndexData))
+    items, next_cursor = paginate(query, sort_keys, limit, cursor)
+    
+    return build_list_response(
+        LOFIndexData, items, update_time, format, selected,
+        paginated=bool(limit or cursor), next_cursor=next_cursor
+    )
+
+
+@router.get("/fund/{fund_code}")
+def get_fund(
+    fund_code: str,
+    token: str = Depends(lookup_access)
+):
+    """
+    查询单只基金（合并所有数据集中的数据）
+    
+    - 基于内存索引，不访问数据库
+    - datasets 中包含该基金出现的数据集: lof/qdii/lof_index
+    """
+    index = get_fund_index()
+    index.ensure_fresh()
+    
+    # 版本号与数据取自同一索引状态
+    version, update_time, entries, _ = index.state()
+    entry = entries.get(fund_code)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"基金不存在: {fund_code}")
     
     return {
         "code": 0,
         "message": "success",
         "data": {
-            "update_time": update_time.isoformat() if update_time else None,
-            "count": len(items),
-            "items": [item.to_dict() for item in items]
+            "version": version,
+            "update_time": update_time,
+            **entry
         }
     }
 
 
-@router.get("/qdii/commodity")
-def get_qdii_commodity(
+def parse_duration(value: str) -> int:
+    """解析 15m/1h/1d/1w 形式的时长（秒）"""
+    match = re.fullmatch(r"(\d+)([mhdw])", value.strip())
+    if not match or int(match.group(1)) <= 0:
+        raise HTTPException(status_code=400, detail=f"无效的时长: {value}（示例: 15m、1h、7d、1w）")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+
+def _to_local_naive(value: Union[datetime, date, None]) -> Optional[datetime]:
+    """日期转为当天零点；带时区的时间转为本地时间（历史表存储本地时间）"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+@router.get("/fund/{fund_code}/history")
+def get_fund_history(
+    fund_code: str,
+    start: Union[datetime, date, None] = Query(default=None, alias="from", description="开始时间，默认为 30 天前"),
+    end: Union[datetime, date, None] = Query(default=None, alias="to", description="结束时间，默认为当前时间"),
+    resolution: str = Query(default="auto", pattern=r"^(auto|raw|[1-9][0-9]*[mhdw])$",
+                            description="auto/raw 或时间桶宽度，如 15m/1h/1d/1w"),
+    points: int = Query(default=500, ge=10, le=2000, description="每个数据集最多返回点数"),
+    dataset: Optional[str] = Query(default=None, pattern="^(lof|qdii|lof_index)$", description="只返回指定数据集"),
     db: Session = Depends(get_db),
-    token: str = Depends(verify_token)
+    token: str = Depends(query_access)
 ):
     """
-    获取 QDII 商品数据 (原始格式)
+    查询单只基金的溢价率/价格/净值历史（图表用）
+    
+    - auto: 数据库按时间桶聚合（长范围使用日汇总）后再做 LTTB 降采样，点数与时间范围长度无关
+    - raw: 返回原始记录（最多 5000 条）
+    - 15m/1h/1d/1w: 按指定宽度的时间桶取平均（整天宽度使用日汇总），超过 points 时再做 LTTB 降采样
     """
-    # 获取最后更新时间
-    update_time = get_last_scrape_time(db)
+    end = _to_local_naive(end) or datetime.now()
+    start = _to_local_naive(start) or end - timedelta(days=DEFAULT_HISTORY_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from 必须早于 to")
     
-    # 获取所有 QDII 商品数据
-    items = db.query(QDIIData).all()
+    limit = None
+    if resolution == "raw":
+        bucket_seconds = 0
+        limit = MAX_RAW_HISTORY_POINTS + 1
+    elif resolution == "auto":
+        span = (end - start).total_seconds()
+        if span >= points * SECONDS_PER_DAY:
+            # 超过 points 天时日粒度已足够细，使用日汇总表
+            bucket_seconds = SECONDS_PER_DAY
+        else:
+            bucket_seconds = max(1, math.ceil(span / (points * AUTO_BUCKET_OVERSAMPLE)))
+    else:
+        bucket_seconds = parse_duration(resolution)
+    
+    rows = query_history(db, fund_code, start, end, bucket_seconds, dataset, limit)
+    if limit and len(rows) >= limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"原始记录超过 {MAX_RAW_HISTORY_POINTS} 条，请缩小时间范围或使用 resolution=auto"
+        )
     
     return {
         "code": 0,
         "message": "success",
         "data": {
-            "update_time": update_time.isoformat() if update_time else None,
-            "count": len(items),
-            "items": [item.to_dict() for item in items]
+            "fund_code": fund_code,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "resolution": resolution,
+            "bucket_seconds": bucket_seconds or None,
+            # raw 模式不降采样
+            "series": to_series(rows, points if bucket_seconds else MAX_RAW_HISTORY_POINTS)
         }
     }
 
 
-@router.get("/lof/index")
-def get_lof_index(
-    db: Session = Depends(get_db),
-    token: str = Depends(verify_token)
+@router.get("/funds")
+def get_funds(
+    codes: str = Query(..., description="基金代码，逗号分隔"),
+    token: str = Depends(lookup_access)
 ):
     """
-    获取指数 LOF 数据 (按溢价率倒序，原始格式)
+    批量查询基金（合并所有数据集中的数据）
+    
+    - items 为 基金代码 -> 数据，missing 为不存在的基金代码
     """
-    # 获取最后更新时间
-    update_time = get_last_scrape_time(db)
+    fund_codes = list(dict.fromkeys(code.strip() for code in codes.split(",") if code.strip()))
+    if not fund_codes:
+        raise HTTPException(status_code=400, detail="codes 不能为空")
+    if len(fund_codes) > MAX_BATCH_FUNDS:
+        raise HTTPException(status_code=400, detail=f"单次最多查询 {MAX_BATCH_FUNDS} 只基金")
+    
+    index = get_fund_index()
+    index.ensure_fresh()
     
-    # 获取所有指数 LOF 数据（已按溢价率倒序）
-    items = db.query(LOFIndexData).all()
+    version, update_time, entries, _ = index.state()
+    items = {code: entries[code] for code in fund_codes if code in entries}
     
     return {
         "code": 0,
         "message": "success",
         "data": {
-            "update_time": update_time.isoformat() if update_time else None,
+            "version": version,
+            "update_time": update_time,
             "count": len(items),
-            "items": [item.to_dict() for item in items]
+            "items": items,
+            "missing": [code for code in fund_codes if code not in items]
         }
     }
 
@@ -171,7 +519,7 @@ def get_lof_index(
 @router.get("/status")
 def get_status(
     db: Session = Depends(get_db),
-    token: str = Depends(verify_token)
+    token: str = Depends(query_access)
 ):
     """
     获取服务状态
@@ -181,42 +529,592 @@ def get_status(
     - 数据条数
     - 下次抓取时间
     """
-    # 获取最后一次抓取记录
-    last_log = db.query(ScrapeLog).order_by(
-        desc(ScrapeLog.scrape_time)
-    ).first()
+    return {
+        "code": 0,
+        "message": "success",
+        "data": build_status_data(db)
+    }
+
+
+@router.get("/jobs")
+def get_jobs(
+    status: Optional[str] = Query(default=None, pattern="^(queued|running|success|partial|skipped|failed|expired)$", description="按状态筛选"),
+    limit: int = Query(default=20, ge=1, le=100, description="返回记录数"),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """抓取任务队列：排队/执行中的任务数与最近的任务"""
+    query = db.query(ScrapeJob)
+    if status:
+        query = query.filter(ScrapeJob.status == status)
+    jobs = query.order_by(ScrapeJob.id.desc()).limit(limit).all()
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "queue": queue_summary(db),
+            "items": [job.to_dict() for job in jobs]
+        }
+    }
+
+
+@router.post("/jobs")
+async def create_job(
+    datasets: Optional[str] = Query(default=None, description="数据集范围，逗号分隔: lof/qdii/lof_index，默认全部"),
+    priority: int = Query(default=10, ge=-100, le=100, description="优先级，越大越先执行（定时任务为 0）"),
+    deadline_seconds: Optional[int] = Query(default=None, ge=10, le=86400, description="截止时间（秒后），默认 SCRAPE_JOB_DEADLINE"),
+    token: str = Depends(query_access)
+):
+    """提交抓取任务（由 worker 执行，与 /scrape 相同的合并与最小间隔规则）"""
+    try:
+        names = parse_datasets(datasets)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    deadline = datetime.now() + timedelta(seconds=deadline_seconds) if deadline_seconds else None
+    result = await run_in_threadpool(submit_scrape, names, priority, deadline)
+    check_scrape_interval(result)
+    return {
+        "code": 0,
+        "message": "success",
+        "data": result["job"]
+    }
+
+
+def submit_scrape(names: Optional[List[str]], priority: int = 10,
+                  deadline: Optional[datetime] = None) -> dict:
+    """按需抓取：跳过最小间隔内抓取过的数据集，其余单飞提交（在线程池中执行）"""
+    min_interval = timedelta(seconds=settings.scrape_trigger_min_interval)
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        times = last_scrape_times(db, names)
+        fresh = [name for name, last in times.items() if last and now - last < min_interval]
+        remaining = [name for name in times if name not in fresh]
+        if not remaining:
+            retry_after = min((times[name] + min_interval - now).total_seconds() for name in fresh)
+            return {"skipped": fresh, "retry_after": retry_after}
+        
+        job, coalesced = submit_job(
+            db, datasets=parse_datasets(",".join(remaining)), priority=priority, deadline=deadline,
+            source="api", traceparent=current_traceparent(),
+        )
+        return {"job": job.to_dict(), "coalesced": coalesced, "skipped": fresh}
+    finally:
+        db.close()
+
+
+def check_scrape_interval(result: dict):
+    """所需数据集都在最小间隔内抓取过时返回 429"""
+    if "job" not in result:
+        raise HTTPException(
+            status_code=429,
+            detail=f"数据集 {','.join(result['skipped'])} 在 {settings.scrape_trigger_min_interval} 秒内已抓取",
+            headers={"Retry-After": str(math.ceil(result["retry_after"]))}
+        )
+
+
+def load_job(job_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = db.get(ScrapeJob, job_id)
+        return job.to_dict() if job else None
+    finally:
+        db.close()
+
+
+@router.post("/scrape")
+async def trigger_scrape(
+    datasets: Optional[str] = Query(default=None, description="数据集范围，逗号分隔: lof/qdii/lof_index，默认全部"),
+    wait: float = Query(default=0, ge=0, le=600, description="等待抓取完成的最长秒数，0 表示提交后立即返回"),
+    token: str = Depends(query_access)
+):
+    """
+    立即抓取（按需刷新）
     
-    # 获取数据条数
-    record_count = db.query(LOFData).count()
+    - 已有排队或执行中的任务覆盖所需数据集时复用该任务，有排队任务时合并到其中
+    - SCRAPE_TRIGGER_MIN_INTERVAL 秒内抓取过的数据集跳过；全部跳过时返回 429
+    - wait > 0 时等待任务结束（或超时）后返回
+    """
+    try:
+        names = parse_datasets(datasets)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # 获取下次抓取时间
+    result = await run_in_threadpool(submit_scrape, names)
+    check_scrape_interval(result)
+    
+    job = result["job"]
+    deadline = time.monotonic() + wait
+    while job["status"] in ACTIVE_STATUSES and time.monotonic() < deadline:
+        await asyncio.sleep(min(JOB_WAIT_POLL, max(0.0, deadline - time.monotonic())))
+        job = await run_in_threadpool(load_job, job["id"]) or job
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "job": job,
+            "coalesced": result["coalesced"],
+            "skipped": result["skipped"],
+            "done": job["status"] not in ACTIVE_STATUSES
+        }
+    }
+
+
+@router.get("/snapshot")
+def get_snapshot(
+    datasets: str = Query(default="lof,qdii,lof_index", description="返回的数据集，逗号分隔: lof/qdii/lof_index"),
+    format: str = Query(default="rows", pattern="^(rows|columnar)$", description="响应格式: rows/columnar"),
+    lof_fields: Optional[str] = Query(default=None, description="lof 数据集字段投影"),
+    qdii_fields: Optional[str] = Query(default=None, description="qdii 数据集字段投影"),
+    lof_index_fields: Optional[str] = Query(default=None, description="lof_index 数据集字段投影"),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """
+    获取组合快照（一次请求返回所有数据集与服务状态）
+    
+    - 所有数据在同一个 REPEATABLE READ 事务中读取，对应同一快照版本
+    - 各数据集按溢价率倒序排列，可分别做字段投影
+    """
+    names = [name.strip() for name in datasets.split(",") if name.strip()]
+    unknown = [name for name in names if name not in DATASET_MODELS]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"未知数据集: {','.join(unknown)}")
+    
+    projections = {
+        "lof": lof_fields,
+        "qdii": qdii_fields,
+        "lof_index": lof_index_fields,
+    }
+    
+    # 单事务读取，保证数据集与状态来自同一快照
+    begin_snapshot_read(db)
+    
+    last_success = get_last_success_log(db)
+    
+    data = {
+        "version": last_success.id if last_success else None,
+        "update_time": last_success.scrape_time.isoformat() if last_success else None,
+        "status": build_status_data(db, last_success),
+        "datasets": {}
+    }
+    
+    for name in dict.fromkeys(names):
+        model = DATASET_MODELS[name]
+        selected = parse_fields(model, projections[name])
+        sort_keys = build_sort_keys(model)
+        
+        items = db.query(*select_columns(model, selected, sort_keys)).order_by(
+            *order_clauses(sort_keys)
+        ).all()
+        data["datasets"][name] = build_dataset_data(model, items, format, selected)
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": data
+    }
+
+
+def build_export_response(name: str, format: str, columns: list, statement) -> StreamingResponse:
+    """构建流式导出响应"""
+    filename = export_filename(name, format)
+    return StreamingResponse(
+        stream_export(format, columns, statement),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/export/history")
+def export_history(
+    format: str = Query(default="csv", pattern="^(csv|parquet)$", description="导出格式: csv/parquet"),
+    fund_code: Optional[str] = Query(default=None, description="基金代码，逗号分隔，默认全部基金"),
+    dataset: Optional[str] = Query(default=None, pattern="^(lof|qdii|lof_index)$", description="只导出指定数据集"),
+    start: Union[datetime, date, None] = Query(default=None, alias="from", description="开始时间，默认为 30 天前"),
+    end: Union[datetime, date, None] = Query(default=None, alias="to", description="结束时间，默认为当前时间"),
+    token: str = Depends(export_access)
+):
+    """
+    导出溢价率历史（流式 CSV/Parquet，按时间排序）
+    """
+    end = _to_local_naive(end) or datetime.now()
+    start = _to_local_naive(start) or end - timedelta(days=DEFAULT_HISTORY_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from 必须早于 to")
+    
+    columns = history_export_columns()
+    statement = select(*[column.label(name) for name, column in columns]).where(
+        PremiumHistory.recorded_at >= start,
+        PremiumHistory.recorded_at <= end
+    )
+    if fund_code:
+        codes = list(dict.fromkeys(code.strip() for code in fund_code.split(",") if code.strip()))
+        statement = statement.where(PremiumHistory.fund_code.in_(codes))
+    if dataset:
+        statement = statement.where(PremiumHistory.dataset == dataset)
+    statement = statement.order_by(PremiumHistory.recorded_at, PremiumHistory.dataset, PremiumHistory.fund_code)
+    
+    return build_export_response("history", format, columns, statement)
+
+
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: str = Path(pattern="^(lof|qdii|lof_index)$", description="数据集: lof/qdii/lof_index"),
+    format: str = Query(default="csv", pattern="^(csv|parquet)$", description="导出格式: csv/parquet"),
+    fields: Optional[str] = Query(default=None, description="导出字段，逗号分隔，默认全部"),
+    list_query: ListQuery = Depends(),
+    token: str = Depends(export_access)
+):
+    """
+    导出当前快照（流式 CSV/Parquet）
+    
+    - 支持与列表接口相同的筛选/排序参数
+    - 导出数据库中的原始列值，QDII/指数 LOF 额外包含解析后的数值列
+    """
+    model = DATASET_MODELS[dataset]
+    columns = select_export_columns(model, fields)
+    statement = select(*[column.label(name) for name, column in columns]).where(
+        *list_query.filters(model)
+    ).order_by(*order_clauses(list_query.sort_keys(model)))
+    
+    return build_export_response(dataset, format, columns, statement)
+
+
+@router.get("/changes")
+def get_changes(
+    dataset: str = Query(..., pattern="^(lof|qdii|lof_index)$", description="数据集: lof/qdii/lof_index"),
+    since_version: Optional[int] = Query(default=None, description="客户端当前的快照版本，不传则返回全量数据"),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """
+    增量同步：返回 since_version 之后新增/变化/删除的行
+    
+    - 基于发布快照时保存的差异，不对比整表
+    - since_version 过旧（差异已清理）或未传时返回全量数据（full=true）
+    """
+    # 版本号与数据在同一事务中读取
+    begin_snapshot_read(db)
+    last_success = get_last_success_log(db)
+    version = last_success.id if last_success else None
+    
+    data = {
+        "dataset": dataset,
+        "version": version,
+        "since_version": since_version,
+        "update_time": last_success.scrape_time.isoformat() if last_success else None,
+    }
+    
+    if version is not None and since_version is not None and since_version >= version:
+        # 客户端已是最新
+        data.update({"full": False, "upserts": [], "removed": []})
+    elif since_version is not None and since_version > 0 and covers(db, since_version):
+        upserts, removed = load_changes(db, dataset, since_version)
+        data.update({"full": False, "upserts": upserts, "removed": removed})
+    else:
+        model = DATASET_MODELS[dataset]
+        sort_keys = build_sort_keys(model)
+        items = db.query(*select_columns(model, None, sort_keys)).order_by(
+            *order_clauses(sort_keys)
+        ).all()
+        data.update({"full": True, "items": [model.serialize(item) for item in items]})
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": data
+    }
+
+
+def build_subscription(datasets, premium_min: Optional[float] = None, fund_codes=None) -> Subscription:
+    """
+    校验订阅参数
+    datasets / fund_codes 可为逗号分隔字符串或列表
+    """
+    if isinstance(datasets, str):
+        datasets = datasets.split(",")
+    if isinstance(fund_codes, str):
+        fund_codes = fund_codes.split(",")
+    
+    names = tuple(dict.fromkeys(str(name).strip() for name in datasets or () if str(name).strip()))
+    unknown = [name for name in names if name not in DATASET_MODELS]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"未知数据集: {','.join(unknown)}")
+    
+    codes = frozenset(str(code).strip() for code in fund_codes or () if str(code).strip())
+    return Subscription(
+        datasets=names,
+        premium_min=float(premium_min) if premium_min is not None else None,
+        fund_codes=codes or None
+    )
+
+
+def hello_event(subscription: Subscription):
+    """订阅成功事件"""
+    return encode_event("hello", {
+        "type": "hello",
+        "version": get_fund_index().version,
+        "datasets": list(subscription.datasets),
+    })
+
+
+@router.get("/stream")
+async def stream_changes(
+    datasets: str = Query(default="lof,qdii,lof_index", description="订阅的数据集，逗号分隔"),
+    premium_min: Optional[float] = Query(default=None, description="只推送溢价率达到该值(%)的基金（变化前后任一满足）"),
+    fund_codes: Optional[str] = Query(default=None, description="只推送指定基金，逗号分隔"),
+    snapshot: bool = Query(default=False, description="订阅后先推送当前快照中的全部匹配行"),
+    token: str = Depends(stream_access)
+):
+    """
+    快照变更推送（Server-Sent Events）
+    
+    - 每次发布新快照时推送 diff 事件，只包含新增/变化的行与被删除的基金代码
+    - 消费过慢时推送 resync 事件，客户端应重新拉取 /api/snapshot
+    """
+    subscription = build_subscription(datasets, premium_min, fund_codes)
+    broker = get_push_broker()
+    heartbeat = settings.push_heartbeat_interval
+    
+    await run_in_threadpool(get_fund_index().ensure_fresh)
+    
+    async def events():
+        broker.subscribe(subscription)
+        try:
+            yield hello_event(subscription).sse()
+            if snapshot:
+                yield broker.snapshot_event(subscription).sse()
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # 心跳（注释行），防止代理断开空闲连接
+                    yield ": ping\n\n"
+                    continue
+                yield message.sse()
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def websocket_changes(websocket: WebSocket, token: Optional[str] = Query(default=None)):
+    """
+    快照变更推送（WebSocket）
+    
+    连接: /api/ws?token=<TOKEN>
+    客户端发送订阅消息（可重复发送以修改订阅）:
+        {"action": "subscribe", "datasets": ["lof"], "premium_min": 3, "fund_codes": ["161226"], "snapshot": true}
+    服务端推送的消息与 /api/stream 的 data 部分相同（hello/snapshot/diff/resync/error）
+    """
+    token_name = get_token_registry().identify(token)
+    if token_name is None or get_rate_limiter().acquire(token_name, "stream"):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    
+    broker = get_push_broker()
+    subscription: Optional[Subscription] = None
+    receiver = asyncio.ensure_future(websocket.receive_text())
+    getter = None
+    try:
+        while True:
+            waiting = {receiver} | ({getter} if getter else set())
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            
+            if getter in done:
+                await websocket.send_text(getter.result().data)
+                getter = asyncio.ensure_future(subscription.queue.get())
+            
+            if receiver in done:
+                try:
+                    request = json.loads(receiver.result())
+                    if request.get("action") != "subscribe":
+                        raise HTTPException(status_code=400, detail="未知操作")
+                    new_subscription = build_subscription(
+                        request.get("datasets") or list(DATASET_MODELS),
+                        request.get("premium_min"),
+                        request.get("fund_codes")
+                    )
+                except (ValueError, TypeError, AttributeError, HTTPException) as e:
+                    detail = e.detail if isinstance(e, HTTPException) else "无效的订阅消息"
+                    await websocket.send_text(encode_event("error", {"type": "error", "message": detail}).data)
+                else:
+                    # 替换订阅
+                    if subscription is not None:
+                        broker.unsubscribe(subscription)
+                        getter.cancel()
+                    subscription = new_subscription
+                    await run_in_threadpool(get_fund_index().ensure_fresh)
+                    broker.subscribe(subscription)
+                    await websocket.send_text(hello_event(subscription).data)
+                    if request.get("snapshot"):
+                        await websocket.send_text(broker.snapshot_event(subscription).data)
+                    getter = asyncio.ensure_future(subscription.queue.get())
+                receiver = asyncio.ensure_future(websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if getter:
+            getter.cancel()
+        if subscription is not None:
+            broker.unsubscribe(subscription)
+
+
+@router.get("/logs/stats")
+def get_logs_stats(
+    windows: str = Query(default=DEFAULT_STATS_WINDOWS, description="统计窗口，逗号分隔，如 1d,7d,30d"),
+    trend: Optional[str] = Query(default=None, pattern=r"^\d+[hdw]$", description="趋势时间桶（如 1d），覆盖最大窗口"),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """
+    抓取性能统计
+    
+    - 每个窗口: 运行次数、成功率、耗时 p50/p95/p99、每次记录数、各阶段耗时与占比、各数据集记录数
+    - trend: 最大窗口内按时间桶的耗时分位数与成功率
+    """
+    names = list(dict.fromkeys(w.strip() for w in windows.split(",") if w.strip()))
+    if not names or len(names) > 5:
+        raise HTTPException(status_code=400, detail="windows 需为 1~5 个时长")
+    spans = {name: parse_duration(name) for name in names}
+    
+    now = datetime.now()
+    data = {"generated_at": now.isoformat(), "windows": {}}
+    for name, seconds in spans.items():
+        since = now - timedelta(seconds=seconds)
+        data["windows"][name] = {
+            **window_summary(db, since),
+            "phases": phase_breakdown(db, since),
+            "datasets": dataset_rows(db, since),
+        }
+    
+    if trend:
+        bucket_seconds = parse_duration(trend)
+        since = now - timedelta(seconds=max(spans.values()))
+        data["trend"] = {"bucket": trend, "items": duration_trend(db, since, bucket_seconds)}
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": data
+    }
+
+
+@router.get("/profiles")
+def get_profiles(token: str = Depends(query_access)):
+    """
+    最近的抓取性能分析结果
+    
+    - SCRAPE_PROFILE=true 时每次抓取都分析，或 POST /api/profiles/next 只分析下一次
+    """
     scheduler = get_scheduler()
-    next_scrape = scheduler.get_next_run_time()
+    items = list_profiles()
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "enabled": settings.scrape_profile,
+            "profile_next": scheduler.profile_next,
+            "count": len(items),
+            "items": items
+        }
+    }
+
+
+@router.post("/profiles/next")
+def profile_next_scrape(token: str = Depends(query_access)):
+    """对下一次抓取做性能分析"""
+    scheduler = get_scheduler()
+    scheduler.profile_next = True
+    next_run = scheduler.get_next_run_time()
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "profile_next": True,
+            "next_run": next_run.isoformat() if next_run else None
+        }
+    }
+
+
+@router.get("/profiles/requests")
+def get_request_profile(token: str = Depends(query_access)):
+    """
+    API 请求采样分析的聚合结果
     
+    - 需开启 REQUEST_PROFILE_RATE 或 REQUEST_PROFILE_SLOW_MS
+    - top_functions: 按栈顶样本数排序的热点函数；火焰图用 /profiles/requests/flame
+    """
+    profiler = get_request_profiler()
     return {
         "code": 0,
         "message": "success",
         "data": {
-            "last_update": last_log.scrape_time.isoformat() if last_log else None,
-            "last_status": last_log.status if last_log else None,
-            "last_error": last_log.error_message if last_log and last_log.status == "failed" else None,
-            "record_count": record_count,
-            "next_scrape": next_scrape.isoformat() if next_scrape else None
+            "enabled": profiler is not None,
+            **(profiler.summary() if profiler is not None else {})
         }
     }
 
 
+@router.get("/profiles/requests/flame")
+def download_request_flame(token: str = Depends(query_access)):
+    """folded 格式调用栈（flamegraph.pl / speedscope 可直接打开）"""
+    profiler = get_request_profiler()
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="请求采样分析未开启")
+    return Response(
+        profiler.folded(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="api_requests.folded"'}
+    )
+
+
+@router.delete("/profiles/requests")
+def reset_request_profile(token: str = Depends(query_access)):
+    """清空请求采样分析的聚合结果（对比优化前后时使用）"""
+    profiler = get_request_profiler()
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="请求采样分析未开启")
+    profiler.reset()
+    return {"code": 0, "message": "success", "data": {"reset": True}}
+
+
+@router.get("/profiles/{filename}")
+def download_profile(filename: str, token: str = Depends(export_access)):
+    """下载分析结果（.prof 为 pstats 格式，.txt 为文本摘要）"""
+    path = profile_file(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"分析结果不存在: {filename}")
+    media_type = "text/plain; charset=utf-8" if path.suffix == ".txt" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
+
 @router.get("/logs")
 def get_logs(
     limit: int = Query(default=10, le=50, description="返回记录数"),
+    dataset: Optional[str] = Query(default=None, description="只返回该数据集的日志: lof/qdii/lof_index"),
     db: Session = Depends(get_db),
-    token: str = Depends(verify_token)
+    token: str = Depends(query_access)
 ):
     """
-    获取抓取日志
+    获取抓取日志（每次抓取每个数据集一条）
     """
-    logs = db.query(ScrapeLog).order_by(
-        desc(ScrapeLog.scrape_time)
+    query = db.query(ScrapeLog)
+    if dataset:
+        if dataset not in DATASET_MODELS:
+            raise HTTPException(status_code=400, detail=f"未知数据集: {dataset}")
+        query = query.filter(ScrapeLog.dataset == dataset)
+    logs = query.order_by(
+        desc(ScrapeLog.scrape_time), desc(ScrapeLog.id)
     ).limit(limit).all()
     
     return {
@@ -227,3 +1125,24 @@ def get_logs(
             "items": [log.to_dict() for log in logs]
         }
     }
+
+
+@router.get("/logs/runs")
+def get_scrape_runs(
+    limit: int = Query(default=10, le=50, description="返回记录数"),
+    db: Session = Depends(get_db),
+    token: str = Depends(query_access)
+):
+    """
+    获取抓取运行记录（每次抓取一条，含公共阶段耗时；各数据集的日志通过 run_id 关联）
+    """
+    runs = db.query(ScrapeRun).order_by(desc(ScrapeRun.id)).limit(limit).all()
+    
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "count": len(runs),
+            "items": [run.to_dict() for run in runs]
+        }
+    }
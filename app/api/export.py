@@ -0,0 +1,190 @@
+"""
+数据导出（CSV / Parquet 流式输出）
+
+查询通过服务端游标（yield_per）分批读取，每批编码后立即发送，内存占用与导出
+行数无关：
+- CSV: UTF-8 带 BOM（Excel 直接打开不乱码）
+- Parquet: 每批写为一个 row group，zstd 压缩，可直接用 pandas.read_parquet 读取
+
+Parquet 依赖 pyarrow，仅在导出 Parquet 时导入。
+"""
+
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.types import BigInteger, Date, DateTime, Integer, Numeric
+
+from app.database import SessionLocal
+from app.models import PremiumHistory
+
+# 每批读取/发送的行数（Parquet 的 row group 大小）
+EXPORT_BATCH_ROWS = 5000
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_columns(model) -> List[Tuple[str, object]]:
+    """
+    导出列: 输出字段 + 查询用的数值列（如 QDII 的 premium_rate_value）
+    导出原始列值，不做 to_dict 中的展示转换
+    """
+    columns = [(name, getattr(model, attr)) for name, attr, _ in model.DATA_FIELDS]
+    names = {name for name, _ in columns}
+    for attr in model.QUERY_COLUMNS.values():
+        if attr not in names:
+            columns.append((attr, getattr(model, attr)))
+            names.add(attr)
+    return columns
+
+
+def select_export_columns(model, fields: Optional[str]) -> List[Tuple[str, object]]:
+    """按 ?fields= 选择导出列"""
+    columns = export_columns(model)
+    if not fields:
+        return columns
+
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    available = dict(columns)
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"未知字段: {','.join(unknown)}")
+    return [(name, available[name]) for name in names]
+
+
+def iter_batches(statement) -> Iterator[Sequence]:
+    """
+    以服务端游标分批执行查询
+    使用独立会话：StreamingResponse 发送期间依赖注入的会话已关闭
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(names: Sequence[str], batches: Iterator[Sequence]) -> Iterator[bytes]:
+    """CSV 流"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """ParquetWriter 的输出目标：缓存写入的字节，由生成器逐块取走"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _arrow_type(pa, column):
+    """SQLAlchemy 列类型 -> Arrow 类型（数值统一为 float64，便于 pandas 使用）"""
+    column_type = column.type
+    if isinstance(column_type, Numeric):
+        return pa.float64()
+    if isinstance(column_type, (Integer, BigInteger)):
+        return pa.int64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def stream_parquet(columns: Sequence[Tuple[str, object]],
+                   batches: Iterator[Sequence]) -> Iterator[bytes]:
+    """Parquet 流（每批一个 row group）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(status_code=501, detail="服务未安装 pyarrow，无法导出 Parquet")
+
+    schema = pa.schema([(name, _arrow_type(pa, column)) for name, column in columns])
+    numeric = [isinstance(column.type, Numeric) for _, column in columns]
+
+    def generate():
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        try:
+            for batch in batches:
+                arrays = []
+                for index, field in enumerate(schema):
+                    values = [row[index] for row in batch]
+                    if numeric[index]:
+                        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+                    arrays.append(pa.array(values, type=field.type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def history_export_columns() -> List[Tuple[str, object]]:
+    """历史导出列"""
+    return [
+        (name, getattr(PremiumHistory, name))
+        for name in ("recorded_at", "version", "dataset", "fund_code", "premium_rate", "price", "nav")
+    ]
+
+
+def export_filename(name: str, format: str) -> str:
+    """导出文件名，如 lof_20260201_1930.csv"""
+    return f"{name}_{datetime.now().strftime('%Y%m%d_%H%M')}.{format}"
+
+
+def stream_export(format: str, columns: Sequence[Tuple[str, object]], statement) -> Iterator[bytes]:
+    """按格式生成导出流"""
+    batches = iter_batches(statement)
+    if format == "parquet":
+        return stream_parquet(columns, batches)
+    return stream_csv([name for name, _ in columns], batches)
@@ -0,0 +1,271 @@
+"""
+列表查询辅助：字段投影、筛选/排序 DSL 与游标（keyset）分页
+
+筛选/排序参数在各数据集间通用，按模型的 QUERY_COLUMNS 映射编译为 SQL：
+
+    premium_min / premium_max        溢价率范围(%)
+    volume_min / volume_max          成交额范围(万元)
+    change_pct_min / change_pct_max  涨跌幅范围(%)
+    fund_company                     基金公司，逗号分隔表示任一匹配
+    tag                              基金标签，逗号分隔表示全部包含（仅 LOF 套利）
+    sort                             排序字段，逗号分隔，前缀 - 表示倒序，如 -premium,fund_code
+"""
+
+import base64
+import json
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, or_, false, func
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Integer, Numeric, Text
+
+# 游标分页默认每页条数
+DEFAULT_PAGE_SIZE = 100
+
+# 支持范围筛选的数值字段
+RANGE_FIELDS = ("premium", "volume", "change_pct")
+
+# 支持排序的字段
+SORT_FIELDS = ("premium", "volume", "change_pct", "fund_code", "fund_company")
+
+# 默认排序：溢价率倒序
+DEFAULT_SORT = (("premium", True),)
+
+# 最多排序字段数
+MAX_SORT_FIELDS = 4
+
+
+def parse_fields(model, fields: Optional[str]) -> Optional[tuple]:
+    """
+    解析 ?fields= 参数（逗号分隔）
+    返回 None 表示全部字段；可包含 "styles" 以附带所选字段的样式
+    """
+    if not fields:
+        return None
+
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    allowed = set(model.field_names()) | {"styles"}
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知字段: {','.join(unknown)}")
+    if not names or names == ("styles",):
+        raise HTTPException(status_code=400, detail="fields 至少需要一个数据字段")
+    return names
+
+
+def _split(value: Optional[str]) -> tuple:
+    """逗号分隔参数转元组（去重、去空）"""
+    if not value:
+        return ()
+    return tuple(dict.fromkeys(v.strip() for v in value.split(",") if v.strip()))
+
+
+class ListQuery:
+    """
+    列表筛选/排序参数（作为 FastAPI 依赖使用）
+    参数在构造时完成校验，非法参数返回 400
+    """
+    
+    def __init__(
+        self,
+        premium_min: Optional[float] = Query(default=None, description="最小溢价率(%)"),
+        premium_max: Optional[float] = Query(default=None, description="最大溢价率(%)"),
+        volume_min: Optional[float] = Query(default=None, description="最小成交额(万元)"),
+        volume_max: Optional[float] = Query(default=None, description="最大成交额(万元)"),
+        change_pct_min: Optional[float] = Query(default=None, description="最小涨跌幅(%)"),
+        change_pct_max: Optional[float] = Query(default=None, description="最大涨跌幅(%)"),
+        fund_company: Optional[str] = Query(default=None, description="基金公司，逗号分隔表示任一匹配"),
+        tag: Optional[str] = Query(default=None, description="基金标签，逗号分隔表示全部包含（仅 LOF 套利数据）"),
+        sort: Optional[str] = Query(default=None, description="排序字段，逗号分隔，- 前缀表示倒序，默认 -premium"),
+    ):
+        self.ranges = {}
+        for name, low, high in (
+            ("premium", premium_min, premium_max),
+            ("volume", volume_min, volume_max),
+            ("change_pct", change_pct_min, change_pct_max),
+        ):
+            if low is not None and high is not None and low > high:
+                raise HTTPException(status_code=400, detail=f"{name}_min 不能大于 {name}_max")
+            if low is not None or high is not None:
+                self.ranges[name] = (low, high)
+        
+        self.fund_companies = _split(fund_company)
+        self.tags = _split(tag)
+        self.sort = self._parse_sort(sort)
+    
+    @staticmethod
+    def _parse_sort(sort: Optional[str]) -> tuple:
+        """解析排序参数，如 -premium,fund_code"""
+        items = _split(sort)
+        if not items:
+            return DEFAULT_SORT
+        if len(items) > MAX_SORT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"排序字段最多 {MAX_SORT_FIELDS} 个")
+        
+        keys = []
+        seen = set()
+        for item in items:
+            desc = item.startswith("-")
+            name = item.lstrip("-+")
+            if name not in SORT_FIELDS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"不支持的排序字段: {name}，可选: {','.join(SORT_FIELDS)}"
+                )
+            if name in seen:
+                raise HTTPException(status_code=400, detail=f"排序字段重复: {name}")
+            seen.add(name)
+            keys.append((name, desc))
+        return tuple(keys)
+    
+    def filters(self, model) -> list:
+        """编译为 SQL 筛选条件（直接比较数值列，可走索引）"""
+        conditions = []
+        for name, (low, high) in self.ranges.items():
+            column = getattr(model, model.QUERY_COLUMNS[name])
+            if low is not None:
+                conditions.append(column >= low)
+            if high is not None:
+                conditions.append(column <= high)
+        
+        if self.fund_companies:
+            column = getattr(model, model.QUERY_COLUMNS["fund_company"])
+            if len(self.fund_companies) == 1:
+                conditions.append(column == self.fund_companies[0])
+            else:
+                conditions.append(column.in_(self.fund_companies))
+        
+        if self.tags:
+            if model.TAG_COLUMN is None:
+                raise HTTPException(status_code=400, detail="该数据集不支持按标签筛选")
+            # 与 GIN 表达式索引 string_to_array(fund_tags, ',') 一致
+            tags = func.string_to_array(getattr(model, model.TAG_COLUMN), ",", type_=ARRAY(Text))
+            conditions.append(tags.contains(list(self.tags)))
+        
+        return conditions
+    
+    def sort_keys(self, model) -> list:
+        """编译为排序键（id 兜底保证顺序稳定，可用于游标分页）"""
+        return build_sort_keys(model, self.sort)
+
+
+def build_sort_keys(model, sort: Sequence[Tuple] = DEFAULT_SORT) -> list:
+    """[(字段名, 是否倒序), ...] 映射为模型列，末尾追加 id 兜底"""
+    keys = [(getattr(model, model.QUERY_COLUMNS[name]), desc) for name, desc in sort]
+    return keys + [(model.id, False)]
+
+
+def select_columns(model, fields: Optional[tuple], sort_keys: Sequence[Tuple]) -> list:
+    """查询需要的列：投影字段所需列 + 排序列"""
+    columns = model.columns_for(fields)
+    keys = {column.key for column in columns}
+    for column, _ in sort_keys:
+        if column.key not in keys:
+            columns.append(column)
+            keys.add(column.key)
+    return columns
+
+
+def _sort_signature(sort_keys: Sequence[Tuple]) -> str:
+    """排序规则签名，用于校验游标与当前查询是否匹配"""
+    return ",".join(("-" if desc else "") + column.key for column, desc in sort_keys)
+
+
+def encode_cursor(sort_keys: Sequence[Tuple], row) -> str:
+    """根据最后一行的排序键生成游标"""
+    values = []
+    for column, _ in sort_keys:
+        value = getattr(row, column.key)
+        values.append(str(value) if isinstance(value, Decimal) else value)
+    payload = json.dumps({"k": _sort_signature(sort_keys), "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(sort_keys: Sequence[Tuple], cursor: str) -> list:
+    """解析游标，返回各排序键的值"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        signature, values = payload["k"], payload["v"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的游标")
+
+    if signature != _sort_signature(sort_keys) or len(values) != len(sort_keys):
+        raise HTTPException(status_code=400, detail="游标与当前排序规则不匹配")
+
+    decoded = []
+    for (column, _), value in zip(sort_keys, values):
+        if value is not None and isinstance(column.type, Numeric):
+            value = Decimal(value)
+        elif value is not None and isinstance(column.type, Integer):
+            value = int(value)
+        decoded.append(value)
+    return decoded
+
+
+def _after(column, desc: bool, value):
+    """按 NULLS LAST 语义，排在 value 之后的条件"""
+    if value is None:
+        # 空值位于末尾，其后只能是同为空值、由后续排序键决定的行
+        return false()
+    condition = column < value if desc else column > value
+    if column.nullable:
+        condition = or_(condition, column.is_(None))
+    return condition
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def keyset_condition(sort_keys: Sequence[Tuple], values: list):
+    """
+    生成 keyset 分页条件
+    (k1, k2, ..., kn) 排在游标之后 ⇔ 存在 i 使 k1..k(i-1) 相等且 ki 在游标之后
+    """
+    clauses = []
+    for i, (column, desc) in enumerate(sort_keys):
+        prefix = [_equal(col, val) for (col, _), val in zip(sort_keys[:i], values[:i])]
+        clauses.append(and_(*prefix, _after(column, desc, values[i])))
+    return or_(*clauses)
+
+
+def order_clauses(sort_keys: Sequence[Tuple]) -> list:
+    """排序子句（空值统一排在最后；非空列不加 NULLS LAST 以便直接使用普通索引）"""
+    clauses = []
+    for column, desc in sort_keys:
+        clause = column.desc() if desc else column.asc()
+        clauses.append(clause.nulls_last() if column.nullable else clause)
+    return clauses
+
+
+def paginate(query, sort_keys: Sequence[Tuple], limit: Optional[int],
+             cursor: Optional[str]) -> Tuple[List, Optional[str]]:
+    """
+    排序并按游标分页
+
+    Args:
+        query: 已包含筛选条件的查询（需选出所有排序列）
+        sort_keys: [(列, 是否倒序), ...]，最后一项应为唯一列（如 id）以保证顺序稳定
+        limit: 每页条数，None 且无游标时返回全部
+        cursor: 上一页返回的 next_cursor
+
+    Returns:
+        (行列表, 下一页游标或 None)
+    """
+    if cursor:
+        query = query.filter(keyset_condition(sort_keys, decode_cursor(sort_keys, cursor)))
+    query = query.order_by(*order_clauses(sort_keys))
+
+    if limit is None and not cursor:
+        return query.all(), None
+
+    page_size = limit or DEFAULT_PAGE_SIZE
+    # 多取一条判断是否还有下一页
+    rows = query.limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(sort_keys, rows[-1])
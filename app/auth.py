@@ -0,0 +1,133 @@
+"""
+API 认证与限流
+
+- 支持多个命名 Token（API_TOKEN 为 default，API_TOKENS 追加 name:token），
+  校验时与所有 Token 做常量时间比较，耗时不泄露匹配位置
+- 每个 Token 的每类接口一个令牌桶：按配置速率补充，桶空时拒绝并给出
+  需要等待的秒数（429 + Retry-After）
+
+接口类别:
+- query: 读取数据库的列表/快照/历史/增量/状态/日志接口
+- lookup: 内存基金索引查询（/fund、/funds）
+- export: 流式导出
+- stream: 推送连接（SSE / WebSocket）
+"""
+
+import hmac
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import get_settings
+
+ENDPOINT_CLASSES = ("query", "lookup", "export", "stream")
+
+
+def parse_tokens(api_token: str, api_tokens: str = "") -> Dict[str, str]:
+    """解析 Token 配置: {名称: Token}"""
+    tokens = {"default": api_token}
+    for item in api_tokens.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, token = item.partition(":")
+        if not sep or not name.strip() or not token.strip():
+            logger.warning(f"忽略格式错误的 API_TOKENS 项（应为 name:token）: {name.strip() or '?'}")
+            continue
+        tokens[name.strip()] = token.strip()
+    return tokens
+
+
+def parse_rate(value: str) -> Optional[Tuple[float, float]]:
+    """解析限流配置 "每秒补充数/桶容量"，0 或空表示不限流"""
+    value = (value or "").strip()
+    if not value or value == "0":
+        return None
+    rate, _, burst = value.partition("/")
+    rate = float(rate)
+    burst = float(burst) if burst else max(rate, 1.0)
+    if rate <= 0:
+        return None
+    return rate, max(burst, 1.0)
+
+
+class TokenRegistry:
+    """命名 Token 集合"""
+
+    def __init__(self, tokens: Dict[str, str]):
+        self._tokens: List[Tuple[str, bytes]] = [
+            (name, token.encode("utf-8")) for name, token in tokens.items() if token
+        ]
+
+    def identify(self, value: Optional[str]) -> Optional[str]:
+        """返回匹配的 Token 名称（逐个常量时间比较，不提前退出）"""
+        if not value:
+            return None
+        candidate = value.encode("utf-8")
+        matched = None
+        for name, token in self._tokens:
+            if hmac.compare_digest(candidate, token) and matched is None:
+                matched = name
+        return matched
+
+
+class RateLimiter:
+    """令牌桶限流（进程内，按 (Token 名称, 接口类别) 独立计数）"""
+
+    def __init__(self, limits: Dict[str, Optional[Tuple[float, float]]]):
+        self.limits = limits
+        self._buckets: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, token_name: str, endpoint_class: str) -> float:
+        """
+        取一个令牌
+
+        Returns:
+            0 表示放行；否则为需要等待的秒数
+        """
+        limit = self.limits.get(endpoint_class)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        key = (token_name, endpoint_class)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / rate
+
+
+# 全局实例
+_registry: TokenRegistry = None
+_limiter: RateLimiter = None
+
+
+def get_token_registry() -> TokenRegistry:
+    """获取 Token 集合单例"""
+    global _registry
+    if _registry is None:
+        settings = get_settings()
+        _registry = TokenRegistry(parse_tokens(settings.api_token, settings.api_tokens))
+    return _registry
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取限流器单例"""
+    global _limiter
+    if _limiter is None:
+        settings = get_settings()
+        _limiter = RateLimiter({
+            name: parse_rate(getattr(settings, f"rate_limit_{name}")) for name in ENDPOINT_CLASSES
+        })
+    return _limiter
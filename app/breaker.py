@@ -0,0 +1,94 @@
+"""
+抓取熔断器
+
+集思录不可用或登录持续失败时，继续按计划抓取只会反复启动浏览器、加重风控。
+连续 SCRAPE_BREAKER_THRESHOLD 次站点级失败（浏览器启动或登录失败，或本次抓取的
+数据集全部失败）后熔断:
+
+- 熔断期间的抓取直接跳过（不启动浏览器）
+- 冷却期（SCRAPE_BREAKER_COOLDOWN 秒）结束后放行一次试探：成功则恢复，失败则冷却期
+  加倍（不超过 SCRAPE_BREAKER_MAX_COOLDOWN）后再次熔断
+- 单个数据集失败（如页面结构变化）由重试处理，只要有数据集成功就视为站点正常
+
+状态保存在 circuit_breaker 表中，所有 worker（抓取子进程）共享。
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import CircuitBreaker
+
+SITE = "jisilu"
+
+
+def open_until(db: Session, name: str = SITE) -> Optional[datetime]:
+    """熔断中时返回熔断截止时间，否则返回 None（含冷却期已过的试探）"""
+    breaker = db.get(CircuitBreaker, name)
+    if breaker is None or breaker.opened_until is None or breaker.opened_until <= datetime.now():
+        return None
+    return breaker.opened_until
+
+
+def _load(db: Session, name: str) -> CircuitBreaker:
+    breaker = db.get(CircuitBreaker, name, with_for_update=True)
+    if breaker is None:
+        breaker = CircuitBreaker(name=name, failures=0)
+        db.add(breaker)
+    return breaker
+
+
+def record_success(db: Session, name: str = SITE):
+    """站点正常：清零失败次数并关闭熔断（提交事务）"""
+    breaker = _load(db, name)
+    if breaker.failures or breaker.opened_until is not None:
+        breaker.failures = 0
+        breaker.cooldown_seconds = None
+        breaker.opened_until = None
+        breaker.updated_at = datetime.now()
+    db.commit()
+
+
+def record_failure(db: Session, error: str, name: str = SITE) -> Optional[datetime]:
+    """
+    记录一次站点级失败（提交事务）
+
+    Returns:
+        本次失败触发熔断时返回熔断截止时间
+    """
+    settings = get_settings()
+    breaker = _load(db, name)
+    now = datetime.now()
+    breaker.failures = (breaker.failures or 0) + 1
+    breaker.last_error = error
+    breaker.updated_at = now
+
+    tripped = None
+    if breaker.failures >= settings.scrape_breaker_threshold:
+        # 首次熔断使用基础冷却时间，试探失败后加倍
+        if breaker.cooldown_seconds:
+            breaker.cooldown_seconds = min(breaker.cooldown_seconds * 2, settings.scrape_breaker_max_cooldown)
+        else:
+            breaker.cooldown_seconds = settings.scrape_breaker_cooldown
+        breaker.opened_until = tripped = now + timedelta(seconds=breaker.cooldown_seconds)
+    db.commit()
+    return tripped
+
+
+def breaker_status(db: Session, name: str = SITE) -> Dict:
+    """熔断器状态: closed 正常 / open 熔断中 / half_open 冷却期已过，等待试探"""
+    breaker = db.get(CircuitBreaker, name)
+    if breaker is None or breaker.opened_until is None:
+        state = "closed"
+    elif breaker.opened_until > datetime.now():
+        state = "open"
+    else:
+        state = "half_open"
+    return {
+        "state": state,
+        "failures": breaker.failures if breaker else 0,
+        "opened_until": breaker.opened_until.isoformat() if breaker and breaker.opened_until else None,
+        "last_error": breaker.last_error if breaker else None,
+    }
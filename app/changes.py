@@ -0,0 +1,113 @@
+"""
+快照差异（增量同步）
+
+发布快照时对比各数据集替换前后的数据，把变化的行写入 snapshot_change，并在
+snapshot_diff 中记录该版本。客户端按 since_version 拉取增量时，直接合并已保存
+的差异，无需对比整表：
+
+- 同一基金在多个版本中变化时只返回最新状态
+- since_version 早于保留的最早差异时，返回全量数据（full=true）
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import DATASET_MODELS, SnapshotChange, SnapshotDiff
+
+
+def serialize_dataset(db: Session, name: str) -> Dict[str, Dict]:
+    """读取数据集当前数据：基金代码 -> 行（同一代码重复时保留第一条，与基金索引一致）"""
+    model = DATASET_MODELS[name]
+    rows = {}
+    for item in db.query(model).order_by(model.id):
+        if item.fund_code not in rows:
+            rows[item.fund_code] = model.serialize(item)
+    return rows
+
+
+def compute_changes(old_rows: Dict[str, Dict], new_rows: Dict[str, Dict]) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    对比数据集的两个版本
+
+    Returns:
+        (新增/变化的行 {基金代码: 行}, 被删除的基金代码)
+    """
+    upserts = {code: row for code, row in new_rows.items() if old_rows.get(code) != row}
+    removed = [code for code in old_rows if code not in new_rows]
+    return upserts, removed
+
+
+def record_changes(db: Session, version: int, previous_version: Optional[int],
+                   changes: Dict[str, Tuple[Dict[str, Dict], List[str]]]) -> int:
+    """
+    保存本次发布的差异并清理过期差异（在调用方事务中执行）
+
+    Args:
+        changes: 数据集 -> compute_changes 的结果；未替换的数据集不出现
+
+    Returns:
+        保存的变化行数
+    """
+    db.add(SnapshotDiff(version=version, previous_version=previous_version))
+
+    rows = []
+    for name, (upserts, removed) in changes.items():
+        rows.extend(
+            {"version": version, "dataset": name, "fund_code": code, "op": "upsert", "row": row}
+            for code, row in upserts.items()
+        )
+        rows.extend(
+            {"version": version, "dataset": name, "fund_code": code, "op": "remove", "row": None}
+            for code in removed
+        )
+    if rows:
+        db.execute(insert(SnapshotChange), rows)
+
+    retention_days = get_settings().change_retention_days
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    expired = db.query(SnapshotDiff.version).filter(SnapshotDiff.created_at < cutoff)
+    # 最早的差异最先过期，保留的版本始终连续
+    db.query(SnapshotChange).filter(
+        SnapshotChange.version.in_(expired.scalar_subquery())
+    ).delete(synchronize_session=False)
+    db.query(SnapshotDiff).filter(SnapshotDiff.created_at < cutoff).delete(synchronize_session=False)
+
+    return len(rows)
+
+
+def covers(db: Session, since_version: int) -> bool:
+    """保存的差异能否从 since_version 推进到最新版本"""
+    oldest = db.query(SnapshotDiff).order_by(SnapshotDiff.version).first()
+    if oldest is None:
+        return False
+    # 最早一条差异相对其上一版本，客户端版本不能早于该版本
+    return since_version >= (oldest.previous_version or 0)
+
+
+def load_changes(db: Session, name: str, since_version: int) -> Tuple[List[Dict], List[str]]:
+    """
+    合并 since_version 之后各版本的差异（每只基金取最新一次变化）
+
+    Returns:
+        (新增/变化的行, 被删除的基金代码)
+    """
+    latest = db.query(
+        SnapshotChange.fund_code, SnapshotChange.op, SnapshotChange.row
+    ).filter(
+        SnapshotChange.dataset == name,
+        SnapshotChange.version > since_version,
+    ).order_by(
+        SnapshotChange.fund_code, SnapshotChange.version.desc()
+    ).distinct(SnapshotChange.fund_code)
+
+    upserts, removed = [], []
+    for code, op, row in latest:
+        if op == "remove":
+            removed.append(code)
+        else:
+            upserts.append(row)
+    return upserts, removed
@@ -20,6 +20,14 @@ class Settings(BaseSettings):
     
     # API 认证
     api_token: str
+    api_tokens: str = ""  # 额外的命名 Token，格式 name:token，逗号分隔（API_TOKEN 的名称为 default）
+    
+    # 限流（每个 Token 每类接口一个令牌桶，格式 "每秒补充数/桶容量"，0 表示不限，默认关闭）
+    # 同一 Token 的所有客户端共用额度，应先用 API_TOKENS 为各客户端分配独立 Token 再开启
+    rate_limit_query: str = "0"   # 读取数据库的列表/快照/历史等接口
+    rate_limit_lookup: str = "0"  # 内存基金索引查询
+    rate_limit_export: str = "0"  # 流式导出
+    rate_limit_stream: str = "0"  # 推送连接（SSE / WebSocket）
     
     # 数据库
     database_url: str
@@ -30,11 +38,71 @@ class Settings(BaseSettings):
     scrape_start_hour: int = 7     # 开始抓取时间（小时）
     scrape_end_hour: int = 24      # 结束抓取时间（小时）
     
+    # 交易日历（交易时段密集抓取、时段外稀疏抓取、节假日不抓取）
+    trading_calendar: bool = True  # 关闭后每天按 scrape_min_interval ~ scrape_max_interval 抓取
+    trading_sessions: str = "09:30-11:30,13:00-15:00"  # 交易时段，逗号分隔
+    trading_holidays: str = ""  # 额外的休市日期（YYYY-MM-DD，逗号分隔），内置数据之外的临时休市
+    scrape_session_interval: float = 5  # 交易时段内的抓取间隔（分钟），实际间隔随机浮动 ±20%
+    scrape_dataset_intervals: str = "lof:2,qdii:15,lof_index:15"  # 各数据集交易时段内的抓取间隔（分钟），未列出的使用 scrape_session_interval
+    scrape_volatility_reference: float = 0.2  # 相邻两次抓取溢价率平均变化的参考值（百分点），0 表示不按波动调整
+    
+    # 抓取容错（各数据集独立重试与提交，站点持续失败时熔断）
+    scrape_dataset_timeout: int = 90  # 单个数据集（含重试）的最长时间（秒）
+    scrape_retries: int = 2  # 数据集抓取失败后的重试次数
+    scrape_retry_backoff: float = 2  # 重试退避基数（秒），第 n 次重试前等待 基数×2^(n-1)，随机浮动 ±50%
+    scrape_breaker_threshold: int = 3  # 连续多少次站点级失败（登录失败或全部数据集失败）后熔断
+    scrape_breaker_cooldown: int = 300  # 熔断冷却时间（秒），试探失败后加倍
+    scrape_breaker_max_cooldown: int = 3600  # 最长冷却时间（秒）
+    
+    # 调度器选主（多 worker / 多副本部署时只有一个进程安排抓取）
+    leader_election: bool = True  # 关闭后每个进程都安排抓取（单进程部署时可关闭）
+    leader_check_interval: int = 10  # 选主检查间隔（秒），也是 leader 失效后的最长接管时间
+    
+    # 抓取任务队列
+    scrape_embedded_worker: bool = True  # API 进程内置 worker；独立运行 python -m app.worker 时可关闭
+    scrape_job_timeout: int = 300  # 单个任务的最长执行时间（秒）
+    scrape_job_deadline: int = 900  # 默认截止时间（入队后秒数），排队到期未执行则过期
+    job_poll_interval: int = 5  # worker 无 LISTEN 通知时的轮询间隔（秒）
+    job_stale_seconds: int = 120  # 执行中任务超过该时间无心跳视为 worker 失联（秒）
+    job_retention_days: int = 7  # 已结束任务的保留天数
+    scrape_trigger_min_interval: int = 60  # 按需抓取（POST /api/scrape）的最小间隔（秒），该时间内抓取过的数据集跳过
+    
+    # 基金索引
+    fund_index_check_interval: int = 10  # 查询时检查快照版本的最小间隔（秒）
+    
+    # 增量同步
+    change_retention_days: int = 7  # 快照差异保留天数，更早的 since_version 返回全量数据
+    
+    # 变更推送
+    push_check_interval: int = 5  # 推送任务检查快照版本的间隔（秒）
+    push_heartbeat_interval: int = 15  # SSE 心跳间隔（秒）
+    
+    # 溢价率历史
+    history_retention_days: int = 1095  # 历史保留天数，0 表示永久保留
+    
+    # 性能分析
+    scrape_profile: bool = False  # 每次抓取都用 cProfile 分析（也可通过 POST /api/profiles/next 只分析下一次）
+    profile_dir: str = "/tmp/lof_profiles"  # 分析结果目录
+    profile_retention: int = 20  # 保留最近多少次分析结果
+    request_profile_rate: float = 0.0  # API 请求抽样分析比例，0 表示不抽样
+    request_profile_slow_ms: int = 0  # 耗时超过该值（毫秒）的请求都记录调用栈，0 表示关闭
+    request_profile_interval_ms: int = 5  # 调用栈采样间隔（毫秒）
+    request_profile_memory: bool = False  # 抽样请求同时用 tracemalloc 统计内存分配
+    
+    # 分布式追踪
+    trace_exporter: str = ""  # file / otlp，空表示关闭
+    trace_file: str = "/tmp/lof_traces.jsonl"  # file 导出的文件路径（每行一个 span）
+    trace_otlp_endpoint: str = "http://localhost:4318/v1/traces"  # OTLP/HTTP JSON 接收地址
+    trace_sample_ratio: float = 1.0  # 新建 trace 的采样比例（延续上游 traceparent 时沿用其采样标记）
+    trace_service_name: str = "lof-monitor"  # 导出时的 service.name
+    
     # 默认筛选
     default_min_premium: float = 3.0  # 默认最小溢价率（%）
     
     # 安全配置
-    allowed_ips: str = "*"  # 允许访问的 IP 列表，逗号分隔。* 表示允许所有
+    allowed_ips: str = "*"  # 允许访问的 IP/网段列表，逗号分隔，支持 CIDR。* 表示允许所有
+    # 可信代理 IP/网段，仅这些地址转发的 X-Forwarded-For 被采信（默认本机与 Docker 网络）。* 表示信任所有
+    trusted_proxies: str = "127.0.0.1/32,::1/128,172.16.0.0/12"
 
     @property
     def ip_list(self) -> list[str]:
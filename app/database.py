@@ -2,7 +2,10 @@
 数据库连接模块
 """
 
-from sqlalchemy import create_engine
+import hashlib
+
+from loguru import logger
+from sqlalchemy import create_engine, func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
@@ -33,7 +36,45 @@ def get_db():
         db.close()
 
 
+def schema_fingerprint() -> str:
+    """模型表结构指纹：按表名排序的 CREATE TABLE / CREATE INDEX 语句的 SHA-256"""
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    
+    statements = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        statements.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+        statements.extend(sorted(
+            str(CreateIndex(index).compile(dialect=engine.dialect)) for index in table.indexes
+        ))
+    return hashlib.sha256("\n".join(statements).encode("utf-8")).hexdigest()
+
+
 def init_db():
-    """初始化数据库（创建所有表）"""
+    """
+    初始化数据库（创建缺失的表）
+    
+    数据库中记录的表结构指纹与当前模型一致时跳过 create_all（逐表检查系统目录）；
+    手动删除表后需要重建时，删除 schema_fingerprint 中的记录即可。
+    """
     from app import models  # 导入模型以注册
+    from sqlalchemy.dialects.postgresql import insert
+    
+    fingerprint = schema_fingerprint()
+    with engine.connect() as conn:
+        applied = None
+        if conn.execute(text("SELECT to_regclass('schema_fingerprint')")).scalar() is not None:
+            applied = conn.execute(
+                text("SELECT fingerprint FROM schema_fingerprint WHERE id = 1")
+            ).scalar()
+    if applied == fingerprint:
+        logger.info("表结构未变化，跳过建表检查")
+        return
+    
     Base.metadata.create_all(bind=engine)
+    statement = insert(models.SchemaFingerprint).values(id=1, fingerprint=fingerprint)
+    with engine.begin() as conn:
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=[models.SchemaFingerprint.id],
+            set_={"fingerprint": fingerprint, "applied_at": func.now()},
+        ))
+    logger.info("表结构已更新")
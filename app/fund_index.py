@@ -0,0 +1,159 @@
+"""
+基金内存索引
+
+按基金代码索引当前快照中所有数据集的数据，单只基金查询为一次字典查找，
+无需访问数据库。同一基金同时出现在多个数据集（如 LOF 套利与指数 LOF）时，
+查询结果中合并为一条记录。
+
+索引随快照版本（最后一次成功抓取日志 id）重建：
+- 抓取任务完成后由调度器主动刷新
+- 查询时按 fund_index_check_interval 间隔检查版本，兜底其他进程发布的快照
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import DATASET_MODELS, ScrapeLog
+from app.snapshot import begin_snapshot_read, get_last_success_log
+
+
+def build_entries(datasets: Dict[str, list]) -> Dict[str, Dict]:
+    """
+    将各数据集的行构建为 基金代码 -> 合并记录
+
+    Args:
+        datasets: 数据集名称 -> 模型实例列表
+
+    Returns:
+        {fund_code: {"fund_code", "fund_name", "datasets": {数据集: 行数据}}}
+    """
+    entries: Dict[str, Dict] = {}
+    for name, items in datasets.items():
+        model = DATASET_MODELS[name]
+        for item in items:
+            entry = entries.get(item.fund_code)
+            if entry is None:
+                entry = entries[item.fund_code] = {
+                    "fund_code": item.fund_code,
+                    "fund_name": item.fund_name,
+                    "datasets": {},
+                }
+            # 同一数据集内代码重复时保留第一条
+            if name not in entry["datasets"]:
+                entry["datasets"][name] = model.serialize(item)
+    return entries
+
+
+def build_premiums(datasets: Dict[str, list]) -> Dict[Tuple[str, str], Optional[float]]:
+    """(数据集, 基金代码) -> 溢价率数值（用于按溢价率筛选推送）"""
+    premiums = {}
+    for name, items in datasets.items():
+        column = DATASET_MODELS[name].QUERY_COLUMNS["premium"]
+        for item in items:
+            key = (name, item.fund_code)
+            if key not in premiums:
+                value = getattr(item, column)
+                premiums[key] = float(value) if value is not None else None
+    return premiums
+
+
+class FundIndex:
+    """基金代码 -> 合并记录 的内存索引"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        # (版本号, 更新时间, 索引, 溢价率)，重建时整体替换
+        self._state: Tuple[Optional[int], Optional[str], Dict, Dict] = (None, None, {}, {})
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        """从数据库重新加载当前快照并替换索引"""
+        db = SessionLocal()
+        try:
+            # 与 /snapshot 相同，在单个事务中读取同一版本
+            begin_snapshot_read(db)
+            last_success = get_last_success_log(db)
+            datasets = {
+                name: db.query(model).order_by(model.id).all()
+                for name, model in DATASET_MODELS.items()
+            }
+            entries = build_entries(datasets)
+            premiums = build_premiums(datasets)
+        finally:
+            db.close()
+
+        # 整体替换引用，查询线程不会看到构建中的索引
+        self._state = (
+            last_success.id if last_success else None,
+            last_success.scrape_time.isoformat() if last_success else None,
+            entries,
+            premiums,
+        )
+        self._checked_at = time.monotonic()
+        logger.info(f"基金索引已重建，版本: {self.version}，基金数: {len(entries)}")
+
+    def refresh(self, force: bool = False):
+        """快照版本变化时重建索引"""
+        with self._lock:
+            db = SessionLocal()
+            try:
+                version = db.query(ScrapeLog.id).filter(
+                    ScrapeLog.status == "success"
+                ).order_by(ScrapeLog.id.desc()).limit(1).scalar()
+            finally:
+                db.close()
+
+            if force or not self._checked_at or version != self.version:
+                self.rebuild()
+            else:
+                self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """距上次检查超过间隔时检查快照版本"""
+        interval = self.settings.fund_index_check_interval
+        if self._checked_at and time.monotonic() - self._checked_at < interval:
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            # 数据库暂不可用时继续使用旧索引
+            if not self._checked_at:
+                raise
+            logger.warning(f"基金索引刷新失败，继续使用版本 {self.version}: {e}")
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._state[0]
+
+    @property
+    def update_time(self) -> Optional[str]:
+        return self._state[1]
+
+    def get(self, fund_code: str) -> Optional[Dict]:
+        """查询单只基金"""
+        return self._state[2].get(fund_code)
+
+    def state(self) -> Tuple[Optional[int], Optional[str], Dict, Dict]:
+        """当前版本的 (版本号, 更新时间, 索引, 溢价率)，各部分属于同一版本"""
+        return self._state
+
+    def __len__(self) -> int:
+        return len(self._state[2])
+
+
+# 全局索引实例
+_fund_index: FundIndex = None
+
+
+def get_fund_index() -> FundIndex:
+    """获取基金索引单例"""
+    global _fund_index
+    if _fund_index is None:
+        _fund_index = FundIndex()
+    return _fund_index
@@ -0,0 +1,250 @@
+"""
+溢价率历史
+
+每次发布快照时，把各基金的溢价率、价格、净值追加到 premium_history，同时
+重新汇总本次写入的基金当日数据到 premium_history_daily。过期数据按
+history_retention_days 由调度器每天清理一次（prune_history）。
+
+查询时在数据库中按时间桶聚合，返回的点数与时间范围长度无关：
+- 桶宽不足一天时聚合原始记录
+- 桶宽为整天时聚合日汇总表，多年范围也只需扫描几百到几千行
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import Float, case, cast, func, insert, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models import DATASET_MODELS, PremiumHistory, PremiumHistoryDaily
+
+SECONDS_PER_DAY = 86400
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class HistoryPoint(NamedTuple):
+    """历史查询结果（单个点或单个时间桶）"""
+    dataset: str
+    time: datetime
+    premium_rate: Optional[float]
+    price: Optional[float]
+    nav: Optional[float]
+
+
+def _to_number(value) -> Optional[Decimal]:
+    """数据列转数值（原始文本如 "8.00%"、"-" 也能处理）"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+        if not value or value in ("-", "--"):
+            return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def history_rows(name: str, rows: List[Dict], version: int, recorded_at: datetime) -> List[Dict]:
+    """由快照行数据生成历史记录"""
+    columns = DATASET_MODELS[name].HISTORY_COLUMNS
+    return [
+        {
+            "version": version,
+            "recorded_at": recorded_at,
+            "dataset": name,
+            "fund_code": row["fund_code"],
+            **{field: _to_number(row.get(column)) for field, column in columns.items()},
+        }
+        for row in rows
+    ]
+
+
+def rollup_day(db: Session, day: date, dataset: Optional[str] = None,
+               fund_codes: Optional[Iterable[str]] = None):
+    """重新汇总某一天的原始记录到日汇总表，可限定数据集与基金"""
+    start = datetime.combine(day, datetime.min.time())
+    conditions = [
+        PremiumHistory.recorded_at >= start,
+        PremiumHistory.recorded_at < start + timedelta(days=1),
+    ]
+    if dataset:
+        conditions.append(PremiumHistory.dataset == dataset)
+    if fund_codes is not None:
+        conditions.append(PremiumHistory.fund_code.in_(list(fund_codes)))
+    summary = db.query(
+        PremiumHistory.fund_code,
+        PremiumHistory.dataset,
+        literal(day).label("day"),
+        func.avg(PremiumHistory.premium_rate),
+        func.avg(PremiumHistory.price),
+        func.avg(PremiumHistory.nav),
+        func.count(),
+    ).filter(*conditions).group_by(PremiumHistory.fund_code, PremiumHistory.dataset)
+
+    columns = ["fund_code", "dataset", "day", "premium_rate", "price", "nav", "sample_count"]
+    stmt = pg_insert(PremiumHistoryDaily).from_select(columns, summary.statement)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["fund_code", "dataset", "day"],
+        set_={name: stmt.excluded[name] for name in columns[3:]},
+    )
+    db.execute(stmt)
+
+
+def record_history(db: Session, datasets: Dict[str, List[Dict]], version: int,
+                   recorded_at: datetime) -> int:
+    """
+    追加快照历史并更新本次写入基金的当日汇总（在调用方事务中执行）
+
+    Returns:
+        写入的历史记录数
+    """
+    rows = []
+    for name, items in datasets.items():
+        if items:
+            rows.extend(history_rows(name, items, version, recorded_at))
+    if not rows:
+        return 0
+
+    db.execute(insert(PremiumHistory), rows)
+    for name, items in datasets.items():
+        if items:
+            rollup_day(db, recorded_at.date(), name, {row["fund_code"] for row in items})
+    return len(rows)
+
+
+def prune_history(db: Session, retention_days: int) -> int:
+    """删除保留期之前的历史记录与日汇总，retention_days 为 0 时永久保留"""
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    deleted = db.query(PremiumHistory).filter(
+        PremiumHistory.recorded_at < cutoff
+    ).delete(synchronize_session=False)
+    db.query(PremiumHistoryDaily).filter(
+        PremiumHistoryDaily.day < cutoff.date()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def query_history(db: Session, fund_code: str, start: datetime, end: datetime,
+                  bucket_seconds: int = 0, dataset: Optional[str] = None,
+                  limit: Optional[int] = None) -> List[HistoryPoint]:
+    """
+    查询单只基金的历史
+
+    Args:
+        bucket_seconds: 时间桶宽度（秒），0 表示返回原始记录；整天时使用日汇总表
+        limit: 最多返回条数
+
+    Returns:
+        按 (dataset, 时间) 排序的点；时间桶的时间为桶内记录的平均时间（日汇总为桶起始日）
+    """
+    if bucket_seconds and bucket_seconds % SECONDS_PER_DAY == 0:
+        return _query_daily(db, fund_code, start, end, bucket_seconds // SECONDS_PER_DAY, dataset, limit)
+
+    conditions = [
+        PremiumHistory.fund_code == fund_code,
+        PremiumHistory.recorded_at >= start,
+        PremiumHistory.recorded_at <= end,
+    ]
+    if dataset:
+        conditions.append(PremiumHistory.dataset == dataset)
+
+    if not bucket_seconds:
+        query = db.query(
+            PremiumHistory.dataset,
+            PremiumHistory.recorded_at,
+            cast(PremiumHistory.premium_rate, Float),
+            cast(PremiumHistory.price, Float),
+            cast(PremiumHistory.nav, Float),
+        ).filter(*conditions).order_by(PremiumHistory.dataset, PremiumHistory.recorded_at)
+        if limit:
+            query = query.limit(limit)
+        return [HistoryPoint(*row) for row in query]
+
+    # date_part 返回 double precision，比 extract 的 numeric 运算快；
+    # 聚合结果转为 double，避免解析高精度 numeric
+    epoch = func.date_part("epoch", PremiumHistory.recorded_at)
+    bucket = func.floor(epoch / bucket_seconds)
+    query = db.query(
+        PremiumHistory.dataset,
+        func.avg(epoch),
+        cast(func.avg(PremiumHistory.premium_rate), Float),
+        cast(func.avg(PremiumHistory.price), Float),
+        cast(func.avg(PremiumHistory.nav), Float),
+    ).filter(*conditions).group_by(PremiumHistory.dataset, bucket).order_by(PremiumHistory.dataset, bucket)
+    if limit:
+        query = query.limit(limit)
+    return [
+        HistoryPoint(name, EPOCH + timedelta(seconds=seconds), premium_rate, price, nav)
+        for name, seconds, premium_rate, price, nav in query
+    ]
+
+
+def _query_daily(db: Session, fund_code: str, start: datetime, end: datetime,
+                 bucket_days: int, dataset: Optional[str], limit: Optional[int]) -> List[HistoryPoint]:
+    """按日汇总表聚合（按当日记录数加权平均）"""
+    conditions = [
+        PremiumHistoryDaily.fund_code == fund_code,
+        PremiumHistoryDaily.day >= start.date(),
+        PremiumHistoryDaily.day <= end.date(),
+    ]
+    if dataset:
+        conditions.append(PremiumHistoryDaily.dataset == dataset)
+
+    if bucket_days == 1:
+        query = db.query(
+            PremiumHistoryDaily.dataset,
+            PremiumHistoryDaily.day,
+            cast(PremiumHistoryDaily.premium_rate, Float),
+            cast(PremiumHistoryDaily.price, Float),
+            cast(PremiumHistoryDaily.nav, Float),
+        ).filter(*conditions).order_by(PremiumHistoryDaily.dataset, PremiumHistoryDaily.day)
+    else:
+        weight = PremiumHistoryDaily.sample_count
+
+        def weighted(column):
+            # 空值不计入权重
+            return cast(func.sum(column * weight) / func.nullif(
+                func.sum(case((column.is_(None), 0), else_=weight)), 0
+            ), Float)
+
+        bucket = func.floor((PremiumHistoryDaily.day - date(1970, 1, 1)) / bucket_days)
+        query = db.query(
+            PremiumHistoryDaily.dataset,
+            func.min(PremiumHistoryDaily.day),
+            weighted(PremiumHistoryDaily.premium_rate),
+            weighted(PremiumHistoryDaily.price),
+            weighted(PremiumHistoryDaily.nav),
+        ).filter(*conditions).group_by(
+            PremiumHistoryDaily.dataset, bucket
+        ).order_by(PremiumHistoryDaily.dataset, bucket)
+    if limit:
+        query = query.limit(limit)
+    return [
+        HistoryPoint(name, datetime.combine(day, datetime.min.time()), premium_rate, price, nav)
+        for name, day, premium_rate, price, nav in query
+    ]
+
+
+def premium_volatility(db: Session, since: datetime, dataset: Optional[str] = None) -> Optional[float]:
+    """
+    since 之后相邻两次快照之间溢价率变化绝对值的平均值（百分点），可限定数据集
+
+    用于调度器按市场波动调整抓取间隔；记录不足（少于两次快照）时返回 None
+    """
+    change = PremiumHistory.premium_rate - func.lag(PremiumHistory.premium_rate).over(
+        partition_by=(PremiumHistory.dataset, PremiumHistory.fund_code),
+        order_by=PremiumHistory.version,
+    )
+    conditions = [PremiumHistory.recorded_at >= since]
+    if dataset:
+        conditions.append(PremiumHistory.dataset == dataset)
+    changes = db.query(change.label("change")).filter(*conditions).subquery()
+    value = db.query(cast(func.avg(func.abs(changes.c.change)), Float)).scalar()
+    return value
@@ -0,0 +1,161 @@
+"""
+IP 白名单
+
+启动时把 ALLOWED_IPS 编译为有序、不重叠的地址区间（IPv4 / IPv6 分开），
+请求时对客户端地址做一次二分查找，开销与白名单条目数基本无关：
+- 支持单个地址与 CIDR 网段，如 10.0.0.0/8、2001:db8::/32
+- IPv4 映射的 IPv6 地址（::ffff:1.2.3.4）按 IPv4 匹配
+- 只有直连地址属于 TRUSTED_PROXIES 时才信任 X-Forwarded-For，从右向左跳过
+  可信代理，取第一个不可信的地址作为客户端地址
+
+中间件为纯 ASGI 实现，同时检查 HTTP 与 WebSocket 连接。
+"""
+
+import ipaddress
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+from loguru import logger
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.websockets import WebSocketClose
+
+from app.config import get_settings
+
+
+def parse_ip(value: str):
+    """解析地址（IPv4 映射的 IPv6 地址转为 IPv4），无效时返回 None"""
+    try:
+        address = ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+class NetworkSet:
+    """地址集合：合并后的有序区间 + 二分查找"""
+
+    def __init__(self, entries: Iterable[str]):
+        entries = [entry.strip() for entry in entries if entry and entry.strip()]
+        self.match_all = "*" in entries
+
+        ranges = {4: [], 6: []}
+        for entry in entries:
+            if entry == "*":
+                continue
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                logger.warning(f"忽略无效的 IP/网段: {entry}")
+                continue
+            if network.version == 6 and network.network_address.ipv4_mapped is not None \
+                    and network.prefixlen >= 96:
+                mapped = network.network_address.ipv4_mapped
+                network = ipaddress.ip_network(f"{mapped}/{network.prefixlen - 96}")
+            ranges[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+
+        self._intervals = {version: self._merge(items) for version, items in ranges.items()}
+
+    @staticmethod
+    def _merge(ranges: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+        """合并重叠/相邻区间，返回 (起点列表, 终点列表)"""
+        starts, ends = [], []
+        for start, end in sorted(ranges):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    def __contains__(self, address) -> bool:
+        if self.match_all:
+            return True
+        if isinstance(address, str):
+            address = parse_ip(address)
+        if address is None:
+            return False
+        starts, ends = self._intervals[address.version]
+        value = int(address)
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+
+class IPAllowlist:
+    """编译后的白名单与可信代理"""
+
+    def __init__(self, allowed: Iterable[str], trusted_proxies: Iterable[str] = ()):
+        self.allowed = NetworkSet(allowed)
+        self.trusted_proxies = NetworkSet(trusted_proxies)
+
+    @classmethod
+    def from_settings(cls, settings=None) -> "IPAllowlist":
+        settings = settings or get_settings()
+        allowlist = cls(settings.ip_list, settings.trusted_proxies.split(","))
+        if not allowlist.allow_all and allowlist.trusted_proxies.match_all:
+            logger.warning("ALLOWED_IPS 已限制访问但 TRUSTED_PROXIES=*：客户端可伪造 X-Forwarded-For 绕过白名单")
+        return allowlist
+
+    @property
+    def allow_all(self) -> bool:
+        return self.allowed.match_all
+
+    def client_ip(self, peer: Optional[str], forwarded: Optional[str]) -> str:
+        """
+        确定客户端地址
+
+        直连地址是可信代理时，从 X-Forwarded-For 最右侧向左跳过可信代理，
+        第一个不可信的地址即客户端地址（全部可信时取最左侧）。
+        无直连地址（Unix socket 反代）视为本机可信代理。
+        """
+        client = peer or "unknown"
+        if not forwarded or (peer is not None and peer not in self.trusted_proxies):
+            return client
+        for hop in reversed(forwarded.split(",")):
+            hop = hop.strip()
+            if not hop:
+                continue
+            client = hop
+            if hop not in self.trusted_proxies:
+                break
+        return client
+
+    def is_allowed(self, client_ip: str) -> bool:
+        return client_ip in self.allowed
+
+
+class IPAllowlistMiddleware:
+    """IP 白名单中间件（HTTP + WebSocket）"""
+
+    def __init__(self, app: ASGIApp, allowlist: IPAllowlist):
+        self.app = app
+        self.allowlist = allowlist
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket") or self.allowlist.allow_all:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        client_ip = self.allowlist.client_ip(client[0] if client else None, forwarded)
+
+        if self.allowlist.is_allowed(client_ip):
+            await self.app(scope, receive, send)
+            return
+
+        logger.warning(f"拒绝非法 IP 访问: {client_ip}")
+        if scope["type"] == "websocket":
+            # 握手前关闭，客户端收到 403
+            await WebSocketClose(code=1008)(scope, receive, send)
+            return
+        response = JSONResponse(
+            status_code=403,
+            content={"code": 403, "message": f"Access denied from {client_ip}"}
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,169 @@
+"""
+抓取子进程事件流
+
+worker 设置 SCRAPE_EVENTS=1 启动抓取子进程（app.run_scrape）时，子进程的 stdout
+每行是一个 JSON 事件，worker 逐行读取（不缓存完整输出，内存占用与日志量无关）:
+
+    {"event": "phase_start", "phase": "lof.wait", "ts": 1760000000.0}
+    {"event": "phase_end", "phase": "lof.wait", "seconds": 1.234, "error": null, "ts": ...}
+    {"event": "dataset_start", "dataset": "lof", "ts": ...}
+    {"event": "retry", "dataset": "lof", "attempt": 1, "delay": 2.1, "error": "...", "ts": ...}
+    {"event": "dataset_end", "dataset": "lof", "status": "success", "rows": 312, "attempts": 1,
+     "version": 1024, "error": null, "ts": ...}
+    {"event": "log", "level": "INFO", "name": "app.scraper", "function": "run", "line": 1,
+     "message": "...", "ts": ...}
+
+不是 JSON 的行（第三方库直接写 stdout 的输出）按普通日志处理，错误级别的才计入任务错误；
+stderr 由 worker 单独读取，全部计入任务错误。
+未设置 SCRAPE_EVENTS 时（单独运行 python -m app.run_scrape）不输出事件，日志保持文本格式。
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+EVENTS_ENV = "SCRAPE_EVENTS"
+
+# 失败时写入任务错误信息的最近错误日志条数
+ERROR_LINES = 20
+
+_write_lock = threading.Lock()
+
+
+def events_enabled() -> bool:
+    return os.environ.get(EVENTS_ENV) == "1"
+
+
+def emit(event: str, **fields):
+    """输出一个事件（子进程中调用，未启用事件流时忽略）"""
+    if not events_enabled():
+        return
+    line = json.dumps({"event": event, **fields, "ts": round(time.time(), 3)}, ensure_ascii=False, default=str)
+    with _write_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def log_sink(message):
+    """loguru sink：日志作为 log 事件输出"""
+    record = message.record
+    fields = {
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    if record["exception"] is not None:
+        exc = record["exception"]
+        fields["exception"] = "".join(traceback.format_exception(exc.type, exc.value, exc.traceback))
+    emit("log", **fields)
+
+
+class LogHandler(logging.Handler):
+    """标准库 logging handler：日志作为 log 事件输出"""
+
+    def emit(self, record: logging.LogRecord):
+        fields = {
+            "level": record.levelname,
+            "name": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            fields["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        emit("log", **fields)
+
+
+def parse_line(line: str) -> Optional[Dict]:
+    """解析一行输出，是事件时返回事件字典"""
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and "event" in event else None
+
+
+class JobProgress:
+    """
+    任务执行进度（worker 侧，由事件更新）
+
+    读取线程更新、心跳线程保存到 scrape_job.progress，读写加锁。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phase: Optional[str] = None
+        self.phase_started_at: Optional[float] = None
+        self.datasets: Dict[str, Dict] = {}
+        self.errors = deque(maxlen=ERROR_LINES)
+        self.updated_at: Optional[float] = None
+        # 有未保存的变化
+        self.dirty = False
+
+    def apply(self, event: Dict):
+        """按事件更新进度"""
+        kind = event.get("event")
+        with self._lock:
+            if kind == "phase_start":
+                self.phase = event.get("phase")
+                self.phase_started_at = event.get("ts")
+            elif kind == "phase_end":
+                if event.get("phase") == self.phase:
+                    self.phase = self.phase_started_at = None
+            elif kind == "dataset_start":
+                self.datasets[event["dataset"]] = {"status": "running", "attempts": 1}
+            elif kind == "retry":
+                item = self.datasets.setdefault(event["dataset"], {"status": "running"})
+                item["attempts"] = event.get("attempt", 0) + 1
+                item["error"] = event.get("error")
+            elif kind == "dataset_end":
+                self.datasets[event["dataset"]] = {
+                    key: event.get(key) for key in ("status", "rows", "attempts", "version", "error")
+                }
+            elif kind == "log":
+                if event.get("level") in ("ERROR", "CRITICAL"):
+                    message = event.get("message", "")
+                    if event.get("exception"):
+                        message += "\n" + event["exception"]
+                    self.errors.append(message)
+                return
+            else:
+                return
+            self.updated_at = event.get("ts") or time.time()
+            self.dirty = True
+
+    def add_error(self, line: str):
+        """非事件的错误输出（stderr 中的异常堆栈、浏览器进程的错误输出等）"""
+        with self._lock:
+            self.errors.append(line)
+
+    def error_tail(self, limit: int) -> str:
+        """最近的错误（失败时写入任务错误信息）"""
+        with self._lock:
+            return "\n".join(self.errors)[-limit:]
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            self.dirty = False
+            return {
+                "phase": self.phase,
+                "phase_started_at": _isoformat(self.phase_started_at),
+                "datasets": {name: dict(item) for name, item in self.datasets.items()},
+                "updated_at": _isoformat(self.updated_at),
+            }
+
+
+def _isoformat(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
@@ -0,0 +1,264 @@
+"""
+抓取任务队列
+
+调度器（定时）或 API（按需）向 scrape_job 表入队，任意数量的 worker（app.worker，
+可运行在任意节点）用 SELECT ... FOR UPDATE SKIP LOCKED 领取，同一任务只会被一个
+worker 执行。入队时 NOTIFY scrape_job，空闲 worker 立即被唤醒。
+
+每个任务带有:
+- datasets: 数据集范围（空为全部）
+- priority: 越大越先领取
+- deadline: 截止时间，排队到截止时间仍未领取则过期；执行超时 = 截止时间 - 开始时间
+  （不超过 SCRAPE_JOB_TIMEOUT）
+
+执行中的任务由 worker 定期更新 heartbeat_at，超过 JOB_STALE_SECONDS 未更新
+（worker 进程退出或节点宕机）的任务标记为失败。
+
+单飞（single-flight）:
+- 提交（submit_job）在 advisory lock 下进行：已有未结束任务覆盖所需数据集时直接复用，
+  有排队任务时合并数据集范围，否则才入队，因此同一时间最多一个排队任务
+- 领取（claim_job）同样加锁，已有执行中的任务时不领取，任何时刻只有一个浏览器在抓取
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.leader import advisory_key
+from app.models import DATASET_MODELS, ScrapeJob, ScrapeLog
+
+NOTIFY_CHANNEL = "scrape_job"
+
+# 未结束的任务状态
+ACTIVE_STATUSES = ("queued", "running")
+
+# 抓取子进程（app.run_scrape）的返回码：0 全部成功，其余为以下状态或失败
+EXIT_PARTIAL = 3  # 部分数据集成功（成功的已提交）
+EXIT_SKIPPED = 4  # 熔断中，跳过本次抓取
+EXIT_STATUSES = {0: "success", EXIT_PARTIAL: "partial", EXIT_SKIPPED: "skipped"}
+
+# 提交与领取的事务级 advisory lock
+SUBMIT_LOCK = advisory_key("lof-monitor:scrape-submit")
+CLAIM_LOCK = advisory_key("lof-monitor:scrape-claim")
+
+
+def parse_datasets(value: Optional[str]) -> Optional[List[str]]:
+    """解析数据集范围，空表示全部；未知数据集抛出 ValueError"""
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in DATASET_MODELS]
+    if unknown:
+        raise ValueError(f"未知数据集: {','.join(unknown)}")
+    if not names or set(names) == set(DATASET_MODELS):
+        return None
+    # 按 DATASET_MODELS 的顺序保存，同一范围的任务 datasets 字段相同
+    return [name for name in DATASET_MODELS if name in names]
+
+
+def enqueue_job(db: Session, datasets: Optional[List[str]] = None, priority: int = 0,
+                deadline: Optional[datetime] = None, source: str = "schedule",
+                profile: bool = False, traceparent: Optional[str] = None) -> ScrapeJob:
+    """入队并通知空闲 worker（提交事务）"""
+    if deadline is None:
+        deadline = datetime.now() + timedelta(seconds=get_settings().scrape_job_deadline)
+    job = ScrapeJob(
+        datasets=",".join(datasets) if datasets else None,
+        priority=priority,
+        deadline=deadline,
+        source=source,
+        profile=profile,
+        traceparent=traceparent,
+        created_at=datetime.now(),
+    )
+    db.add(job)
+    db.flush()
+    # 事务提交后才送达
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": str(job.id)})
+    db.commit()
+    return job
+
+
+def find_active_job(db: Session, source: Optional[str] = None,
+                    datasets: Optional[List[str]] = None) -> Optional[ScrapeJob]:
+    """同一范围（与来源）尚未结束的任务"""
+    query = db.query(ScrapeJob).filter(
+        ScrapeJob.status.in_(ACTIVE_STATUSES),
+        ScrapeJob.datasets.is_(None) if not datasets else ScrapeJob.datasets == ",".join(datasets),
+    )
+    if source is not None:
+        query = query.filter(ScrapeJob.source == source)
+    return query.order_by(ScrapeJob.id).first()
+
+
+def active_jobs(db: Session, source: Optional[str] = None) -> List[ScrapeJob]:
+    """尚未结束的任务（任意数据集范围）"""
+    query = db.query(ScrapeJob).filter(ScrapeJob.status.in_(ACTIVE_STATUSES))
+    if source is not None:
+        query = query.filter(ScrapeJob.source == source)
+    return query.order_by(ScrapeJob.id).all()
+
+
+def job_datasets(job: ScrapeJob) -> Optional[List[str]]:
+    """任务的数据集范围（None 为全部）"""
+    return job.datasets.split(",") if job.datasets else None
+
+
+def covers(job: ScrapeJob, datasets: Optional[List[str]]) -> bool:
+    """任务范围是否包含所需数据集"""
+    scope = job_datasets(job)
+    if scope is None:
+        return True
+    return datasets is not None and set(datasets) <= set(scope)
+
+
+def submit_job(db: Session, datasets: Optional[List[str]] = None, priority: int = 0,
+               deadline: Optional[datetime] = None, source: str = "schedule",
+               profile: bool = False, traceparent: Optional[str] = None) -> Tuple[ScrapeJob, bool]:
+    """
+    单飞提交（提交事务）
+
+    Returns:
+        (任务, 是否合并到已有任务)：已有未结束任务覆盖所需数据集时返回该任务；
+        有排队任务时把数据集并入其中（优先级、截止时间取较大者）；否则新入队
+    """
+    # 并发提交串行化，避免同时各自入队
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SUBMIT_LOCK})
+    pending = active_jobs(db)
+    queued = next((job for job in pending if job.status == "queued"), None)
+
+    job = next((job for job in pending if covers(job, datasets)), None)
+    if job is None and queued is not None:
+        job = queued
+        merged = parse_datasets(",".join(set(job_datasets(job) or DATASET_MODELS) | set(datasets or DATASET_MODELS)))
+        job.datasets = ",".join(merged) if merged else None
+        job.priority = max(job.priority, priority)
+        if deadline is None:
+            deadline = datetime.now() + timedelta(seconds=get_settings().scrape_job_deadline)
+        job.deadline = max(job.deadline, deadline) if job.deadline else None
+    if job is None:
+        return enqueue_job(db, datasets, priority, deadline, source, profile, traceparent), False
+
+    if profile and job.status == "queued":
+        job.profile = True
+    db.commit()
+    return job, True
+
+
+def last_scrape_times(db: Session, datasets: Optional[List[str]] = None) -> Dict[str, Optional[datetime]]:
+    """各数据集最近一次抓取（成功或失败）的时间"""
+    times = {}
+    for name in datasets or DATASET_MODELS:
+        times[name] = db.query(func.max(ScrapeLog.scrape_time)).filter(
+            # 按数据集记录日志之前的日志 dataset 为空（全部数据集）
+            or_(ScrapeLog.dataset == name, ScrapeLog.dataset.is_(None))
+        ).scalar()
+    return times
+
+
+def claim_job(db: Session, worker: str) -> Optional[ScrapeJob]:
+    """
+    领取优先级最高的排队任务（跳过其他 worker 正在领取的行），没有时返回 None
+
+    已有执行中的任务时不领取（同一账号同一时间只开一个浏览器）
+    """
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK}).scalar():
+        # 其他 worker 正在领取
+        db.rollback()
+        return None
+    if db.query(ScrapeJob.id).filter(ScrapeJob.status == "running").first() is not None:
+        db.rollback()
+        return None
+
+    now = datetime.now()
+    candidate = select(ScrapeJob.id).where(
+        ScrapeJob.status == "queued",
+        or_(ScrapeJob.deadline.is_(None), ScrapeJob.deadline > now),
+    ).order_by(ScrapeJob.priority.desc(), ScrapeJob.id).limit(1).with_for_update(skip_locked=True)
+
+    job = db.execute(
+        update(ScrapeJob).where(ScrapeJob.id == candidate.scalar_subquery()).values(
+            status="running", started_at=now, heartbeat_at=now, worker=worker,
+        ).returning(ScrapeJob).execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if job is not None:
+        # 提交后仍可读取属性（任务在 worker 中长时间使用，不绑定会话）
+        db.expunge(job)
+    db.commit()
+    return job
+
+
+def heartbeat(db: Session, job_id: int, progress: Optional[Dict] = None):
+    """更新心跳时间（与执行进度）"""
+    values = {ScrapeJob.heartbeat_at: datetime.now()}
+    if progress is not None:
+        values[ScrapeJob.progress] = progress
+    db.query(ScrapeJob).filter(ScrapeJob.id == job_id, ScrapeJob.status == "running").update(
+        values, synchronize_session=False
+    )
+    db.commit()
+
+
+def finish_job(db: Session, job_id: int, status: str, returncode: Optional[int] = None,
+               error_message: Optional[str] = None, progress: Optional[Dict] = None):
+    values = {
+        ScrapeJob.status: status,
+        ScrapeJob.finished_at: datetime.now(),
+        ScrapeJob.returncode: returncode,
+        ScrapeJob.error_message: error_message,
+    }
+    if progress is not None:
+        values[ScrapeJob.progress] = progress
+    db.query(ScrapeJob).filter(ScrapeJob.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+def expire_jobs(db: Session, stale_seconds: int) -> int:
+    """排队超过截止时间的任务标记为 expired，心跳超时的执行中任务标记为 failed"""
+    now = datetime.now()
+    expired = db.query(ScrapeJob).filter(
+        ScrapeJob.status == "queued", ScrapeJob.deadline <= now
+    ).update({ScrapeJob.status: "expired", ScrapeJob.finished_at: now}, synchronize_session=False)
+    lost = db.query(ScrapeJob).filter(
+        ScrapeJob.status == "running",
+        ScrapeJob.heartbeat_at < now - timedelta(seconds=stale_seconds),
+    ).update({
+        ScrapeJob.status: "failed",
+        ScrapeJob.finished_at: now,
+        ScrapeJob.error_message: "worker 心跳超时（进程退出或节点宕机）",
+    }, synchronize_session=False)
+    db.commit()
+    return expired + lost
+
+
+def prune_jobs(db: Session, retention_days: int) -> int:
+    """删除保留期之前已结束的任务"""
+    deleted = db.query(ScrapeJob).filter(
+        ScrapeJob.status.notin_(ACTIVE_STATUSES),
+        ScrapeJob.created_at < datetime.now() - timedelta(days=retention_days),
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def queue_summary(db: Session) -> Dict:
+    """排队与执行中的任务数、最早排队任务的等待秒数"""
+    counts = dict(db.query(ScrapeJob.status, func.count()).filter(
+        ScrapeJob.status.in_(ACTIVE_STATUSES)
+    ).group_by(ScrapeJob.status).all())
+    oldest = db.query(func.min(ScrapeJob.created_at)).filter(ScrapeJob.status == "queued").scalar()
+    return {
+        "queued": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "oldest_queued_seconds": round((datetime.now() - oldest).total_seconds(), 1) if oldest else None,
+    }
+
+
+def job_timeout(job: ScrapeJob, now: Optional[datetime] = None) -> float:
+    """任务的执行超时（秒）：距截止时间的剩余时间，不超过 SCRAPE_JOB_TIMEOUT"""
+    limit = float(get_settings().scrape_job_timeout)
+    if job.deadline is None:
+        return limit
+    remaining = (job.deadline - (now or datetime.now())).total_seconds()
+    return max(1.0, min(limit, remaining))
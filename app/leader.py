@@ -0,0 +1,159 @@
+"""
+调度器选主（Postgres advisory lock）
+
+多个 uvicorn worker 或多副本部署时，每个进程都会启动调度器；只有持有
+advisory lock 的进程（leader）安排抓取，其余进程只提供 API。
+
+- 选主: 用独立连接（不占用连接池）执行 pg_try_advisory_lock，成功即为 leader。
+  锁是会话级的，leader 进程退出或连接断开时由 Postgres 自动释放
+- 续约: leader 每 LEADER_CHECK_INTERVAL 秒在该连接上执行一次查询，连接失效即
+  放弃 leader 身份（停止安排抓取）；TCP keepalive 保证网络中断时服务端也能及时释放锁
+- 故障转移: 其他进程每 LEADER_CHECK_INTERVAL 秒尝试加锁，原 leader 失效后
+  最多一个检查间隔（加上连接断开的检测时间）即由新 leader 接管
+"""
+
+import hashlib
+import os
+import socket
+import threading
+from typing import Callable, Optional
+
+from loguru import logger
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.config import get_settings
+
+LOCK_NAME = "lof-monitor:scrape-scheduler"
+
+# 选主连接的 TCP keepalive（秒）：网络中断约 25 秒后连接被判定失效
+KEEPALIVE_ARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 10,
+    "keepalives_interval": 5,
+    "keepalives_count": 3,
+}
+
+
+def advisory_key(name: str) -> int:
+    """锁名称转为 pg_advisory_lock 的 bigint 键"""
+    return int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+class LeaderElection:
+    """基于 advisory lock 的选主，leader 变化时调用 on_elected / on_lost"""
+
+    def __init__(self, database_url: str, name: str = LOCK_NAME, interval: float = 10,
+                 on_elected: Callable[[], None] = None, on_lost: Callable[[], None] = None):
+        self.key = advisory_key(name)
+        self.interval = interval
+        self.on_elected = on_elected
+        self.on_lost = on_lost
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._engine = create_engine(
+            database_url, poolclass=NullPool, connect_args=KEEPALIVE_ARGS,
+            isolation_level="AUTOCOMMIT",
+        )
+        self._conn = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _set_leader(self, is_leader: bool):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        callback = self.on_elected if is_leader else self.on_lost
+        if is_leader:
+            logger.info(f"成为调度 leader（{self.node_id}）")
+        else:
+            logger.warning(f"失去调度 leader 身份（{self.node_id}）")
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"leader 变更回调失败: {e}")
+
+    def check(self):
+        """尝试加锁（follower）或确认连接仍有效（leader）"""
+        try:
+            if self._conn is None:
+                self._conn = self._engine.connect()
+            if self.is_leader:
+                self._conn.execute(text("SELECT 1"))
+            elif self._conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+            ).scalar():
+                self._set_leader(True)
+        except Exception as e:
+            logger.warning(f"选主连接异常: {e}")
+            self._close()
+            self._set_leader(False)
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def start(self):
+        """立即检查一次（单实例部署时启动即为 leader），之后在后台定期检查"""
+        self.check()
+        if not self.is_leader:
+            logger.info(f"其他进程是调度 leader，本进程（{self.node_id}）只提供 API")
+        self._thread = threading.Thread(target=self._loop, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止选主并主动释放锁，其他进程可立即接管"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.is_leader and self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            except Exception:
+                pass
+        self._close()
+        self._set_leader(False)
+        self._engine.dispose()
+
+
+class StaticLeader:
+    """关闭选主时使用：本进程始终是 leader"""
+
+    def __init__(self, on_elected: Callable[[], None] = None, on_lost: Callable[[], None] = None):
+        self.on_elected = on_elected
+        self.on_lost = on_lost
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+
+    def start(self):
+        self.is_leader = True
+        if self.on_elected is not None:
+            self.on_elected()
+
+    def stop(self):
+        self.is_leader = False
+
+
+# 全局实例
+_leader = None
+
+
+def get_leader_election():
+    """获取选主单例（回调由调用方在 start 前设置）"""
+    global _leader
+    if _leader is None:
+        settings = get_settings()
+        if settings.leader_election:
+            _leader = LeaderElection(settings.database_url, interval=settings.leader_check_interval)
+        else:
+            _leader = StaticLeader()
+    return _leader
@@ -3,15 +3,24 @@ LOF 溢价监控服务 - 主入口
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 import sys
 
 from app.config import get_settings
 from app.database import init_db
-from app.api.endpoints import router as api_router
+from app.api.endpoints import router as api_router, verify_token
 from app.scheduler import get_scheduler
+from app.leader import get_leader_election
+from app.worker import ScrapeWorker
+from app.fund_index import get_fund_index
+from app.push import get_push_broker
+from app.ip_allowlist import IPAllowlist, IPAllowlistMiddleware
+from app.metrics import MetricsMiddleware, update_scrape_metrics
+from app.tracing import TracingMiddleware
+from app.request_profiling import RequestProfilerMiddleware, get_request_profiler
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 
 # 配置日志
@@ -23,6 +32,13 @@ logger.add(
 )
 
 
+def on_job_finished(job, status: str):
+    """内置 worker 完成任务后：新快照已发布时重建基金索引，并更新抓取指标"""
+    if status in ("success", "partial"):
+        get_fund_index().refresh()
+    update_scrape_metrics()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
@@ -32,11 +48,25 @@ async def lifespan(app: FastAPI):
     # 初始化数据库
     logger.info("初始化数据库...")
     init_db()
+    update_scrape_metrics()
     
-    # 启动定时任务
+    # 启动定时任务（多进程/多副本部署时只有选为 leader 的进程安排抓取）
     logger.info("启动定时任务调度器...")
     scheduler = get_scheduler()
-    scheduler.start(run_immediately=True)
+    leader = get_leader_election()
+    leader.on_elected = lambda: scheduler.start(run_immediately=True)
+    leader.on_lost = scheduler.suspend
+    leader.start()
+    
+    # 内置抓取 worker（独立部署 worker 时关闭）
+    worker = None
+    if settings.scrape_embedded_worker:
+        worker = ScrapeWorker(on_finished=on_job_finished)
+        worker.start()
+    
+    # 启动变更推送任务
+    push_broker = get_push_broker()
+    push_broker.start()
     
     logger.info("应用启动完成")
     
@@ -44,7 +74,14 @@ async def lifespan(app: FastAPI):
     
     # 关闭时
     logger.info("应用关闭中...")
+    await push_broker.stop()
+    leader.stop()
     scheduler.stop()
+    if worker is not None:
+        worker.stop()
+    request_profiler = get_request_profiler()
+    if request_profiler is not None:
+        request_profiler.flush()
     logger.info("应用已关闭")
 
 
@@ -67,33 +104,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.middleware("http")
-async def check_ip_middleware(request, call_next):
-    """IP 白名单检查中间件"""
-    ip_list = settings.ip_list
-    
-    # 如果允许所有，直接通过
-    if "*" in ip_list:
-        return await call_next(request)
-    
-    # 获取真实 IP (优先 X-Forwarded-For，适配 Docker/Nginx)
-    forwarded = request.headers.get("X-Forwarded-For")
-    if forwarded:
-        client_ip = forwarded.split(",")[0].strip()
-    else:
-        client_ip = request.client.host if request.client else "unknown"
-        
-    # 检查是否在白名单中
-    if client_ip not in ip_list:
-        logger.warning(f"拒绝非法 IP 访问: {client_ip}")
-        # 这里返回 JSON 响应
-        from fastapi.responses import JSONResponse
-        return JSONResponse(
-            status_code=403,
-            content={"code": 403, "message": f"Access denied from {client_ip}"}
-        )
-        
-    return await call_next(request)
+# 请求采样分析（最内层，只统计应用本身的耗时；未开启时直接透传）
+app.add_middleware(RequestProfilerMiddleware)
+
+# IP 白名单（启动时编译，同时检查 HTTP 与 WebSocket）
+ip_allowlist = IPAllowlist.from_settings(settings)
+app.add_middleware(IPAllowlistMiddleware, allowlist=ip_allowlist)
+
+# 请求指标（最外层，被白名单拒绝的请求也会统计）
+app.add_middleware(MetricsMiddleware)
+
+# 分布式追踪（TRACE_EXPORTER 为空时直接透传）
+app.add_middleware(TracingMiddleware)
 
 # 注册路由
 app.include_router(api_router, prefix="/api")
@@ -105,6 +127,14 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics(token: str = Depends(verify_token)):
+    """Prometheus 指标（需要认证，抓取配置中设置 Bearer Token）"""
+    # 抓取可能由其他节点的 worker 执行，抓取相关指标从数据库读取
+    update_scrape_metrics()
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
 @app.get("/")
 def root():
     """根路径"""
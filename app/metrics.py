@@ -0,0 +1,182 @@
+"""
+Prometheus 指标
+
+- HTTP: 按路由模板统计请求数、耗时与响应大小（未匹配路由归为 unmatched，
+  避免路径参数导致标签爆炸）
+- 数据库: 每条 SQL 的执行耗时（SQLAlchemy 事件），连接池使用情况（抓取时读取）
+- 序列化: 数据集行转字典的耗时
+- 抓取: 最近一次耗时与各阶段耗时、各数据集行数、各结果的运行次数
+
+HTTP、数据库、序列化指标是进程内计数，记录一次只需一次加锁累加，可常开。
+抓取可能由独立 worker 执行，抓取指标从数据库读取（update_scrape_metrics）。
+"""
+
+import time
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from loguru import logger
+
+from app.database import SessionLocal, engine
+from app.models import DATASET_MODELS, ScrapeLog, ScrapeRun
+from app.routing import route_template
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "SET"}
+
+HTTP_REQUESTS = Counter(
+    "lof_http_requests_total", "HTTP 请求数", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "lof_http_request_duration_seconds", "HTTP 请求耗时（流式响应为发送完毕的时间）",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "lof_http_response_size_bytes", "HTTP 响应体大小", ["route"], buckets=SIZE_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram(
+    "lof_db_query_duration_seconds", "SQL 执行耗时", ["operation"], buckets=LATENCY_BUCKETS
+)
+SERIALIZE_LATENCY = Histogram(
+    "lof_serialization_duration_seconds", "数据集序列化耗时", ["dataset", "format"],
+    buckets=LATENCY_BUCKETS
+)
+SCRAPE_DURATION = Gauge(
+    "lof_scrape_last_duration_seconds", "最近一次抓取耗时"
+)
+SCRAPE_LAST_SUCCESS = Gauge(
+    "lof_scrape_last_success_timestamp_seconds", "最近一次成功抓取的时间（Unix 时间戳）"
+)
+SCRAPE_ROWS = Gauge(
+    "lof_scrape_rows", "当前快照各数据集行数", ["dataset"]
+)
+SCRAPE_PHASE = Gauge(
+    "lof_scrape_phase_seconds", "最近一次抓取各阶段耗时", ["phase"]
+)
+
+
+class PoolCollector:
+    """SQLAlchemy 连接池使用情况（Prometheus 抓取时读取）"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def collect(self):
+        metrics = (
+            ("lof_db_pool_size", "连接池大小", self.pool.size()),
+            ("lof_db_pool_checked_out", "已借出的连接数", self.pool.checkedout()),
+            ("lof_db_pool_checked_in", "池中空闲连接数", self.pool.checkedin()),
+            ("lof_db_pool_overflow", "超出 pool_size 的连接数（可为负）", self.pool.overflow()),
+        )
+        for name, documentation, value in metrics:
+            yield GaugeMetricFamily(name, documentation, value=value)
+
+
+REGISTRY.register(PoolCollector(engine.pool))
+
+
+class ScrapeRunCollector:
+    """各结果的抓取运行次数（scrape_run 表，update_scrape_metrics 时读取）"""
+
+    def __init__(self):
+        self.counts = {}
+
+    def collect(self):
+        family = CounterMetricFamily("lof_scrape_runs", "抓取运行次数", labels=["result"])
+        for status, count in sorted(self.counts.items()):
+            family.add_metric([status], count)
+        yield family
+
+
+SCRAPE_RUNS = ScrapeRunCollector()
+REGISTRY.register(SCRAPE_RUNS)
+
+
+def update_run_counts(db):
+    """按结果统计已结束的抓取运行"""
+    SCRAPE_RUNS.counts = dict(db.query(ScrapeRun.status, func.count()).filter(
+        ScrapeRun.finished_at.is_not(None)
+    ).group_by(ScrapeRun.status).all())
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    operation = statement.lstrip()[:10].split(None, 1)[0].upper() if statement.strip() else ""
+    DB_QUERY_LATENCY.labels(operation if operation in SQL_OPERATIONS else "OTHER").observe(elapsed)
+
+
+def update_scrape_metrics():
+    """读取最近一次抓取运行与各数据集行数（抓取任务结束后调用）"""
+    db = SessionLocal()
+    try:
+        update_run_counts(db)
+        # 最近一次结束的运行：总耗时，公共阶段与各数据集日志中的阶段合并
+        last = db.query(ScrapeRun).filter(
+            ScrapeRun.finished_at.is_not(None)
+        ).order_by(ScrapeRun.id.desc()).first()
+        if last is not None and last.duration_seconds is not None:
+            SCRAPE_DURATION.set(float(last.duration_seconds))
+        if last is not None:
+            phases = dict(last.phases or {})
+            for (log_phases,) in db.query(ScrapeLog.phases).filter(ScrapeLog.run_id == last.id):
+                phases.update(log_phases or {})
+            SCRAPE_PHASE.clear()
+            for phase, seconds in phases.items():
+                SCRAPE_PHASE.labels(phase).set(seconds)
+        last_success = db.query(ScrapeLog).filter(
+            ScrapeLog.status == "success"
+        ).order_by(ScrapeLog.id.desc()).first()
+        if last_success is not None:
+            SCRAPE_LAST_SUCCESS.set(last_success.scrape_time.timestamp())
+        for name, model in DATASET_MODELS.items():
+            SCRAPE_ROWS.labels(name).set(db.query(func.count(model.id)).scalar())
+    except Exception as e:
+        logger.warning(f"更新抓取指标失败: {e}")
+    finally:
+        db.close()
+
+
+class MetricsMiddleware:
+    """HTTP 请求指标中间件"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope, "unmatched")
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_RESPONSE_SIZE.labels(route).observe(size)
@@ -4,11 +4,110 @@
 
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Text, Date, BigInteger
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Text, Date, BigInteger, Boolean, Index, JSON, func
+from sqlalchemy.dialects.postgresql import JSONB
 from app.database import Base
 
 
-class LOFData(Base):
+def _to_float(value):
+    """Decimal 转 float（空值或 0 返回 None，与历史输出保持一致）"""
+    return float(value) if value else None
+
+
+def _to_isoformat(value):
+    """日期转 ISO 字符串"""
+    return value.isoformat() if value else None
+
+
+def _split_tags(value):
+    """逗号分隔的标签转列表"""
+    return value.split(",") if value else []
+
+
+def _plain_fields(*names):
+    """原样输出的字段元数据"""
+    return tuple((name, name, None) for name in names)
+
+
+def _color_styles(*names, extra=None):
+    """
+    文字颜色样式元数据
+    默认每个字段对应 `<字段名>_color` 列，extra 可追加其他样式属性
+    """
+    extra = extra or {}
+    return tuple(
+        (name, (("color", f"{name}_color"),) + extra.get(name, ()))
+        for name in names
+    )
+
+
+class SerializeMixin:
+    """
+    基于字段元数据的序列化
+    行式 (to_dict) 与列式输出共用同一份字段定义
+    """
+    
+    # 输出字段: (字段名, 列属性名, 转换函数)
+    DATA_FIELDS = ()
+    # 样式字段: (字段名, ((样式属性, 列属性名), ...))
+    STYLE_FIELDS = ()
+    
+    # 筛选/排序字段 -> 列属性名（premium/volume/change_pct 需为数值列）
+    QUERY_COLUMNS = {}
+    # 标签列（逗号分隔），None 表示不支持按标签筛选
+    TAG_COLUMN = None
+    
+    @classmethod
+    def field_names(cls) -> list[str]:
+        """可输出的字段名（不含 styles）"""
+        return [name for name, _, _ in cls.DATA_FIELDS]
+    
+    @classmethod
+    def columns_for(cls, fields=None) -> list:
+        """
+        获取输出指定字段所需的数据库列
+        fields 为 None 表示全部字段；包含 "styles" 时附带所选字段的样式列
+        """
+        attrs = [
+            attr for name, attr, _ in cls.DATA_FIELDS
+            if fields is None or name in fields
+        ]
+        if fields is None or "styles" in fields:
+            attrs += [
+                attr for name, props in cls.STYLE_FIELDS
+                if fields is None or name in fields
+                for _, attr in props
+            ]
+        return [getattr(cls, attr) for attr in attrs]
+    
+    @classmethod
+    def serialize(cls, row, fields=None) -> dict:
+        """
+        序列化一行数据（模型实例或按列查询的结果行均可）
+        fields 为 None 表示全部字段
+        """
+        data = {}
+        for name, attr, convert in cls.DATA_FIELDS:
+            if fields is not None and name not in fields:
+                continue
+            value = getattr(row, attr)
+            data[name] = convert(value) if convert else value
+        
+        # 样式信息
+        if fields is None or "styles" in fields:
+            data["styles"] = {
+                name: {prop: getattr(row, attr) for prop, attr in props}
+                for name, props in cls.STYLE_FIELDS
+                if fields is None or name in fields
+            }
+        return data
+    
+    def to_dict(self):
+        """转换为字典"""
+        return self.serialize(self)
+
+
+class LOFData(SerializeMixin, Base):
     """LOF 基金数据表"""
     __tablename__ = "lof_data"
     
@@ -70,55 +169,65 @@ class LOFData(Base):
     # 时间戳
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
-            "fund_code": self.fund_code,
-            "fund_name": self.fund_name,
-            "fund_tags": self.fund_tags.split(",") if self.fund_tags else [],
-            "price": float(self.price) if self.price else None,
-            "change_pct": float(self.change_pct) if self.change_pct else None,
-            "volume": self.volume,
-            "amount": float(self.amount) if self.amount else None,
-            "nav": float(self.nav) if self.nav else None,
-            "nav_date": self.nav_date.isoformat() if self.nav_date else None,
-            "estimate_nav": float(self.estimate_nav) if self.estimate_nav else None,
-            "premium_rate": float(self.premium_rate) if self.premium_rate else None,
-            "shares": float(self.shares) if self.shares else None,
-            "shares_change": float(self.shares_change) if self.shares_change else None,
-            "apply_fee": self.apply_fee,
-            "apply_status": self.apply_status,
-            "apply_limit": self.apply_limit,
-            "redeem_fee": self.redeem_fee,
-            "redeem_status": self.redeem_status,
-            "fund_company": self.fund_company,
-            # 样式信息
-            "styles": {
-                "fund_code": { "color": self.fund_code_color },
-                "fund_name": { "color": self.fund_name_color },
-                "price": { "color": self.price_color },
-                "change_pct": { "color": self.change_pct_color },
-                "volume": { "color": self.volume_color },
-                "amount": { "color": self.amount_color },
-                "premium_rate": { "color": self.premium_rate_color },
-                "estimate_nav": { "color": self.estimate_nav_color },
-                "nav": { "color": self.nav_color },
-                "nav_date": { "color": self.nav_date_color },
-                "shares": { "color": self.shares_color },
-                "shares_change": { "color": self.shares_change_color },
-                "apply_fee": { "color": self.apply_fee_color },
-                "apply_status": { 
-                    "color": self.apply_status_color,
-                    "backgroundColor": self.apply_status_bg_color
-                },
-                "redeem_fee": { "color": self.redeem_fee_color },
-                "redeem_status": { "color": self.redeem_status_color },
-                "fund_company": { "color": self.fund_company_color }
-            }
-        }
+    # 输出字段: (字段名, 列属性名, 转换函数)
+    DATA_FIELDS = (
+        ("fund_code", "fund_code", None),
+        ("fund_name", "fund_name", None),
+        ("fund_tags", "fund_tags", _split_tags),
+        ("price", "price", _to_float),
+        ("change_pct", "change_pct", _to_float),
+        ("volume", "volume", None),
+        ("amount", "amount", _to_float),
+        ("nav", "nav", _to_float),
+        ("nav_date", "nav_date", _to_isoformat),
+        ("estimate_nav", "estimate_nav", _to_float),
+        ("premium_rate", "premium_rate", _to_float),
+        ("shares", "shares", _to_float),
+        ("shares_change", "shares_change", _to_float),
+        ("apply_fee", "apply_fee", None),
+        ("apply_status", "apply_status", None),
+        ("apply_limit", "apply_limit", None),
+        ("redeem_fee", "redeem_fee", None),
+        ("redeem_status", "redeem_status", None),
+        ("fund_company", "fund_company", None),
+    )
+    
+    # 样式字段: (字段名, ((样式属性, 列属性名), ...))
+    STYLE_FIELDS = _color_styles(
+        "fund_code", "fund_name", "price", "change_pct", "volume", "amount",
+        "premium_rate", "estimate_nav", "nav", "nav_date", "shares",
+        "shares_change", "apply_fee", "apply_status", "redeem_fee",
+        "redeem_status", "fund_company",
+        extra={"apply_status": (("backgroundColor", "apply_status_bg_color"),)},
+    )
+    
+    QUERY_COLUMNS = {
+        "premium": "premium_rate",
+        "volume": "amount",  # 成交额(万元)，与 QDII/指数 LOF 的 volume 口径一致
+        "change_pct": "change_pct",
+        "fund_code": "fund_code",
+        "fund_company": "fund_company",
+    }
+    TAG_COLUMN = "fund_tags"
+    
+    # 历史记录字段: 历史列 -> 数据列
+    HISTORY_COLUMNS = {"premium_rate": "premium_rate", "price": "price", "nav": "nav"}
+    
+    __table_args__ = (
+        # 筛选/排序索引（与 ORDER BY ... DESC NULLS LAST, id 一致）
+        Index("ix_lof_data_amount", amount.desc().nulls_last(), id),
+        Index("ix_lof_data_change_pct", change_pct.desc().nulls_last(), id),
+        Index("ix_lof_data_fund_company", fund_company),
+        Index("ix_lof_data_apply_status", apply_status),
+        Index(
+            "ix_lof_data_fund_tags",
+            func.string_to_array(fund_tags, ","),
+            postgresql_using="gin",
+        ),
+    )
 
 
-class QDIIData(Base):
+class QDIIData(SerializeMixin, Base):
     """QDII 基金数据表（原始文本存储）"""
     __tablename__ = "qdii_data"
     
@@ -153,6 +262,19 @@ class QDIIData(Base):
     manage_fee = Column(String(50), comment="管托费")
     fund_company = Column(String(100), comment="基金公司")
     
+    # 数值列（由原始文本解析，用于排序/分页）
+    premium_rate_value = Column(Numeric(10, 3), nullable=True, comment="实时溢价率数值(%)")
+    change_pct_value = Column(Numeric(10, 3), nullable=True, comment="涨幅数值(%)")
+    volume_value = Column(Numeric(15, 2), nullable=True, comment="成交额数值(万元)")
+    
+    __table_args__ = (
+        # 筛选/排序索引（与 ORDER BY ... DESC NULLS LAST, id 一致）
+        Index("ix_qdii_data_premium_rate_value", premium_rate_value.desc().nulls_last(), id),
+        Index("ix_qdii_data_change_pct_value", change_pct_value.desc().nulls_last(), id),
+        Index("ix_qdii_data_volume_value", volume_value.desc().nulls_last(), id),
+        Index("ix_qdii_data_fund_company", fund_company),
+    )
+    
     # 样式信息 (全量字段)
     fund_code_color = Column(String(30), nullable=True)
     fund_name_color = Column(String(30), nullable=True)
@@ -179,58 +301,37 @@ class QDIIData(Base):
     # 时间戳
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
-            "fund_code": self.fund_code,
-            "fund_name": self.fund_name,
-            "price": self.price,
-            "change_pct": self.change_pct,
-            "volume": self.volume,
-            "shares": self.shares,
-            "shares_change": self.shares_change,
-            "nav_t2": self.nav_t2,
-            "nav_date": self.nav_date,
-            "valuation_t1": self.valuation_t1,
-            "valuation_date": self.valuation_date,
-            "premium_rate_t1": self.premium_rate_t1,
-            "rt_valuation": self.rt_valuation,
-            "rt_premium_rate": self.rt_premium_rate,
-            "benchmark": self.benchmark,
-            "apply_fee": self.apply_fee,
-            "apply_status": self.apply_status,
-            "redeem_fee": self.redeem_fee,
-            "redeem_status": self.redeem_status,
-            "manage_fee": self.manage_fee,
-            "fund_company": self.fund_company,
-            # 样式信息
-            "styles": {
-                "fund_code": { "color": self.fund_code_color },
-                "fund_name": { "color": self.fund_name_color },
-                "price": { "color": self.price_color },
-                "change_pct": { "color": self.change_pct_color },
-                "volume": { "color": self.volume_color },
-                "shares": { "color": self.shares_color },
-                "shares_change": { "color": self.shares_change_color },
-                "nav_t2": { "color": self.nav_t2_color },
-                "nav_date": { "color": self.nav_date_color },
-                "valuation_t1": { "color": self.valuation_t1_color },
-                "valuation_date": { "color": self.valuation_date_color },
-                "premium_rate_t1": { "color": self.premium_rate_t1_color },
-                "rt_valuation": { "color": self.rt_valuation_color },
-                "rt_premium_rate": { "color": self.rt_premium_rate_color },
-                "benchmark": { "color": self.benchmark_color },
-                "apply_fee": { "color": self.apply_fee_color },
-                "apply_status": { "color": self.apply_status_color },
-                "redeem_fee": { "color": self.redeem_fee_color },
-                "redeem_status": { "color": self.redeem_status_color },
-                "manage_fee": { "color": self.manage_fee_color },
-                "fund_company": { "color": self.fund_company_color }
-            }
-        }
+    # 输出字段（原始文本，不做转换）
+    DATA_FIELDS = _plain_fields(
+        "fund_code", "fund_name", "price", "change_pct", "volume", "shares",
+        "shares_change", "nav_t2", "nav_date", "valuation_t1",
+        "valuation_date", "premium_rate_t1", "rt_valuation",
+        "rt_premium_rate", "benchmark", "apply_fee", "apply_status",
+        "redeem_fee", "redeem_status", "manage_fee", "fund_company"
+    )
+    
+    QUERY_COLUMNS = {
+        "premium": "premium_rate_value",
+        "volume": "volume_value",
+        "change_pct": "change_pct_value",
+        "fund_code": "fund_code",
+        "fund_company": "fund_company",
+    }
+    
+    # 历史记录字段: 历史列 -> 数据列（文本列在写入时解析为数值）
+    HISTORY_COLUMNS = {"premium_rate": "premium_rate_value", "price": "price", "nav": "nav_t2"}
+    
+    # 样式字段
+    STYLE_FIELDS = _color_styles(
+        "fund_code", "fund_name", "price", "change_pct", "volume", "shares",
+        "shares_change", "nav_t2", "nav_date", "valuation_t1",
+        "valuation_date", "premium_rate_t1", "rt_valuation",
+        "rt_premium_rate", "benchmark", "apply_fee", "apply_status",
+        "redeem_fee", "redeem_status", "manage_fee", "fund_company"
+    )
 
 
-class LOFIndexData(Base):
+class LOFIndexData(SerializeMixin, Base):
     """LOF 指数基金数据表（原始文本存储，按溢价率倒序）"""
     __tablename__ = "lof_index_data"
     
@@ -270,6 +371,19 @@ class LOFIndexData(Base):
     fund_company = Column(String(100), comment="基金公司")
     remark = Column(String(200), comment="备注")
     
+    # 数值列（由原始文本解析，用于排序/分页）
+    premium_rate_value = Column(Numeric(10, 3), nullable=True, comment="溢价率数值(%)")
+    change_pct_value = Column(Numeric(10, 3), nullable=True, comment="涨幅数值(%)")
+    volume_value = Column(Numeric(15, 2), nullable=True, comment="成交额数值(万元)")
+    
+    __table_args__ = (
+        # 筛选/排序索引（与 ORDER BY ... DESC NULLS LAST, id 一致）
+        Index("ix_lof_index_data_premium_rate_value", premium_rate_value.desc().nulls_last(), id),
+        Index("ix_lof_index_data_change_pct_value", change_pct_value.desc().nulls_last(), id),
+        Index("ix_lof_index_data_volume_value", volume_value.desc().nulls_last(), id),
+        Index("ix_lof_index_data_fund_company", fund_company),
+    )
+    
     # 样式信息 (全量字段)
     fund_code_color = Column(String(30), nullable=True)
     fund_name_color = Column(String(30), nullable=True)
@@ -295,53 +409,93 @@ class LOFIndexData(Base):
     # 时间戳
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     
-    def to_dict(self):
-        """转换为字典"""
-        return {
-            "fund_code": self.fund_code,
-            "fund_name": self.fund_name,
-            "price": self.price,
-            "change_pct": self.change_pct,
-            "volume": self.volume,
-            "shares": self.shares,
-            "shares_change": self.shares_change,
-            "turnover_rate": self.turnover_rate,
-            "nav": self.nav,
-            "nav_date": self.nav_date,
-            "rt_valuation": self.rt_valuation,
-            "premium_rate": self.premium_rate,
-            "tracking_index": self.tracking_index,
-            "index_change_pct": self.index_change_pct,
-            "apply_fee": self.apply_fee,
-            "apply_status": self.apply_status,
-            "redeem_fee": self.redeem_fee,
-            "redeem_status": self.redeem_status,
-            "fund_company": self.fund_company,
-            "remark": self.remark,
-            # 样式信息
-            "styles": {
-                "fund_code": { "color": self.fund_code_color },
-                "fund_name": { "color": self.fund_name_color },
-                "price": { "color": self.price_color },
-                "change_pct": { "color": self.change_pct_color },
-                "volume": { "color": self.volume_color },
-                "shares": { "color": self.shares_color },
-                "shares_change": { "color": self.shares_change_color },
-                "turnover_rate": { "color": self.turnover_rate_color },
-                "nav": { "color": self.nav_color },
-                "nav_date": { "color": self.nav_date_color },
-                "rt_valuation": { "color": self.rt_valuation_color },
-                "premium_rate": { "color": self.premium_rate_color },
-                "tracking_index": { "color": self.tracking_index_color },
-                "index_change_pct": { "color": self.index_change_pct_color },
-                "apply_fee": { "color": self.apply_fee_color },
-                "apply_status": { "color": self.apply_status_color },
-                "redeem_fee": { "color": self.redeem_fee_color },
-                "redeem_status": { "color": self.redeem_status_color },
-                "fund_company": { "color": self.fund_company_color },
-                "remark": { "color": self.remark_color }
-            }
-        }
+    # 输出字段（原始文本，不做转换）
+    DATA_FIELDS = _plain_fields(
+        "fund_code", "fund_name", "price", "change_pct", "volume", "shares",
+        "shares_change", "turnover_rate", "nav", "nav_date", "rt_valuation",
+        "premium_rate", "tracking_index", "index_change_pct", "apply_fee",
+        "apply_status", "redeem_fee", "redeem_status", "fund_company",
+        "remark"
+    )
+    
+    QUERY_COLUMNS = {
+        "premium": "premium_rate_value",
+        "volume": "volume_value",
+        "change_pct": "change_pct_value",
+        "fund_code": "fund_code",
+        "fund_company": "fund_company",
+    }
+    
+    # 历史记录字段: 历史列 -> 数据列（文本列在写入时解析为数值）
+    HISTORY_COLUMNS = {"premium_rate": "premium_rate_value", "price": "price", "nav": "nav"}
+    
+    # 样式字段
+    STYLE_FIELDS = _color_styles(
+        "fund_code", "fund_name", "price", "change_pct", "volume", "shares",
+        "shares_change", "turnover_rate", "nav", "nav_date", "rt_valuation",
+        "premium_rate", "tracking_index", "index_change_pct", "apply_fee",
+        "apply_status", "redeem_fee", "redeem_status", "fund_company",
+        "remark"
+    )
+
+
+class PremiumHistory(Base):
+    """溢价率历史表（每次发布快照时追加）"""
+    __tablename__ = "premium_history"
+    
+    id = Column(BigInteger, primary_key=True)
+    version = Column(Integer, nullable=False, comment="快照版本(抓取日志 id)")
+    recorded_at = Column(DateTime, nullable=False, comment="记录时间")
+    dataset = Column(String(20), nullable=False, comment="数据集: lof/qdii/lof_index")
+    fund_code = Column(String(20), nullable=False, comment="基金代码")
+    premium_rate = Column(Numeric(10, 3), nullable=True, comment="溢价率(%)")
+    price = Column(Numeric(10, 4), nullable=True, comment="场内价格")
+    nav = Column(Numeric(10, 4), nullable=True, comment="基金净值")
+    
+    __table_args__ = (
+        # 单只基金按时间范围查询
+        Index("ix_premium_history_fund_time", fund_code, dataset, recorded_at),
+        # 按保留期清理
+        Index("ix_premium_history_recorded_at", recorded_at),
+    )
+
+
+class PremiumHistoryDaily(Base):
+    """溢价率日汇总表（发布快照时更新当日数据，用于长时间范围查询）"""
+    __tablename__ = "premium_history_daily"
+    
+    fund_code = Column(String(20), primary_key=True, comment="基金代码")
+    dataset = Column(String(20), primary_key=True, comment="数据集: lof/qdii/lof_index")
+    day = Column(Date, primary_key=True, comment="日期")
+    premium_rate = Column(Numeric(10, 3), nullable=True, comment="当日平均溢价率(%)")
+    price = Column(Numeric(10, 4), nullable=True, comment="当日平均价格")
+    nav = Column(Numeric(10, 4), nullable=True, comment="当日平均净值")
+    sample_count = Column(Integer, nullable=False, comment="当日记录数")
+
+
+class SnapshotDiff(Base):
+    """快照差异记录（每次发布快照一条，标记该版本的差异已保存）"""
+    __tablename__ = "snapshot_diff"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False, comment="快照版本(抓取日志 id)")
+    previous_version = Column(Integer, nullable=True, comment="上一快照版本")
+    created_at = Column(DateTime, default=datetime.now, index=True, comment="创建时间")
+
+
+class SnapshotChange(Base):
+    """快照变化的行（相对上一版本新增/变化/删除）"""
+    __tablename__ = "snapshot_change"
+    
+    id = Column(BigInteger, primary_key=True)
+    version = Column(Integer, nullable=False, comment="快照版本")
+    dataset = Column(String(20), nullable=False, comment="数据集: lof/qdii/lof_index")
+    fund_code = Column(String(20), nullable=False, comment="基金代码")
+    op = Column(String(10), nullable=False, comment="upsert/remove")
+    row = Column(JSONB, nullable=True, comment="变化后的行（与列表接口格式一致），删除时为空")
+    
+    __table_args__ = (
+        Index("ix_snapshot_change_dataset_version", dataset, version),
+    )
 
 
 class ScrapeLog(Base):
@@ -351,9 +505,20 @@ class ScrapeLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     scrape_time = Column(DateTime, default=datetime.now, index=True, comment="抓取时间")
     status = Column(String(20), nullable=False, comment="状态: success/failed")
+    dataset = Column(String(20), nullable=True, comment="数据集: lof/qdii/lof_index（旧记录为空，表示全部）")
+    run_id = Column(Integer, nullable=True, index=True, comment="所属抓取运行 (scrape_run.id)")
     record_count = Column(Integer, default=0, comment="抓取记录数")
     error_message = Column(Text, nullable=True, comment="错误信息")
     duration_seconds = Column(Numeric(6, 2), nullable=True, comment="耗时(秒)")
+    attempts = Column(Integer, nullable=True, comment="尝试次数（含重试）")
+    # JSON 而非 JSONB：保留阶段的执行顺序
+    phases = Column(JSON, nullable=True, comment="各阶段耗时(秒)")
+    dataset_counts = Column(JSON, nullable=True, comment="各数据集抓取记录数")
+    
+    __table_args__ = (
+        # 各数据集最近一次抓取
+        Index("ix_scrape_log_dataset_time", dataset, scrape_time),
+    )
     
     def to_dict(self):
         """转换为字典"""
@@ -361,7 +526,117 @@ class ScrapeLog(Base):
             "id": self.id,
             "scrape_time": self.scrape_time.isoformat() if self.scrape_time else None,
             "status": self.status,
+            "dataset": self.dataset,
+            "run_id": self.run_id,
             "record_count": self.record_count,
             "error_message": self.error_message,
             "duration_seconds": float(self.duration_seconds) if self.duration_seconds else None,
+            "attempts": self.attempts,
+            "phases": self.phases,
+            "dataset_counts": self.dataset_counts,
+        }
+
+
+class ScrapeRun(Base):
+    """抓取运行记录（一次抓取子进程执行一条，各数据集的抓取日志通过 run_id 关联）"""
+    __tablename__ = "scrape_run"
+    
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.now, comment="开始时间")
+    finished_at = Column(DateTime, nullable=True, index=True, comment="结束时间，为空表示执行中或进程被结束")
+    status = Column(String(20), nullable=False, default="running", comment="状态: running/success/partial/failed")
+    datasets = Column(String(100), nullable=True, comment="数据集范围，逗号分隔，空为全部")
+    record_count = Column(Integer, nullable=False, default=0, comment="成功数据集的记录数之和")
+    duration_seconds = Column(Numeric(6, 2), nullable=True, comment="总耗时(秒)")
+    # 公共阶段（启动浏览器、登录等）；各数据集自身的阶段在其抓取日志中
+    phases = Column(JSON, nullable=True, comment="公共阶段耗时(秒)")
+    error_message = Column(Text, nullable=True, comment="最近一次错误")
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "started_at": _to_isoformat(self.started_at),
+            "finished_at": _to_isoformat(self.finished_at),
+            "status": self.status,
+            "datasets": self.datasets.split(",") if self.datasets else None,
+            "record_count": self.record_count,
+            "duration_seconds": float(self.duration_seconds) if self.duration_seconds else None,
+            "phases": self.phases,
+            "error_message": self.error_message,
         }
+
+
+class ScrapeJob(Base):
+    """抓取任务队列（调度器或 API 入队，worker 用 FOR UPDATE SKIP LOCKED 领取）"""
+    __tablename__ = "scrape_job"
+    
+    id = Column(Integer, primary_key=True)
+    datasets = Column(String(100), nullable=True, comment="数据集范围，逗号分隔，空为全部")
+    priority = Column(Integer, nullable=False, default=0, comment="优先级，越大越先执行")
+    status = Column(String(20), nullable=False, default="queued", comment="状态: queued/running/success/partial/skipped/failed/expired")
+    source = Column(String(20), nullable=False, default="schedule", comment="来源: schedule/api")
+    profile = Column(Boolean, nullable=False, default=False, comment="是否做性能分析")
+    traceparent = Column(String(55), nullable=True, comment="入队时的 trace 上下文")
+    created_at = Column(DateTime, nullable=False, default=datetime.now, index=True, comment="入队时间")
+    deadline = Column(DateTime, nullable=True, comment="截止时间，未在此前完成则过期/超时")
+    started_at = Column(DateTime, nullable=True, comment="开始执行时间")
+    heartbeat_at = Column(DateTime, nullable=True, comment="worker 最近心跳时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+    worker = Column(String(100), nullable=True, comment="执行的 worker（主机名:PID）")
+    returncode = Column(Integer, nullable=True, comment="抓取子进程返回码")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+    progress = Column(JSON, nullable=True, comment="执行进度（当前阶段、各数据集结果）")
+    
+    __table_args__ = (
+        # 领取顺序：只索引排队中的任务
+        Index("ix_scrape_job_queue", priority.desc(), id, postgresql_where=(status == "queued")),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "datasets": self.datasets.split(",") if self.datasets else None,
+            "priority": self.priority,
+            "status": self.status,
+            "source": self.source,
+            "profile": self.profile,
+            "created_at": _to_isoformat(self.created_at),
+            "deadline": _to_isoformat(self.deadline),
+            "started_at": _to_isoformat(self.started_at),
+            "finished_at": _to_isoformat(self.finished_at),
+            "worker": self.worker,
+            "returncode": self.returncode,
+            "error_message": self.error_message,
+            "progress": self.progress,
+        }
+
+
+class SchemaFingerprint(Base):
+    """已应用的表结构指纹（启动时一致则跳过建表检查）"""
+    __tablename__ = "schema_fingerprint"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    fingerprint = Column(String(64), nullable=False, comment="模型 DDL 的 SHA-256")
+    applied_at = Column(DateTime, default=datetime.now, comment="应用时间")
+
+
+class CircuitBreaker(Base):
+    """抓取熔断器状态（所有 worker 共享）"""
+    __tablename__ = "circuit_breaker"
+    
+    name = Column(String(50), primary_key=True, comment="熔断器名称")
+    failures = Column(Integer, nullable=False, default=0, comment="连续失败次数")
+    cooldown_seconds = Column(Integer, nullable=True, comment="当前冷却时间(秒)，熔断后每次试探失败加倍")
+    opened_until = Column(DateTime, nullable=True, comment="熔断截止时间，为空表示未熔断")
+    last_error = Column(Text, nullable=True, comment="最近一次失败原因")
+    updated_at = Column(DateTime, default=datetime.now, comment="更新时间")
+
+
+# 数据集名称 -> 模型
+DATASET_MODELS = {
+    "lof": LOFData,
+    "qdii": QDIIData,
+    "lof_index": LOFIndexData,
+}
@@ -0,0 +1,112 @@
+"""
+抓取任务性能分析（cProfile）
+
+开启方式:
+- 环境变量 SCRAPE_PROFILE=true: 每次抓取都分析
+- POST /api/profiles/next: 只分析下一次抓取（调度器给子进程设置 SCRAPE_PROFILE）
+
+每次分析在 PROFILE_DIR 下写入两个文件：
+- <名称>.prof: pstats 二进制，可用 snakeviz / python -m pstats 打开
+- <名称>.txt: 按累计耗时与自身耗时排序的前若干个函数，可直接阅读
+
+超过 PROFILE_RETENTION 个时删除最旧的分析结果。
+"""
+
+import cProfile
+import io
+import pstats
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import get_settings
+
+# 文本摘要中列出的函数数
+SUMMARY_LINES = 40
+
+PROFILE_NAME_PATTERN = re.compile(r"^[a-z_]+_\d{8}_\d{6}(_\d+)?\.(prof|txt)$")
+
+
+def profile_dir() -> Path:
+    return Path(get_settings().profile_dir)
+
+
+def _summary(profiler: cProfile.Profile) -> str:
+    """文本摘要：累计耗时与自身耗时各取前 SUMMARY_LINES 个函数"""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs()
+    stream.write("=== 按累计耗时 (cumulative) ===\n")
+    stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    stream.write("\n=== 按自身耗时 (tottime) ===\n")
+    stats.sort_stats("tottime").print_stats(SUMMARY_LINES)
+    return stream.getvalue()
+
+
+def _unique_stem(directory: Path, label: str) -> str:
+    stem = f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    candidate, index = stem, 1
+    while (directory / f"{candidate}.prof").exists():
+        candidate = f"{stem}_{index}"
+        index += 1
+    return candidate
+
+
+def run_profiled(label: str, func: Callable, *args, **kwargs):
+    """在 cProfile 下执行 func，写入分析结果并清理过期文件"""
+    directory = profile_dir()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            stem = _unique_stem(directory, label)
+            profiler.dump_stats(str(directory / f"{stem}.prof"))
+            (directory / f"{stem}.txt").write_text(_summary(profiler), encoding="utf-8")
+            logger.info(f"性能分析结果已保存: {directory / stem}.prof")
+            prune_profiles()
+        except Exception as e:
+            logger.warning(f"保存性能分析结果失败: {e}")
+
+
+def prune_profiles():
+    """只保留最近 PROFILE_RETENTION 次分析"""
+    retention = get_settings().profile_retention
+    profiles = sorted(profile_dir().glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in profiles[retention:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".txt").unlink(missing_ok=True)
+
+
+def list_profiles() -> List[Dict]:
+    """最近的分析结果（新的在前）"""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    items = []
+    for path in sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True):
+        if not PROFILE_NAME_PATTERN.match(path.name):
+            continue
+        stat = path.stat()
+        summary = path.with_suffix(".txt")
+        items.append({
+            "name": path.stem,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "size": stat.st_size,
+            "files": [path.name] + ([summary.name] if summary.exists() else []),
+        })
+    return items
+
+
+def profile_file(filename: str) -> Optional[Path]:
+    """按文件名取分析结果（只允许 list_profiles 中的文件名，防止路径穿越）"""
+    if not PROFILE_NAME_PATTERN.match(filename):
+        return None
+    path = profile_dir() / filename
+    return path if path.is_file() else None
@@ -0,0 +1,236 @@
+"""
+快照变更推送（SSE / WebSocket）
+
+每个进程一个扇出任务：定期检查快照版本，版本变化时对比基金索引的新旧版本，
+得到各数据集新增/变化/删除的行，再按订阅条件分发给所有订阅者。
+
+- 计算差异只依赖内存中的基金索引（见 app/fund_index.py），不按订阅者查询数据库
+- 订阅条件相同的订阅者共用同一份编码后的消息
+- 消费过慢（队列已满）的订阅者收到 resync 事件，需重新拉取 /api/snapshot
+"""
+
+import asyncio
+import json
+from typing import Dict, FrozenSet, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.fund_index import get_fund_index
+from app.models import DATASET_MODELS
+
+# 每个订阅者最多积压的消息数
+SUBSCRIBER_QUEUE_SIZE = 16
+
+# 尚无快照时的索引状态 (version, update_time, entries, premiums)
+EMPTY_STATE = (None, None, {}, {})
+
+
+def diff_state(old_entries: Dict, new_entries: Dict,
+               old_premiums: Dict, new_premiums: Dict) -> Dict[str, Dict[str, list]]:
+    """
+    对比基金索引的两个版本
+
+    Returns:
+        {数据集: {"upserts": [(基金代码, 新行, 新溢价率, 旧溢价率)], "removed": [(基金代码, 旧溢价率)]}}
+    """
+    changes = {name: {"upserts": [], "removed": []} for name in DATASET_MODELS}
+
+    for code, entry in new_entries.items():
+        old_entry = old_entries.get(code)
+        old_rows = old_entry["datasets"] if old_entry else {}
+        for name, row in entry["datasets"].items():
+            if old_rows.get(name) != row:
+                key = (name, code)
+                changes[name]["upserts"].append(
+                    (code, row, new_premiums.get(key), old_premiums.get(key))
+                )
+
+    for code, old_entry in old_entries.items():
+        new_entry = new_entries.get(code)
+        new_rows = new_entry["datasets"] if new_entry else {}
+        for name in old_entry["datasets"]:
+            if name not in new_rows:
+                changes[name]["removed"].append((code, old_premiums.get((name, code))))
+
+    return changes
+
+
+class Subscription:
+    """订阅者：订阅的数据集、筛选条件与待发送队列"""
+
+    def __init__(self, datasets: Tuple[str, ...], premium_min: Optional[float] = None,
+                 fund_codes: Optional[FrozenSet[str]] = None):
+        self.datasets = datasets
+        self.premium_min = premium_min
+        self.fund_codes = fund_codes
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    @property
+    def key(self) -> tuple:
+        """筛选条件（条件相同的订阅者共用消息）"""
+        return self.datasets, self.premium_min, self.fund_codes
+
+    def send(self, message: "PushMessage"):
+        """放入队列；积压过多时清空并通知客户端重新同步"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(encode_event("resync", {"type": "resync"}))
+
+
+def _premium_match(premium_min: Optional[float], *values: Optional[float]) -> bool:
+    """溢价率达到阈值（变化前后任一满足即推送，客户端可得知基金跌出阈值）"""
+    if premium_min is None:
+        return True
+    return any(value is not None and value >= premium_min for value in values)
+
+
+def filter_changes(changes: Dict[str, Dict[str, list]], datasets: Tuple[str, ...],
+                   premium_min: Optional[float], fund_codes: Optional[FrozenSet[str]]) -> Dict[str, Dict]:
+    """按订阅条件筛选差异，返回可直接输出的结构"""
+    result = {}
+    for name in datasets:
+        upserts = [
+            row for code, row, premium, old_premium in changes[name]["upserts"]
+            if (fund_codes is None or code in fund_codes) and _premium_match(premium_min, premium, old_premium)
+        ]
+        removed = [
+            code for code, old_premium in changes[name]["removed"]
+            if (fund_codes is None or code in fund_codes) and _premium_match(premium_min, old_premium)
+        ]
+        if upserts or removed:
+            result[name] = {"upserts": upserts, "removed": removed}
+    return result
+
+
+class PushMessage(NamedTuple):
+    """推送消息（data 为已编码的 JSON，所有订阅者共用）"""
+    event: str
+    data: str
+    id: Optional[int] = None
+
+    def sse(self) -> str:
+        """SSE 格式"""
+        head = f"id: {self.id}\n" if self.id is not None else ""
+        return f"{head}event: {self.event}\ndata: {self.data}\n\n"
+
+
+def encode_event(event: str, data: dict, event_id: Optional[int] = None) -> PushMessage:
+    """编码推送消息"""
+    return PushMessage(event, json.dumps(data, ensure_ascii=False, separators=(",", ":")), event_id)
+
+
+class PushBroker:
+    """进程内推送扇出"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._state = None
+
+    def subscribe(self, subscription: Subscription):
+        self.subscribers.add(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def snapshot_event(self, subscription: Subscription) -> PushMessage:
+        """当前快照的全部匹配行（订阅时可选发送）"""
+        version, update_time, entries, premiums = get_fund_index().state()
+        changes = diff_state({}, entries, {}, premiums)
+        data = {
+            "type": "snapshot",
+            "version": version,
+            "update_time": update_time,
+            "datasets": filter_changes(changes, *subscription.key),
+        }
+        return encode_event("snapshot", data, version)
+
+    def publish(self, previous: tuple, current: tuple):
+        """对比两个索引状态并推送给所有订阅者"""
+        old_version, _, old_entries, old_premiums = previous
+        version, update_time, entries, premiums = current
+        changes = diff_state(old_entries, entries, old_premiums, premiums)
+
+        messages: Dict[tuple, Optional[PushMessage]] = {}
+        sent = 0
+        for subscription in list(self.subscribers):
+            key = subscription.key
+            if key not in messages:
+                datasets = filter_changes(changes, *key)
+                messages[key] = encode_event("diff", {
+                    "type": "diff",
+                    "version": version,
+                    "previous_version": old_version,
+                    "update_time": update_time,
+                    "datasets": datasets,
+                }, version) if datasets else None
+            if messages[key] is not None:
+                subscription.send(messages[key])
+                sent += 1
+
+        logger.info(
+            f"推送快照变更 {old_version} -> {version}，订阅者 {len(self.subscribers)}，"
+            f"发送 {sent}，消息种类 {len(messages)}"
+        )
+
+    def advance(self, state: tuple):
+        """
+        索引版本变化时推送差异
+
+        首次检查只记录状态（已有快照由订阅时的 hello/snapshot 提供）；
+        检查到尚无快照后出现的首个快照全部作为新增推送。
+        """
+        if self._state is None:
+            self._state = state if state[0] else EMPTY_STATE
+            return
+        if not state[0]:
+            self._state = EMPTY_STATE
+            return
+        if state[0] != self._state[0]:
+            previous, self._state = self._state, state
+            self.publish(previous, state)
+
+    async def run(self):
+        """扇出任务：定期检查快照版本"""
+        index = get_fund_index()
+        while True:
+            try:
+                # 无订阅者时不查询数据库（索引仍可能被调度器或查询接口刷新）
+                if self.subscribers:
+                    await run_in_threadpool(index.refresh)
+                self.advance(index.state())
+            except Exception as e:
+                logger.warning(f"推送任务检查快照失败: {e}")
+            await asyncio.sleep(self.settings.push_check_interval)
+
+    def start(self):
+        """启动扇出任务（需在事件循环中调用）"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局推送实例
+_broker: PushBroker = None
+
+
+def get_push_broker() -> PushBroker:
+    """获取推送单例"""
+    global _broker
+    if _broker is None:
+        _broker = PushBroker()
+    return _broker
@@ -0,0 +1,342 @@
+"""
+API 请求采样分析
+
+用于定位偶发的慢请求（耗时在数据库、to_dict、JSON 编码还是 GC）。默认关闭，开启方式:
+- REQUEST_PROFILE_RATE: 按比例抽样分析请求（如 0.01）
+- REQUEST_PROFILE_SLOW_MS: 耗时超过阈值的请求都记录（开启后所有请求都会被采样，
+  结束时只保留慢请求）
+
+采样线程每 REQUEST_PROFILE_INTERVAL_MS 读取一次事件循环线程与线程池线程的调用栈
+（sys._current_frames，空闲等待的栈丢弃），按 "方法 路由;调用栈" 聚合为 folded 格式，
+可直接用 flamegraph.pl / speedscope 生成火焰图。并发请求时重叠期间的样本会同时计入，
+聚合结果仍反映整体热点。
+
+REQUEST_PROFILE_MEMORY=true 时启用 tracemalloc：抽样命中的请求（不含仅因超阈值保留的）
+在开始与结束时各取一次快照，按分配位置累计新增内存。tracemalloc 本身会让分配变慢，只在排查时开启。
+
+GC 暂停时间通过 gc.callbacks 统计，计入请求期间发生的 GC。
+
+聚合结果在内存中，每 FLUSH_INTERVAL 秒写入 PROFILE_DIR 下的
+api_requests.folded 与 api_requests_memory.txt。
+"""
+
+import gc
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+from app.routing import route_template
+
+# 写入文件的最小间隔（秒）
+FLUSH_INTERVAL = 10
+# 每次请求记录的 tracemalloc 差异条数
+MEMORY_TOP = 20
+# 不分析的路径（长连接与分析接口本身）
+EXCLUDED_PREFIXES = ("/api/stream", "/api/ws", "/api/profiles/requests")
+# 空闲等待的栈顶（事件循环等待 I/O、线程池等待任务）
+IDLE_FRAMES = {("selectors.py", "select"), ("queue.py", "get")}
+WORKER_THREAD_PREFIX = "AnyIO worker thread"
+
+FOLDED_FILE = "api_requests.folded"
+MEMORY_FILE = "api_requests_memory.txt"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    """栈中有空闲等待帧（事件循环 select / 线程池 queue.get）"""
+    while frame is not None:
+        if (Path(frame.f_code.co_filename).name, frame.f_code.co_name) in IDLE_FRAMES:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def fold_stack(frame) -> str:
+    """调用栈转为 folded 格式（根在前，分号分隔）"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class RequestRecord:
+    """一次请求的采样数据"""
+
+    __slots__ = ("selected", "loop_thread", "start", "gc_start", "stacks", "snapshot")
+
+    def __init__(self, selected: bool, loop_thread: int, gc_start: float):
+        self.selected = selected
+        self.loop_thread = loop_thread
+        self.start = time.perf_counter()
+        self.gc_start = gc_start
+        self.stacks: List[str] = []
+        self.snapshot = None
+
+
+class RequestProfiler:
+    """请求采样分析器（进程内聚合）"""
+
+    def __init__(self, rate: float, slow_seconds: Optional[float], interval: float,
+                 memory: bool, output_dir: str):
+        self.rate = rate
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.memory = memory
+        self.output_dir = Path(output_dir)
+
+        self.stacks: Counter = Counter()
+        self.routes: Dict[str, Dict] = {}
+        self.allocations: Dict[str, List[int]] = {}
+        self.gc_seconds = 0.0
+
+        self._active: Dict[int, RequestRecord] = {}
+        self._lock = threading.Lock()
+        self._has_active = threading.Event()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._gc_started = None
+
+        gc.callbacks.append(self._gc_callback)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    # ---------- 请求 ----------
+
+    def begin(self) -> Optional[RequestRecord]:
+        """请求开始，返回记录（不需要分析时为 None）"""
+        selected = self.rate > 0 and random.random() < self.rate
+        if not selected and self.slow_seconds is None:
+            return None
+        record = RequestRecord(selected, threading.get_ident(), self.gc_seconds)
+        if selected and self.memory:
+            record.snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._active[id(record)] = record
+            self._has_active.set()
+        return record
+
+    def finish(self, record: RequestRecord, label: str):
+        """请求结束，抽样命中或超过阈值时计入聚合结果"""
+        duration = time.perf_counter() - record.start
+        with self._lock:
+            self._active.pop(id(record), None)
+            if not self._active:
+                self._has_active.clear()
+
+        slow = self.slow_seconds is not None and duration >= self.slow_seconds
+        if not record.selected and not slow:
+            return
+
+        allocations = None
+        if record.snapshot is not None:
+            allocations = tracemalloc.take_snapshot().compare_to(record.snapshot, "lineno")[:MEMORY_TOP]
+
+        with self._lock:
+            route = self.routes.setdefault(
+                label, {"requests": 0, "slow": 0, "seconds": 0.0, "max_seconds": 0.0, "gc_seconds": 0.0}
+            )
+            route["requests"] += 1
+            route["slow"] += int(slow)
+            route["seconds"] += duration
+            route["max_seconds"] = max(route["max_seconds"], duration)
+            route["gc_seconds"] += self.gc_seconds - record.gc_start
+            for stack in record.stacks:
+                self.stacks[f"{label};{stack}"] += 1
+            for stat in allocations or ():
+                if stat.size_diff <= 0:
+                    continue
+                frame = stat.traceback[0]
+                site = self.allocations.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+                site[0] += stat.size_diff
+                site[1] += stat.count_diff
+            self._dirty = True
+
+        if slow:
+            logger.info(f"慢请求 {label}: {duration * 1000:.0f} ms，采样 {len(record.stacks)} 个栈")
+
+    # ---------- 采样 ----------
+
+    def _gc_callback(self, phase: str, info: Dict):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self.gc_seconds += time.perf_counter() - self._gc_started
+            self._gc_started = None
+
+    def _sample(self):
+        with self._lock:
+            records = list(self._active.values())
+        if not records:
+            return
+        frames = sys._current_frames()
+        threads = {record.loop_thread for record in records}
+        threads.update(
+            thread.ident for thread in threading.enumerate()
+            if thread.name.startswith(WORKER_THREAD_PREFIX)
+        )
+        stacks = [
+            fold_stack(frames[ident]) for ident in threads
+            if ident in frames and not _is_idle(frames[ident])
+        ]
+        for record in records:
+            record.stacks.extend(stacks)
+
+    def _sample_loop(self):
+        while True:
+            if not self._has_active.wait(FLUSH_INTERVAL):
+                self._maybe_flush()
+                continue
+            time.sleep(self.interval)
+            try:
+                self._sample()
+            except Exception as e:
+                logger.warning(f"请求采样失败: {e}")
+            self._maybe_flush()
+
+    # ---------- 输出 ----------
+
+    def folded(self) -> str:
+        """folded 格式的聚合调用栈（每行 "栈 样本数"）"""
+        with self._lock:
+            items = sorted(self.stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def memory_report(self) -> str:
+        with self._lock:
+            items = sorted(self.allocations.items(), key=lambda item: item[1][0], reverse=True)
+        lines = [f"{size / 1024:>12.1f} KiB {count:>10} blocks  {site}" for site, (size, count) in items]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def top_functions(self, limit: int = 20) -> List[Dict]:
+        """按自身样本数（栈顶）与累计样本数统计的热点函数"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        with self._lock:
+            items = list(self.stacks.items())
+        samples = sum(count for _, count in items)
+        for stack, count in items:
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [
+            {
+                "function": name,
+                "self_samples": count,
+                "self_share": round(count / samples, 4),
+                "total_share": round(total[name] / samples, 4),
+            }
+            for name, count in own.most_common(limit)
+        ]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            routes = {
+                label: {
+                    "requests": stats["requests"],
+                    "slow": stats["slow"],
+                    "avg_ms": round(stats["seconds"] / stats["requests"] * 1000, 1),
+                    "max_ms": round(stats["max_seconds"] * 1000, 1),
+                    "avg_gc_ms": round(stats["gc_seconds"] / stats["requests"] * 1000, 1),
+                }
+                for label, stats in self.routes.items()
+            }
+            samples = sum(self.stacks.values())
+            allocations = sorted(self.allocations.items(), key=lambda item: item[1][0], reverse=True)
+        return {
+            "samples": samples,
+            "routes": routes,
+            "top_functions": self.top_functions(),
+            "memory": [
+                {"site": site, "size": size, "count": count}
+                for site, (size, count) in allocations[:MEMORY_TOP]
+            ] if self.memory else None,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.routes.clear()
+            self.allocations.clear()
+            self._dirty = True
+
+    def _maybe_flush(self):
+        if self._dirty and time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """写入 folded 与内存报告文件"""
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            (self.output_dir / FOLDED_FILE).write_text(self.folded(), encoding="utf-8")
+            if self.memory:
+                (self.output_dir / MEMORY_FILE).write_text(self.memory_report(), encoding="utf-8")
+        except Exception as e:
+            logger.warning(f"写入请求分析结果失败: {e}")
+
+
+# 全局实例
+_profiler: Optional[RequestProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_request_profiler() -> Optional[RequestProfiler]:
+    """获取请求分析器单例（未开启时为 None）"""
+    global _profiler
+    if _profiler is None:
+        settings = get_settings()
+        if settings.request_profile_rate <= 0 and settings.request_profile_slow_ms <= 0:
+            return None
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = RequestProfiler(
+                    rate=settings.request_profile_rate,
+                    slow_seconds=settings.request_profile_slow_ms / 1000 if settings.request_profile_slow_ms > 0 else None,
+                    interval=settings.request_profile_interval_ms / 1000,
+                    memory=settings.request_profile_memory,
+                    output_dir=settings.profile_dir,
+                )
+                logger.info("请求采样分析已开启")
+    return _profiler
+
+
+class RequestProfilerMiddleware:
+    """请求采样分析中间件（未开启时直接透传）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        profiler = get_request_profiler() if scope["type"] == "http" else None
+        if profiler is None or scope["path"].startswith(EXCLUDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        record = profiler.begin()
+        if record is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.finish(record, f"{scope['method']} {route_template(scope, 'unmatched')}")
@@ -0,0 +1,27 @@
+"""
+请求的路由模板
+
+中间件（指标、追踪、请求采样）按路由模板（如 /api/fund/{fund_code}）而非实际路径
+归类请求，避免路径参数导致标签或名称爆炸。路由匹配后 Starlette 在 scope["endpoint"]
+中放入处理函数，由此反查其路由模板。
+"""
+
+import weakref
+from typing import Dict, Optional
+
+from starlette.types import Scope
+
+# 应用 -> {处理函数: 路由模板}，首次请求时从路由表构建
+_route_paths: "weakref.WeakKeyDictionary[object, Dict]" = weakref.WeakKeyDictionary()
+
+
+def route_template(scope: Scope, default: Optional[str] = None) -> Optional[str]:
+    """请求匹配的路由模板，未匹配（或尚未路由）时返回 default"""
+    app = scope["app"]
+    paths = _route_paths.get(app)
+    if paths is None:
+        paths = _route_paths[app] = {
+            route.endpoint: route.path
+            for route in app.routes if hasattr(route, "endpoint")
+        }
+    return paths.get(scope.get("endpoint"), default)
@@ -3,28 +3,38 @@ import logging
 import sys
 import os
 
-# 配置日志输出到 stdout
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
-
 # 确保当前目录在 python path 中
 sys.path.append(os.getcwd())
 
+from app import ipc
 from app.scraper import run_scrape, logger
+from app.jobs import EXIT_STATUSES
+
+if ipc.events_enabled():
+    # 由 worker 启动：stdout 为 JSON 事件流（见 app.ipc），日志作为 log 事件输出
+    logging.basicConfig(level=logging.INFO, handlers=[ipc.LogHandler()])
+    logger.remove()
+    logger.add(ipc.log_sink, level="INFO")
+else:
+    # 配置日志输出到 stdout
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+# 抓取结果 -> 返回码（worker 据此记录任务状态），失败为 1
+EXIT_CODES = {status: code for code, status in EXIT_STATUSES.items()}
 
 if __name__ == "__main__":
     logger.info("Subprocess: 启动抓取任务...")
     try:
-        success = run_scrape()
-        if success:
-            logger.info("Subprocess: 抓取任务成功")
-            sys.exit(0)
-        else:
+        status = run_scrape()
+        if status == "failed":
             logger.error("Subprocess: 抓取任务失败")
-            sys.exit(1)
+        else:
+            logger.info(f"Subprocess: 抓取任务结束（{status}）")
+        sys.exit(EXIT_CODES.get(status, 1))
     except Exception as e:
         logger.exception(f"Subprocess: 抓取任务异常: {e}")
         sys.exit(1)
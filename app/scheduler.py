@@ -1,15 +1,57 @@
 """
 定时任务调度模块
+
+启用交易日历（TRADING_CALENDAR=true，默认）时:
+- 交易时段内每 SCRAPE_SESSION_INTERVAL 分钟左右抓取一次，按近期溢价率波动加密或放宽
+- 交易日的交易时段外（SCRAPE_START_HOUR 至 SCRAPE_END_HOUR）按 SCRAPE_MIN_INTERVAL ~
+  SCRAPE_MAX_INTERVAL 稀疏抓取，开盘和收盘后各抓取一次
+- 周末与节假日不抓取
+
+各数据集独立调度（交易时段内的间隔见 SCRAPE_DATASET_INTERVALS），触发时把即将到期
+（COALESCE_RATIO 个间隔内）的数据集合并为一个任务，共用一次浏览器启动与登录。
 """
 
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
 from loguru import logger
 
 from app.config import get_settings
-from app.scraper import run_scrape
+from app.database import SessionLocal
+from app.history import premium_volatility, prune_history
+from app.jobs import parse_datasets, prune_jobs, submit_job
+from app.models import DATASET_MODELS
+from app.tracing import current_traceparent, span
+from app.trading_calendar import get_trading_calendar
+
+# 开盘后多久开始密集抓取（集思录行情刷新需要时间）
+SESSION_OPEN_DELAY = timedelta(minutes=1)
+# 收盘后多久抓取收盘数据
+SESSION_CLOSE_DELAY = timedelta(minutes=2)
+# 计算溢价率波动的时间窗口
+VOLATILITY_WINDOW = timedelta(minutes=30)
+# 交易时段抓取间隔系数范围（波动大时最多加密一倍，平稳时最多放宽一倍）
+VOLATILITY_FACTOR_RANGE = (0.5, 2.0)
+# 触发抓取时，在各自间隔的该比例内到期的数据集一并抓取（至少 COALESCE_WINDOW）
+COALESCE_RATIO = 0.25
+COALESCE_WINDOW = timedelta(minutes=1)
+
+
+def parse_intervals(value: str) -> Dict[str, float]:
+    """解析各数据集间隔 "lof:2,qdii:15"（分钟）"""
+    intervals = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, minutes = item.partition(":")
+        name = name.strip()
+        if not sep or name not in DATASET_MODELS:
+            raise ValueError(f"数据集间隔格式错误（应为 数据集:分钟）: {item}")
+        intervals[name] = float(minutes)
+    return intervals
 
 
 class ScrapeScheduler:
@@ -19,12 +61,20 @@ class ScrapeScheduler:
         self.settings = get_settings()
         self.scheduler = BackgroundScheduler()
         self.next_run_time: datetime = None
+        self.next_due: Dict[str, datetime] = {}  # 各数据集的下一次抓取时间
+        self.intervals: Dict[str, timedelta] = {}  # 各数据集当前的抓取间隔（用于合并）
+        self.session_intervals = parse_intervals(self.settings.scrape_dataset_intervals)
+        self.profile_next = False  # 下一次抓取是否做性能分析
+        self.active = False  # 本进程是否负责安排抓取（多进程部署时只有 leader 为 True）
+        self.history_pruned_on: Optional[date] = None  # 最近一次清理过期历史的日期
     
     def _is_in_scrape_hours(self, dt: datetime = None) -> bool:
-        """检查是否在允许抓取的时间段内"""
+        """检查是否在允许抓取的时间段内（启用交易日历时非交易日不抓取）"""
         if dt is None:
             dt = datetime.now()
         
+        if self.settings.trading_calendar and not get_trading_calendar().is_trading_day(dt.date()):
+            return False
         hour = dt.hour
         return self.settings.scrape_start_hour <= hour < self.settings.scrape_end_hour
     
@@ -35,83 +85,157 @@ class ScrapeScheduler:
             self.settings.scrape_max_interval
         )
     
-    def _calculate_next_run_time(self) -> datetime:
-        """计算下一次运行时间"""
-        now = datetime.now()
+    def _day_start(self, day: date) -> datetime:
+        """某天的首次抓取时间（开始时间后随机 0-30 分钟）"""
+        return datetime.combine(day, time(self.settings.scrape_start_hour, random.randint(0, 30)))
+    
+    def _volatility_factor(self, dataset: Optional[str] = None) -> float:
+        """
+        按近期溢价率波动调整交易时段抓取间隔的系数
+
+        相邻两次快照的平均变化高于 SCRAPE_VOLATILITY_REFERENCE 时系数小于 1（加密），
+        低于时大于 1（放宽），限制在 VOLATILITY_FACTOR_RANGE 内；没有足够数据时为 1
+        """
+        reference = self.settings.scrape_volatility_reference
+        if reference <= 0:
+            return 1.0
+        db = SessionLocal()
+        try:
+            volatility = premium_volatility(db, datetime.now() - VOLATILITY_WINDOW, dataset)
+        except Exception as e:
+            logger.warning(f"计算溢价率波动失败: {e}")
+            return 1.0
+        finally:
+            db.close()
+        if volatility is None:
+            return 1.0
+        low, high = VOLATILITY_FACTOR_RANGE
+        factor = reference / volatility if volatility > 0 else high
+        factor = min(high, max(low, factor))
+        logger.info(f"{dataset or '全部数据集'}近期溢价率平均变化 {volatility:.3f} 个百分点，抓取间隔系数 {factor:.2f}")
+        return factor
+    
+    def _calculate_next_run_time(self, now: datetime = None, dataset: Optional[str] = None) -> datetime:
+        """计算（某个数据集）下一次运行时间"""
+        if now is None:
+            now = datetime.now()
+        if not self.settings.trading_calendar:
+            return self._calculate_fixed_next_run_time(now)
+        
+        calendar = get_trading_calendar()
+        today = now.date()
         
+        # 非交易日安排到下一个交易日的开始时间
+        if not calendar.is_trading_day(today):
+            return self._day_start(calendar.next_trading_day(today))
+        if now.hour < self.settings.scrape_start_hour:
+            return self._day_start(today)
+        
+        session = calendar.current_session(now)
+        if session is not None:
+            # 交易时段内密集抓取，间隔按波动调整并随机浮动 ±20%
+            minutes = self.session_intervals.get(dataset, self.settings.scrape_session_interval)
+            minutes *= self._volatility_factor(dataset)
+            next_run = now + timedelta(minutes=minutes * random.uniform(0.8, 1.2))
+            # 收盘（含午间休市）后尽快抓取一次收盘数据
+            next_run = min(next_run, session[1] + SESSION_CLOSE_DELAY)
+        else:
+            # 交易时段外稀疏抓取，下一个交易时段开盘后立即开始密集抓取
+            next_run = now + timedelta(minutes=self._get_random_interval())
+            session_start = calendar.next_session_start(now)
+            if session_start is not None:
+                next_run = min(next_run, session_start + SESSION_OPEN_DELAY)
+        
+        # 超出今天的抓取结束时间，安排到下一个交易日
+        if next_run.date() != today or next_run.hour >= self.settings.scrape_end_hour:
+            next_run = self._day_start(calendar.next_trading_day(today))
+        return next_run
+    
+    def _calculate_fixed_next_run_time(self, now: datetime) -> datetime:
+        """不使用交易日历：每天抓取时间段内按固定随机间隔抓取"""
         # 如果当前不在抓取时间段，安排到下一个开始时间
         if not self._is_in_scrape_hours(now):
             if now.hour < self.settings.scrape_start_hour:
                 # 今天的开始时间
-                next_run = now.replace(
-                    hour=self.settings.scrape_start_hour,
-                    minute=random.randint(0, 30),
-                    second=0,
-                    microsecond=0
-                )
+                next_run = self._day_start(now.date())
             else:
                 # 明天的开始时间
-                next_run = (now + timedelta(days=1)).replace(
-                    hour=self.settings.scrape_start_hour,
-                    minute=random.randint(0, 30),
-                    second=0,
-                    microsecond=0
-                )
+                next_run = self._day_start(now.date() + timedelta(days=1))
         else:
             # 在抓取时间段内，随机间隔后执行
             interval_minutes = self._get_random_interval()
             next_run = now + timedelta(minutes=interval_minutes)
             
             # 如果计算出的时间超出了今天的抓取结束时间，安排到明天
-            if next_run.hour >= self.settings.scrape_end_hour:
-                next_run = (now + timedelta(days=1)).replace(
-                    hour=self.settings.scrape_start_hour,
-                    minute=random.randint(0, 30),
-                    second=0,
-                    microsecond=0
-                )
+            if next_run.date() != now.date() or next_run.hour >= self.settings.scrape_end_hour:
+                next_run = self._day_start(now.date() + timedelta(days=1))
         
         return next_run
     
+    def _due_datasets(self, now: datetime) -> List[str]:
+        """已到期或即将到期（可与本次合并）的数据集，按 DATASET_MODELS 顺序"""
+        due = []
+        for name in DATASET_MODELS:
+            window = max(COALESCE_WINDOW, self.intervals.get(name, timedelta(0)) * COALESCE_RATIO)
+            if self.next_due.get(name, now) <= now + window:
+                due.append(name)
+        return due
+    
     def _scrape_job(self):
-        """抓取任务（在独立进程中执行以避免与 asyncio 冲突）"""
-        import subprocess
-        import sys
+        """定时任务：向队列提交到期数据集的抓取任务（由 worker 在独立进程中执行）"""
+        if not self.active:
+            logger.info("本进程已不是调度 leader，跳过入队")
+            return
         
-        logger.info("定时任务触发，开始抓取...")
+        now = datetime.now()
+        due = self._due_datasets(now)
+        logger.info(f"定时任务触发，提交抓取任务（数据集: {','.join(due)}）...")
         
+        db = SessionLocal()
         try:
-            # 使用 subprocess 执行抓取，彻底隔离环境
-            logger.info("启动子进程执行抓取...")
-            result = subprocess.run(
-                [sys.executable, "-m", "app.run_scrape"],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5分钟超时
-            )
-            
-            # 输出子进程日志
-            if result.stdout:
-                logger.info(f"抓取子进程输出:\n{result.stdout}")
-            if result.stderr:
-                logger.warning(f"抓取子进程错误输出:\n{result.stderr}")
-                
-            if result.returncode == 0:
-                logger.info("抓取任务完成")
-            else:
-                logger.error(f"抓取任务失败，返回码: {result.returncode}")
-                
-        except subprocess.TimeoutExpired:
-            logger.error("抓取任务超时")
+            with span("scrape.enqueue", root=True, attributes={"job.datasets": ",".join(due)}):
+                if due:
+                    # 已有任务覆盖时复用、有排队任务时合并：worker 跟不上或全部离线时不堆积定时任务
+                    job, coalesced = submit_job(
+                        db, datasets=parse_datasets(",".join(due)), source="schedule",
+                        profile=self.profile_next, traceparent=current_traceparent(),
+                    )
+                    if self.profile_next and job.profile:
+                        logger.info("本次抓取开启性能分析")
+                        self.profile_next = False
+                    if coalesced:
+                        logger.info(f"合并到未结束的抓取任务 #{job.id}（{job.status}）")
+                    else:
+                        logger.info(f"已提交抓取任务 #{job.id}")
+            prune_jobs(db, self.settings.job_retention_days)
+            if self.history_pruned_on != now.date():
+                # 过期历史每天清理一次，不在每次发布快照时执行
+                deleted = prune_history(db, self.settings.history_retention_days)
+                self.history_pruned_on = now.date()
+                if deleted:
+                    logger.info(f"清理过期溢价率历史 {deleted} 条")
         except Exception as e:
-            logger.error(f"抓取任务异常: {e}")
+            logger.error(f"提交抓取任务失败: {e}")
         finally:
-            # 安排下一次任务
-            self._schedule_next()
+            db.close()
+            # 安排下一次任务（抓取期间失去 leader 身份时由新 leader 安排）
+            if self.active:
+                for name in due:
+                    self._schedule_dataset(name, now)
+                self._schedule_next()
+    
+    def _schedule_dataset(self, name: str, now: datetime = None):
+        """计算数据集的下一次抓取时间"""
+        now = now or datetime.now()
+        self.next_due[name] = self._calculate_next_run_time(now, name)
+        self.intervals[name] = self.next_due[name] - now
     
     def _schedule_next(self):
-        """安排下一次抓取任务"""
-        self.next_run_time = self._calculate_next_run_time()
+        """按最早到期的数据集安排下一次抓取任务"""
+        for name in DATASET_MODELS:
+            if name not in self.next_due:
+                self._schedule_dataset(name)
+        self.next_run_time = min(self.next_due.values())
         
         # 添加新任务
         self.scheduler.add_job(
@@ -121,37 +245,51 @@ class ScrapeScheduler:
             replace_existing=True
         )
         
-        logger.info(f"下一次抓取时间: {self.next_run_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        due = ", ".join(f"{name} {when.strftime('%H:%M:%S')}" for name, when in self.next_due.items())
+        logger.info(f"下一次抓取时间: {self.next_run_time.strftime('%Y-%m-%d %H:%M:%S')}（{due}）")
     
     def start(self, run_immediately: bool = True):
-        """启动调度器"""
+        """启动调度器并开始安排抓取（成为 leader 时调用）"""
         logger.info("启动定时任务调度器...")
         
-        # 启动调度器
-        self.scheduler.start()
+        # 启动调度器（失去 leader 后重新当选时已在运行）
+        if not self.scheduler.running:
+            self.scheduler.start()
+        self.active = True
+        self.next_due = {}
+        self.intervals = {}
         
         # 如果需要且在抓取时间段内，延迟几秒后执行首次抓取（避免阻塞启动）
         if run_immediately and self._is_in_scrape_hours():
             logger.info("安排首次抓取（5秒后执行）...")
-            self.next_run_time = datetime.now() + timedelta(seconds=5)
-            self.scheduler.add_job(
-                self._scrape_job,
-                trigger=DateTrigger(run_date=self.next_run_time),
-                id="scrape_job",
-                replace_existing=True
-            )
-        else:
-            # 安排下一次任务
-            self._schedule_next()
+            first_run = datetime.now() + timedelta(seconds=5)
+            self.next_due = {name: first_run for name in DATASET_MODELS}
+        # 安排下一次任务
+        self._schedule_next()
+    
+    def suspend(self):
+        """停止安排抓取（失去 leader 身份时调用），正在执行的抓取会继续完成"""
+        self.active = False
+        self.next_run_time = None
+        self.next_due = {}
+        if self.scheduler.running and self.scheduler.get_job("scrape_job") is not None:
+            self.scheduler.remove_job("scrape_job")
+        logger.info("已停止安排抓取")
     
     def stop(self):
         """停止调度器"""
         logger.info("停止定时任务调度器...")
-        self.scheduler.shutdown()
+        self.active = False
+        if self.scheduler.running:
+            self.scheduler.shutdown()
     
     def get_next_run_time(self) -> datetime:
         """获取下一次运行时间"""
         return self.next_run_time
+    
+    def get_next_due(self) -> Dict[str, datetime]:
+        """各数据集的下一次抓取时间"""
+        return dict(self.next_due)
 
 
 # 全局调度器实例
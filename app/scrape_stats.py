@@ -0,0 +1,222 @@
+"""
+抓取性能统计
+
+每次抓取（一个抓取子进程）对应一条运行记录 (scrape_run)，其中的各数据集各有一条
+抓取日志 (scrape_log，通过 run_id 关联)。统计在数据库中计算（按时间索引过滤窗口）：
+- 按运行: 耗时分位数（percentile_cont）、成功率、每次运行的记录数（scrape_run）
+- 各阶段耗时分位数及占比（json_each_text 展开 phases）：公共阶段（启动浏览器、登录）
+  取自运行记录，各数据集的阶段取自其抓取日志，每个阶段每次运行只计一次
+- 按数据集: 抓取次数、成功率、记录数与耗时（scrape_log，各数据集按自己的频率抓取）
+- 按时间桶的趋势，含与上一桶的 p50 变化（lag 窗口函数）
+
+耗时、记录数与阶段只统计成功的运行（数据集统计只统计成功的抓取日志）；部分成功的
+运行单独计数。未结束的运行（执行中或进程被结束）不计入。
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import Float, case, cast, func, literal, literal_column, select, type_coerce, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.orm import Session
+
+from app.models import ScrapeLog, ScrapeRun
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _round(value, digits: int = 3):
+    return round(float(value), digits) if value is not None else None
+
+
+def _percentiles(values) -> Dict[str, float]:
+    values = values or [None] * len(PERCENTILES)
+    return {f"p{int(p * 100)}": _round(v) for p, v in zip(PERCENTILES, values)}
+
+
+def _percentile_values(column):
+    """column 的 PERCENTILES 分位数（数组）"""
+    return type_coerce(
+        func.percentile_cont(array(PERCENTILES)).within_group(column), ARRAY(Float)
+    )
+
+
+def _success(column, status=ScrapeRun.status):
+    """只取成功的值（percentile_cont / avg 忽略 NULL）"""
+    return case((status == "success", column), else_=None)
+
+
+def _finished_runs(since: datetime):
+    """窗口内已结束的运行"""
+    return (ScrapeRun.finished_at >= since, ScrapeRun.status != "running")
+
+
+def window_summary(db: Session, since: datetime) -> Dict:
+    """时间窗口内的运行次数、成功率、耗时分位数与每次运行的记录数"""
+    duration = cast(ScrapeRun.duration_seconds, Float)
+    row = db.query(
+        func.count(),
+        func.count().filter(ScrapeRun.status == "success"),
+        func.count().filter(ScrapeRun.status == "partial"),
+        _percentile_values(_success(duration)),
+        func.avg(_success(duration)),
+        func.max(_success(duration)),
+        func.avg(_success(ScrapeRun.record_count)),
+        func.min(_success(ScrapeRun.record_count)),
+        func.max(_success(ScrapeRun.record_count)),
+        func.max(ScrapeRun.finished_at),
+    ).filter(*_finished_runs(since)).one()
+    runs, successes, partial, duration_percentiles, avg_duration, max_duration, \
+        avg_rows, min_rows, max_rows, last_run = row
+
+    return {
+        "runs": runs,
+        "successes": successes,
+        "partial": partial,
+        "failures": runs - successes - partial,
+        "success_rate": _round(successes / runs, 4) if runs else None,
+        "duration_seconds": {
+            **_percentiles(duration_percentiles),
+            "avg": _round(avg_duration),
+            "max": _round(max_duration),
+        },
+        "rows_per_run": {
+            "avg": _round(avg_rows, 1),
+            "min": min_rows,
+            "max": max_rows,
+        },
+        "last_run": last_run.isoformat() if last_run else None,
+    }
+
+
+def phase_breakdown(db: Session, since: datetime) -> List[Dict]:
+    """各阶段耗时分位数、平均值与占比（按总耗时倒序）"""
+    # 公共阶段：成功运行的运行记录
+    run_phases = func.json_each_text(ScrapeRun.phases).table_valued("key", "value").lateral()
+    shared = select(
+        run_phases.c.key.label("phase"), cast(run_phases.c.value, Float).label("seconds"),
+    ).select_from(ScrapeRun).join(run_phases, literal_column("true")).where(
+        *_finished_runs(since),
+        ScrapeRun.status == "success",
+        ScrapeRun.phases.is_not(None),
+    )
+    # 各数据集的阶段：成功运行中各数据集的抓取日志
+    log_phases = func.json_each_text(ScrapeLog.phases).table_valued("key", "value").lateral()
+    own = select(
+        log_phases.c.key.label("phase"), cast(log_phases.c.value, Float).label("seconds"),
+    ).select_from(ScrapeLog).join(ScrapeRun, ScrapeRun.id == ScrapeLog.run_id).join(
+        log_phases, literal_column("true")
+    ).where(
+        *_finished_runs(since),
+        ScrapeRun.status == "success",
+        ScrapeLog.phases.is_not(None),
+    )
+    samples = union_all(shared, own).subquery()
+
+    per_phase = select(
+        samples.c.phase,
+        func.count().label("runs"),
+        _percentile_values(samples.c.seconds).label("percentiles"),
+        func.avg(samples.c.seconds).label("avg"),
+        func.max(samples.c.seconds).label("max"),
+        func.sum(samples.c.seconds).label("total"),
+    ).group_by(samples.c.phase).subquery()
+
+    # 占比：阶段总耗时 / 所有阶段总耗时（各数据集抓取频率不同，按总耗时而非平均值计算）
+    share = per_phase.c.total / func.nullif(func.sum(per_phase.c.total).over(), 0)
+    query = select(per_phase, share.label("share")).order_by(per_phase.c.total.desc())
+
+    return [
+        {
+            "phase": row.phase,
+            "runs": row.runs,
+            **_percentiles(row.percentiles),
+            "avg": _round(row.avg),
+            "max": _round(row.max),
+            "share": _round(row.share, 4),
+        }
+        for row in db.execute(query)
+    ]
+
+
+def dataset_rows(db: Session, since: datetime) -> Dict[str, Dict]:
+    """各数据集的抓取次数、成功率、每次记录数与耗时分位数（每条抓取日志计一次）"""
+    duration = cast(ScrapeLog.duration_seconds, Float)
+    logs = select(
+        ScrapeLog.dataset.label("dataset"),
+        ScrapeLog.status.label("status"),
+        cast(ScrapeLog.record_count, Float).label("rows"),
+        duration.label("duration"),
+    ).where(ScrapeLog.scrape_time >= since, ScrapeLog.dataset.is_not(None))
+    # 按数据集记录之前的旧日志（一条对应全部数据集）：展开 dataset_counts，记录数为 0 视为失败
+    counts = func.json_each_text(ScrapeLog.dataset_counts).table_valued("key", "value").lateral()
+    legacy_rows = cast(counts.c.value, Float)
+    legacy = select(
+        counts.c.key,
+        case((legacy_rows > 0, literal("success")), else_=literal("failed")),
+        legacy_rows,
+        literal(None, Float),
+    ).select_from(ScrapeLog).join(counts, literal_column("true")).where(
+        ScrapeLog.scrape_time >= since,
+        ScrapeLog.dataset.is_(None),
+        ScrapeLog.status == "success",
+        ScrapeLog.dataset_counts.is_not(None),
+    )
+    samples = union_all(logs, legacy).subquery()
+    succeeded = samples.c.status == "success"
+
+    query = select(
+        samples.c.dataset,
+        func.count(),
+        func.count().filter(succeeded),
+        func.avg(samples.c.rows).filter(succeeded),
+        func.min(samples.c.rows).filter(succeeded),
+        func.max(samples.c.rows).filter(succeeded),
+        _percentile_values(_success(samples.c.duration, samples.c.status)),
+    ).group_by(samples.c.dataset).order_by(samples.c.dataset)
+
+    return {
+        name: {
+            "runs": runs,
+            "successes": successes,
+            "success_rate": _round(successes / runs, 4) if runs else None,
+            "avg": _round(avg, 1),
+            "min": int(low) if low is not None else None,
+            "max": int(high) if high is not None else None,
+            "duration_seconds": _percentiles(percentiles),
+        }
+        for name, runs, successes, avg, low, high, percentiles in db.execute(query)
+    }
+
+
+def duration_trend(db: Session, since: datetime, bucket_seconds: int) -> List[Dict]:
+    """按时间桶统计运行次数、成功率与耗时分位数，p50_change 为相对上一桶的变化"""
+    epoch = func.date_part("epoch", ScrapeRun.finished_at)
+    bucket = func.floor(epoch / bucket_seconds)
+    duration = cast(ScrapeRun.duration_seconds, Float)
+
+    per_bucket = select(
+        bucket.label("bucket"),
+        func.count().label("runs"),
+        func.count().filter(ScrapeRun.status == "success").label("successes"),
+        _percentile_values(_success(duration)).label("percentiles"),
+    ).where(*_finished_runs(since)).group_by(bucket).subquery()
+
+    p50 = per_bucket.c.percentiles[1]
+    query = select(
+        per_bucket,
+        (p50 - func.lag(p50).over(order_by=per_bucket.c.bucket)).label("p50_change"),
+    ).order_by(per_bucket.c.bucket)
+
+    return [
+        {
+            "start": (EPOCH + timedelta(seconds=row.bucket * bucket_seconds)).isoformat(),
+            "runs": row.runs,
+            "success_rate": _round(row.successes / row.runs, 4),
+            **_percentiles(row.percentiles),
+            "p50_change": _round(row.p50_change),
+        }
+        for row in db.execute(query)
+    ]
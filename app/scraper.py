@@ -5,22 +5,55 @@
 """
 
 import os
+import random
 import re
 import time
 from datetime import datetime, date
 from decimal import Decimal
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from playwright.sync_api import sync_playwright, Page, Browser, BrowserContext
 from loguru import logger
 
 from app.config import get_settings
 from app.database import SessionLocal
-from app.models import LOFData, ScrapeLog, QDIIData, LOFIndexData
+from app.models import DATASET_MODELS, ScrapeLog, ScrapeRun
+from app.snapshot import publish_snapshot
+from app.timing import PhaseTimer
+from app.profiling import run_profiled
+from app.tracing import parse_traceparent, span
+from app.jobs import parse_datasets
+from app import breaker, ipc
 
 # 登录状态保存路径
 AUTH_STATE_FILE = Path("/tmp/jisilu_auth_state.json")
 
+# 各数据集的抓取方法与日志名称
+DATASET_SCRAPERS = {
+    "lof": "scrape_lof_data",
+    "qdii": "scrape_qdii_data",
+    "lof_index": "scrape_lof_index_data",
+}
+DATASET_TITLES = {"lof": "LOF", "qdii": "QDII", "lof_index": "指数 LOF"}
+
+# 任务截止时间前预留的提交与关闭浏览器时间（秒）
+DEADLINE_RESERVE = 15
+# 剩余时间不足该值（秒）时不再开始新的数据集
+MIN_DATASET_SECONDS = 20
+
+
+class DatasetError(Exception):
+    """数据集重试用尽仍失败"""
+
+    def __init__(self, message: str, attempts: int):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+def retry_delay(attempt: int, base: float) -> float:
+    """第 attempt 次失败后的等待时间（秒）：指数退避，随机浮动 ±50% 避免整点重试"""
+    return base * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
 
 class JisiluScraper:
     """集思录数据抓取器"""
@@ -28,11 +61,23 @@ class JisiluScraper:
     LOGIN_URL = "https://www.jisilu.cn/account/login/"
     LOF_ARB_URL = "https://www.jisilu.cn/data/lof/#arb"
     
-    def __init__(self):
+    def __init__(self, datasets: Optional[List[str]] = None, deadline: Optional[float] = None):
         self.settings = get_settings()
+        # 本次抓取的数据集（None 为全部），未抓取的数据集在快照中保留旧数据
+        self.datasets = datasets
+        # 任务截止时间（Unix 时间戳）换算为 monotonic，预留提交与关闭浏览器的时间
+        self.run_deadline = (
+            time.monotonic() + deadline - time.time() - DEADLINE_RESERVE if deadline else None
+        )
+        self._deadline: Optional[float] = None  # 当前数据集的截止时间（monotonic）
+        self.outcomes: Dict[str, bool] = {}  # 各数据集是否成功
+        self.record_counts: Dict[str, int] = {}  # 成功数据集的记录数
+        self.run_id: Optional[int] = None  # 本次运行记录 (scrape_run.id)
+        self.last_error: Optional[str] = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
+        self.timer = PhaseTimer()
     
     def _parse_number(self, text: str) -> Optional[float]:
         """解析数字，处理百分号、万等单位"""
@@ -251,11 +296,13 @@ class JisiluScraper:
         
         try:
             # 如果当前不在 LOF 套利页面，则跳转
+            self.timer.start("lof.navigate")
             if "#arb" not in page.url:
-                page.goto(self.LOF_ARB_URL, wait_until="networkidle", timeout=30000)
+                page.goto(self.LOF_ARB_URL, wait_until="networkidle", timeout=self._timeout_ms(30000))
             
             # 等待表格加载（LOF套利页面使用 flex_arb 表格）
-            page.wait_for_selector("#flex_arb tbody tr", timeout=30000)
+            self.timer.start("lof.wait")
+            page.wait_for_selector("#flex_arb tbody tr", timeout=self._timeout_ms(30000))
             
             # 点击"全部"按钮，确保获取所有数据
             all_btn = page.query_selector("#apply_all")
@@ -264,6 +311,7 @@ class JisiluScraper:
                 time.sleep(2)  # 等待数据刷新
             
             # 提取表格数据
+            self.timer.start("lof.extract")
             rows = page.query_selector_all("#flex_arb tbody tr")
             logger.info(f"找到 {len(rows)} 行数据")
             
@@ -340,6 +388,7 @@ class JisiluScraper:
                     continue
             
             logger.info(f"成功解析 {len(data_list)} 条数据")
+            self.timer.stop()
             return data_list
 
             
@@ -354,20 +403,23 @@ class JisiluScraper:
         
         try:
             # 跳转到 QDII 页面
+            self.timer.start("qdii.navigate")
             qdii_url = "https://www.jisilu.cn/data/qdii/#qdiie"
             if page.url != qdii_url:
-                page.goto(qdii_url, wait_until="networkidle", timeout=30000)
+                page.goto(qdii_url, wait_until="networkidle", timeout=self._timeout_ms(30000))
             
             # ⚠️ 关键步骤：滚动到页面底部
+            self.timer.start("qdii.wait")
             # 商品表格在页面最底部，需要滚动才能看到
             logger.info("滚动到页面底部以加载商品表格...")
             page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
             page.wait_for_timeout(2000)  # 等待滚动和表格加载
             
             # 等待商品表格加载
-            page.wait_for_selector("#flex_qdiic tbody tr", timeout=30000)
+            page.wait_for_selector("#flex_qdiic tbody tr", timeout=self._timeout_ms(30000))
             
             # 提取数据
+            self.timer.start("qdii.extract")
             rows = page.query_selector_all("#flex_qdiic tbody tr")
             logger.info(f"找到 {len(rows)} 行 QDII 商品数据")
             
@@ -394,6 +446,11 @@ class JisiluScraper:
                     for i, col_name in enumerate(col_map):
                         row_data[col_name] = cells[i].inner_text().strip()
                     
+                    # 解析数值列（用于筛选/排序/分页）
+                    row_data["premium_rate_value"] = self._parse_number(row_data["rt_premium_rate"])
+                    row_data["change_pct_value"] = self._parse_number(row_data["change_pct"])
+                    row_data["volume_value"] = self._parse_number(row_data["volume"])
+                    
                     # 2. 提取所有字段样式
                     for i, col_name in enumerate(col_map):
                         style = self._extract_cell_style(cells[i])
@@ -405,74 +462,27 @@ class JisiluScraper:
                     logger.warning(f"解析 QDII 行数据失败: {e}")
                     continue
             
+            self.timer.stop()
             return data_list
 
         except Exception as e:
             logger.error(f"抓取 QDII 数据异常: {e}")
-            return []
-
-    def save_lof_to_database(self, data_list: List[Dict]) -> int:
-        """保存 LOF 数据到数据库"""
-        logger.info(f"正在保存 LOF 数据: {len(data_list)} 条")
-        
-        db = SessionLocal()
-        try:
-            # 清空旧数据
-            db.query(LOFData).delete()
-            
-            # 批量插入新数据
-            for data in data_list:
-                lof = LOFData(**data)
-                db.add(lof)
-            
-            db.commit()
-            logger.info(f"成功保存 LOF {len(data_list)} 条数据")
-            return len(data_list)
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"保存 LOF 数据失败: {e}")
-            raise
-        finally:
-            db.close()
-    
-    def save_qdii_to_database(self, data_list: List[Dict]) -> int:
-        """保存 QDII 数据到数据库"""
-        logger.info(f"正在保存 QDII 数据: {len(data_list)} 条")
-        
-        db = SessionLocal()
-        try:
-            # 清空旧数据
-            db.query(QDIIData).delete()
-            
-            # 批量插入新数据
-            for data in data_list:
-                qdii = QDIIData(**data)
-                db.add(qdii)
-            
-            db.commit()
-            logger.info(f"成功保存 QDII {len(data_list)} 条数据")
-            return len(data_list)
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"保存 QDII 数据失败: {e}")
             raise
-        finally:
-            db.close()
-    
+
     def scrape_lof_index_data(self, page: Page) -> List[Dict]:
         """抓取 LOF 指数基金数据 (含全量样式)"""
         logger.info("正在抓取 LOF 指数基金数据...")
         
         try:
             # 跳转到指数 LOF 页面
+            self.timer.start("lof_index.navigate")
             index_url = "https://www.jisilu.cn/data/lof/#index"
             if page.url != index_url:
-                page.goto(index_url, wait_until="networkidle", timeout=30000)
+                page.goto(index_url, wait_until="networkidle", timeout=self._timeout_ms(30000))
             
             # 等待表格加载
-            page.wait_for_selector("#flex_index tbody tr", timeout=30000)
+            self.timer.start("lof_index.wait")
+            page.wait_for_selector("#flex_index tbody tr", timeout=self._timeout_ms(30000))
             
             # 找到"溢价率"表头并点击两次进行倒序排序
             logger.info("点击溢价率表头进行排序...")
@@ -483,6 +493,7 @@ class JisiluScraper:
             page.wait_for_timeout(1000)  # 等待排序完成
             
             # 提取数据
+            self.timer.start("lof_index.extract")
             rows = page.query_selector_all("#flex_index tbody tr")
             logger.info(f"找到 {len(rows)} 行指数 LOF 数据")
             
@@ -507,6 +518,11 @@ class JisiluScraper:
                     # 1. 提取所有字段原始文本
                     for i, col_name in enumerate(col_map):
                         row_data[col_name] = cells[i].inner_text().strip()
+                    
+                    # 解析数值列（用于筛选/排序/分页）
+                    row_data["premium_rate_value"] = self._parse_number(row_data["premium_rate"])
+                    row_data["change_pct_value"] = self._parse_number(row_data["change_pct"])
+                    row_data["volume_value"] = self._parse_number(row_data["volume"])
                         
                     # 2. 提取所有字段样式
                     for i, col_name in enumerate(col_map):
@@ -520,52 +536,30 @@ class JisiluScraper:
                     continue
             
             logger.info(f"成功解析 {len(data_list)} 条指数 LOF 数据")
+            self.timer.stop()
             return data_list
 
         except Exception as e:
             logger.error(f"抓取指数 LOF 数据异常: {e}")
-            return []
-
-        except Exception as e:
-            logger.error(f"抓取指数 LOF 数据异常: {e}")
-            return []
-    
-    def save_lof_index_to_database(self, data_list: List[Dict]) -> int:
-        """保存指数 LOF 数据到数据库"""
-        logger.info(f"正在保存指数 LOF 数据: {len(data_list)} 条")
-        
-        db = SessionLocal()
-        try:
-            # 清空旧数据
-            db.query(LOFIndexData).delete()
-            
-            # 批量插入新数据
-            for data in data_list:
-                lof_index = LOFIndexData(**data)
-                db.add(lof_index)
-            
-            db.commit()
-            logger.info(f"成功保存指数 LOF {len(data_list)} 条数据")
-            return len(data_list)
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"保存指数 LOF 数据失败: {e}")
             raise
-        finally:
-            db.close()
     
     def log_scrape_result(self, status: str, record_count: int = 0, 
-                          error_message: str = None, duration: float = None):
+                          error_message: str = None, duration: float = None,
+                          phases: Dict[str, float] = None, dataset: str = None,
+                          attempts: int = None, run_id: int = None):
         """记录抓取日志"""
         db = SessionLocal()
         try:
             log = ScrapeLog(
                 scrape_time=datetime.now(),
                 status=status,
+                dataset=dataset,
                 record_count=record_count,
                 error_message=error_message,
-                duration_seconds=Decimal(str(round(duration, 2))) if duration else None
+                duration_seconds=Decimal(str(round(duration, 2))) if duration else None,
+                attempts=attempts,
+                phases=phases,
+                run_id=run_id
             )
             db.add(log)
             db.commit()
@@ -575,21 +569,200 @@ class JisiluScraper:
         finally:
             db.close()
     
-    def run(self) -> bool:
-        """执行抓取任务"""
+    def _wants(self, name: str) -> bool:
+        """本次是否抓取该数据集"""
+        return self.datasets is None or name in self.datasets
+    
+    def _timeout_ms(self, default: int) -> int:
+        """Playwright 等待超时（毫秒），不超过当前数据集的剩余时间"""
+        if self._deadline is None:
+            return default
+        remaining = (self._deadline - time.monotonic()) * 1000
+        if remaining <= 0:
+            raise TimeoutError("数据集截止时间已到")
+        return int(min(default, remaining))
+    
+    def _scrape_with_retry(self, name: str) -> Tuple[List[Dict], int]:
+        """
+        在数据集截止时间内抓取，失败（含无数据）时指数退避重试
+
+        Returns:
+            (行数据, 尝试次数)；重试用尽或截止时间不足以再次重试时抛出 DatasetError
+        """
+        scrape = getattr(self, DATASET_SCRAPERS[name])
+        deadline = time.monotonic() + self.settings.scrape_dataset_timeout
+        if self.run_deadline is not None:
+            deadline = min(deadline, self.run_deadline)
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            self._deadline = deadline
+            try:
+                rows = scrape(self.page)
+                if not rows:
+                    raise Exception("未获取到数据")
+                return rows, attempt
+            except Exception as e:
+                failed_phase = self.timer.stop(error=e)
+                error = f"[{failed_phase}] {e}" if failed_phase else str(e)
+                delay = retry_delay(attempt, self.settings.scrape_retry_backoff)
+                if attempt > self.settings.scrape_retries or time.monotonic() + delay >= deadline:
+                    raise DatasetError(f"{error}（共 {attempt} 次尝试）", attempt)
+                logger.warning(f"{name} 第 {attempt} 次抓取失败: {error}，{delay:.1f} 秒后重试")
+                ipc.emit("retry", dataset=name, attempt=attempt, delay=round(delay, 1), error=error)
+            finally:
+                self._deadline = None
+            
+            self.timer.start(f"{name}.backoff")
+            time.sleep(delay)
+            self.timer.stop()
+            # 抓取方法已位于目标页面时不会重新跳转，先离开当前页面
+            try:
+                self.page.goto("about:blank")
+            except Exception as e:
+                logger.warning(f"重置页面失败: {e}")
+    
+    def _run_dataset(self, name: str):
+        """抓取单个数据集并立即提交，结果记入 outcomes 与该数据集的抓取日志"""
+        remaining = self.run_deadline - time.monotonic() if self.run_deadline is not None else None
+        if remaining is not None and remaining < MIN_DATASET_SECONDS:
+            self._record_failure(name, f"任务剩余时间不足（{max(0.0, remaining):.0f} 秒），跳过", attempts=0)
+            return
+        
+        logger.info("=" * 30 + f" {DATASET_TITLES[name]} 数据 " + "=" * 30)
+        ipc.emit("dataset_start", dataset=name)
+        try:
+            rows, attempts = self._scrape_with_retry(name)
+        except DatasetError as e:
+            self._record_failure(name, str(e), attempts=e.attempts)
+            return
+        
+        try:
+            version = publish_snapshot({name: rows}, timer=self.timer, attempts={name: attempts},
+                                       run_id=self.run_id)
+        except Exception as e:
+            failed_phase = self.timer.stop(error=e)
+            self._record_failure(name, f"[{failed_phase}] {e}" if failed_phase else str(e), attempts=attempts)
+            return
+        self.outcomes[name] = True
+        self.record_counts[name] = len(rows)
+        ipc.emit("dataset_end", dataset=name, status="success", rows=len(rows), attempts=attempts, version=version)
+        logger.info(f"{DATASET_TITLES[name]} 抓取完成，{len(rows)} 条数据（尝试 {attempts} 次），快照版本 {version}")
+    
+    def _record_failure(self, name: str, error: str, attempts: int = None):
+        """
+        记录数据集失败
+
+        日志只计该数据集自身的阶段（含重试等待）；浏览器启动、登录等公共阶段随运行记录
+        保存，启动或登录失败时各数据集日志的耗时为空
+        """
+        logger.error(f"{DATASET_TITLES[name]} 抓取失败: {error}")
+        self.outcomes[name] = False
+        self.last_error = error
+        ipc.emit("dataset_end", dataset=name, status="failed", attempts=attempts, error=error)
+        phases = self.timer.to_dict(name, shared=False)
+        self.log_scrape_result(
+            "failed", error_message=error, duration=sum(phases.values()) or None,
+            phases=phases or None, dataset=name, attempts=attempts, run_id=self.run_id
+        )
+    
+    def _start_run(self) -> Optional[int]:
+        """写入运行记录，返回其 id（失败时返回 None，不影响抓取）"""
+        db = SessionLocal()
+        try:
+            run = ScrapeRun(
+                started_at=datetime.now(),
+                status="running",
+                datasets=",".join(self.datasets) if self.datasets else None,
+            )
+            db.add(run)
+            db.commit()
+            return run.id
+        except Exception as e:
+            logger.warning(f"记录抓取运行失败: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+    
+    def _finish_run(self, status: str):
+        """更新运行记录：结果、总耗时与公共阶段耗时"""
+        if self.run_id is None:
+            return
+        db = SessionLocal()
+        try:
+            elapsed = self.timer.elapsed()
+            db.query(ScrapeRun).filter(ScrapeRun.id == self.run_id).update({
+                ScrapeRun.finished_at: datetime.now(),
+                ScrapeRun.status: status,
+                ScrapeRun.record_count: sum(self.record_counts.values()),
+                ScrapeRun.duration_seconds: Decimal(str(round(elapsed, 2))),
+                ScrapeRun.phases: self.timer.shared(),
+                ScrapeRun.error_message: self.last_error if status != "success" else None,
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.warning(f"更新抓取运行记录失败: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    def _update_breaker(self, site_ok: bool):
+        """按本次结果更新熔断器：有数据集成功即视为站点正常"""
+        db = SessionLocal()
+        try:
+            if site_ok:
+                breaker.record_success(db)
+            else:
+                tripped = breaker.record_failure(db, self.last_error)
+                if tripped is not None:
+                    logger.error(f"集思录连续失败，熔断至 {tripped.strftime('%Y-%m-%d %H:%M:%S')}")
+        except Exception as e:
+            logger.warning(f"更新熔断器失败: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    def run(self) -> str:
+        """
+        执行抓取任务
+
+        各数据集独立重试、成功后立即提交，一个数据集失败不影响其他数据集。
+
+        Returns:
+            success 全部成功 / partial 部分数据集成功 / failed 全部失败 / skipped 熔断中跳过
+        """
         logger.info("=" * 50)
         logger.info("开始执行抓取任务")
         
-        start_time = time.time()
+        self.timer = PhaseTimer()
+        self.outcomes = {}
+        self.record_counts = {}
+        self.last_error = None
+        wanted = [name for name in DATASET_MODELS if self._wants(name)]
         
+        # 熔断中不启动浏览器
+        db = SessionLocal()
+        try:
+            until = breaker.open_until(db)
+        finally:
+            db.close()
+        if until is not None:
+            logger.warning(f"集思录连续失败已熔断，{until.strftime('%Y-%m-%d %H:%M:%S')} 前跳过抓取")
+            return "skipped"
+        
+        self.run_id = self._start_run()
         try:
             with sync_playwright() as p:
                 # 启动浏览器
+                self.timer.start("launch")
                 self.browser = p.chromium.launch(headless=True)
                 
                 # 尝试使用已保存的登录状态
                 need_login = True
                 if self._has_saved_auth_state():
+                    self.timer.start("auth_check")
                     try:
                         self.context = self._load_auth_state(self.browser)
                         self.page = self.context.new_page()
@@ -607,6 +780,7 @@ class JisiluScraper:
                 # 需要重新登录
                 if need_login:
                     logger.info("需要重新登录...")
+                    self.timer.start("login")
                     self.context = self.browser.new_context()
                     self.page = self.context.new_page()
                     
@@ -615,68 +789,63 @@ class JisiluScraper:
                     
                     # 保存登录状态供下次使用
                     self._save_auth_state(self.context)
+                self.timer.stop()
                 
-                # 1. 抓取并保存 LOF 数据
-                logger.info("=" * 30 + " LOF 数据 " + "=" * 30)
-                lof_data = self.scrape_lof_data(self.page)
-                
-                if lof_data:
-                    lof_count = self.save_lof_to_database(lof_data)
-                    logger.info(f"LOF 数据抓取完成: {lof_count} 条")
-                else:
-                    logger.warning("未获取到 LOF 数据")
-                    lof_count = 0
-                
-                # 2. 抓取并保存 QDII 数据
-                logger.info("=" * 30 + " QDII 数据 " + "=" * 30)
-                qdii_data = self.scrape_qdii_data(self.page)
-                
-                if qdii_data:
-                    qdii_count = self.save_qdii_to_database(qdii_data)
-                    logger.info(f"QDII 数据抓取完成: {qdii_count} 条")
-                else:
-                    logger.warning("未获取到 QDII 数据")
-                    qdii_count = 0
-                
-                # 3. 抓取并保存指数 LOF 数据
-                logger.info("=" * 30 + " 指数 LOF 数据 " + "=" * 30)
-                lof_index_data = self.scrape_lof_index_data(self.page)
-                
-                if lof_index_data:
-                    lof_index_count = self.save_lof_index_to_database(lof_index_data)
-                    logger.info(f"指数 LOF 数据抓取完成: {lof_index_count} 条")
-                else:
-                    logger.warning("未获取到指数 LOF 数据")
-                    lof_index_count = 0
-                
-                # 汇总
-                total_count = lof_count + qdii_count + lof_index_count
-                if total_count == 0:
-                    raise Exception("未获取到任何数据")
-                
-                duration = time.time() - start_time
-                self.log_scrape_result("success", total_count, duration=duration)
-                
-                logger.info(f"抓取完成，共 {total_count} 条数据 (LOF: {lof_count}, QDII: {qdii_count}, 指数LOF: {lof_index_count})，耗时 {duration:.2f} 秒")
+                # 各数据集共用已登录的页面，依次抓取并提交
+                for name in wanted:
+                    self._run_dataset(name)
                 
                 # 手动关闭资源
                 if self.context:
                     self.context.close()
                 if self.browser:
                     self.browser.close()
-                    
-                return True
                 
         except Exception as e:
-            duration = time.time() - start_time
+            # 浏览器启动或登录失败：尚未处理的数据集记为失败
             error_msg = str(e)
+            failed_phase = self.timer.stop(error=e)
+            if failed_phase:
+                error_msg = f"[{failed_phase}] {error_msg}"
             logger.error(f"抓取失败: {error_msg}")
-            self.log_scrape_result("failed", error_message=error_msg, duration=duration)
-            return False
+            for name in wanted:
+                if name not in self.outcomes:
+                    self._record_failure(name, error_msg)
+        
+        succeeded = [name for name in wanted if self.outcomes.get(name)]
+        self._update_breaker(bool(succeeded))
+        
+        if len(succeeded) == len(wanted):
+            status = "success"
+        elif succeeded:
+            status = "partial"
+        else:
+            status = "failed"
+        self._finish_run(status)
+        logger.info(f"抓取结束（{status}），成功: {','.join(succeeded) or '无'}，耗时 {self.timer.elapsed():.2f} 秒")
+        return status
+
 
+def run_scrape() -> str:
+    """
+    执行抓取任务的入口函数，返回抓取结果状态
 
-def run_scrape():
-    """执行抓取任务的入口函数"""
-    scraper = JisiluScraper()
-    return scraper.run()
+    worker 通过环境变量传入数据集范围（SCRAPE_DATASETS）与任务截止时间（SCRAPE_DEADLINE，Unix 时间戳）
+    """
+    deadline = os.environ.get("SCRAPE_DEADLINE")
+    scraper = JisiluScraper(
+        datasets=parse_datasets(os.environ.get("SCRAPE_DATASETS")),
+        deadline=float(deadline) if deadline else None,
+    )
+    # 延续调度器传入的 trace（TRACEPARENT），抓取各阶段与 SQL 挂在同一个 trace 下
+    parent = parse_traceparent(os.environ.get("TRACEPARENT"))
+    with span("scrape.run", parent=parent, root=True) as current:
+        if scraper.settings.scrape_profile:
+            status = run_profiled("scrape", scraper.run)
+        else:
+            status = scraper.run()
+        current.set_attribute("scrape.status", status)
+        if status == "failed":
+            current.record_error("抓取失败")
+        return status
 
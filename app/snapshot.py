@@ -0,0 +1,126 @@
+"""
+数据快照发布与读取
+
+一次抓取的所有数据集、溢价率历史、快照差异与各数据集的抓取日志在同一事务中发布，
+读取方在单个事务中读取时总能看到同一版本的完整快照。快照版本号即本次最后一条成功
+抓取日志 (ScrapeLog) 的 id，单调递增（不连续）。
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import DATASET_MODELS, ScrapeLog
+from app.history import record_history
+from app.changes import compute_changes, record_changes, serialize_dataset
+from app.timing import PhaseTimer
+
+
+def publish_snapshot(datasets: Dict[str, List[Dict]], duration: float = None,
+                     timer: PhaseTimer = None, attempts: Dict[str, int] = None,
+                     run_id: Optional[int] = None) -> int:
+    """
+    发布新快照：替换各数据集数据并为每个数据集记录抓取日志（单事务）
+
+    Args:
+        datasets: 数据集名称 -> 行数据；空列表的数据集保留旧数据（记为失败）
+        duration: 抓取耗时（秒），不传时使用 timer 的总耗时
+        timer: 抓取任务的分阶段计时器，写入阶段追加到其中并随日志保存
+        attempts: 各数据集的尝试次数（含重试），随日志保存
+        run_id: 所属抓取运行 (scrape_run.id)
+
+    Returns:
+        快照版本号
+    """
+    timer = timer or PhaseTimer()
+    # 只发布一个数据集时（各数据集抓取成功后立即提交），历史与差异的写入计入该数据集
+    prefix = f"{next(iter(datasets))}." if len(datasets) == 1 else ""
+    
+    db = SessionLocal()
+    try:
+        previous = get_last_success_log(db)
+        changes = {}
+        
+        for name, rows in datasets.items():
+            if not rows:
+                logger.warning(f"数据集 {name} 无数据，保留旧数据")
+                continue
+            timer.start(f"{name}.save")
+            model = DATASET_MODELS[name]
+            old_rows = serialize_dataset(db, name)
+            
+            # 清空旧数据并批量插入
+            db.query(model).delete()
+            db.execute(insert(model), rows)
+            logger.info(f"数据集 {name} 写入 {len(rows)} 条")
+            
+            # 按写入后的数据计算差异（与接口输出一致）
+            changes[name] = compute_changes(old_rows, serialize_dataset(db, name))
+        
+        # 每个数据集一条日志；快照版本为最后一条成功日志的 id
+        scrape_time = datetime.now()
+        logs = [
+            ScrapeLog(
+                scrape_time=scrape_time,
+                status="success" if rows else "failed",
+                dataset=name,
+                record_count=len(rows),
+                error_message=None if rows else "无数据，保留旧数据",
+                dataset_counts={name: len(rows)},
+                attempts=(attempts or {}).get(name),
+                run_id=run_id,
+            )
+            for name, rows in datasets.items()
+        ]
+        db.add_all(logs)
+        db.flush()
+        log = max(logs, key=lambda item: (item.status == "success", item.id))
+        
+        # 追加溢价率历史（版本号即本次日志 id）
+        timer.start(f"{prefix}history")
+        history_count = record_history(db, datasets, log.id, scrape_time)
+        logger.info(f"溢价率历史写入 {history_count} 条")
+        
+        # 保存相对上一版本的差异（增量同步）
+        timer.start(f"{prefix}changes")
+        change_count = record_changes(db, log.id, previous.id if previous else None, changes)
+        logger.info(f"快照差异写入 {change_count} 条")
+        timer.stop()
+        
+        # 耗时与各阶段耗时（不含提交）：只记该数据集自身的阶段，公共阶段随运行记录保存
+        for item in logs:
+            item.phases = timer.to_dict(item.dataset, shared=False)
+            seconds = duration if duration is not None else sum(item.phases.values())
+            item.duration_seconds = Decimal(str(round(seconds, 2))) if seconds else None
+        
+        db.commit()
+        
+        logger.info(f"快照发布完成，版本: {log.id}")
+        return log.id
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"快照发布失败: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def get_last_success_log(db: Session) -> Optional[ScrapeLog]:
+    """获取最后一次成功抓取（即当前快照）的日志"""
+    return db.query(ScrapeLog).filter(
+        ScrapeLog.status == "success"
+    ).order_by(ScrapeLog.id.desc()).first()
+
+
+def begin_snapshot_read(db: Session):
+    """
+    以 REPEATABLE READ 开启读事务
+    需在会话执行任何查询前调用，之后的所有查询看到同一个数据库快照
+    """
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
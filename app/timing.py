@@ -0,0 +1,73 @@
+"""
+分阶段计时
+
+抓取任务按阶段（浏览器启动、登录检查、各数据集的跳转/等待/提取/写入等）
+累计耗时，随抓取日志保存，便于定位变慢的阶段。
+开启追踪时每个阶段同时记录为一个 span（见 app.tracing），在 worker 启动的抓取子进程中
+同时输出 phase_start/phase_end 事件（见 app.ipc）。
+"""
+
+import time
+from typing import Dict, Optional
+
+from app import ipc
+from app.tracing import start_span
+
+
+class PhaseTimer:
+    """
+    分阶段计时器
+
+    start(name) 结束当前阶段并开始新阶段，stop() 结束当前阶段；
+    同名阶段多次进入时累加。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.current: Optional[str] = None
+        self._phase_start = 0.0
+        self._span = None
+
+    def start(self, name: str):
+        """开始一个阶段（自动结束上一个阶段）"""
+        self.stop()
+        self.current = name
+        self._span = start_span(f"phase {name}", attributes={"phase": name})
+        self._phase_start = time.perf_counter()
+        ipc.emit("phase_start", phase=name)
+
+    def stop(self, error: Exception = None) -> Optional[str]:
+        """结束当前阶段，返回其名称（error 为该阶段失败的原因）"""
+        name = self.current
+        if name is not None:
+            seconds = time.perf_counter() - self._phase_start
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self.current = None
+            if error is not None:
+                self._span.record_error(error)
+            self._span.end()
+            self._span = None
+            ipc.emit("phase_end", phase=name, seconds=round(seconds, 3), error=str(error) if error else None)
+        return name
+
+    def elapsed(self) -> float:
+        """计时器创建以来的总耗时（秒）"""
+        return time.perf_counter() - self.started
+
+    def to_dict(self, dataset: Optional[str] = None, shared: bool = True) -> Dict[str, float]:
+        """
+        各阶段耗时（秒，保留 3 位小数）
+
+        指定 dataset 时只保留该数据集的阶段，shared 为真时再加上公共阶段（名称不含 "."，
+        如 launch/login）；公共阶段随抓取运行记录 (scrape_run) 保存，写入各数据集日志时
+        不应重复计入
+        """
+        return {
+            name: round(seconds, 3) for name, seconds in self.phases.items()
+            if dataset is None or name.startswith(f"{dataset}.") or (shared and "." not in name)
+        }
+
+    def shared(self) -> Dict[str, float]:
+        """公共阶段耗时（不属于任何数据集的阶段）"""
+        return {name: round(seconds, 3) for name, seconds in self.phases.items() if "." not in name}
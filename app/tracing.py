@@ -0,0 +1,505 @@
+"""
+分布式追踪
+
+轻量的 OpenTelemetry 风格 Span，覆盖一次请求或一次抓取的完整链路：
+- API: 每个 HTTP 请求一个 server span（采信请求头中的 W3C traceparent）
+- 调度器: 每次抓取任务一个 span，通过环境变量 TRACEPARENT 传入抓取子进程
+- 抓取子进程: 延续父 trace，PhaseTimer 的每个阶段（浏览器启动、跳转、等待、
+  提取、写入）一个 span
+- 数据库: 当前有 span 时，每条 SQL 一个子 span
+
+导出方式（TRACE_EXPORTER）:
+- file: 追加写入 TRACE_FILE（每行一个 span 的 JSON），
+  用 python -m app.tracing [trace_id] 查看瀑布图
+- otlp: 以 OTLP/HTTP JSON 发送到 TRACE_OTLP_ENDPOINT（Jaeger、Tempo、OTel Collector）
+- 空: 关闭，start_span 返回空操作 span，开销为一次配置判断
+
+span 结束后放入队列，由后台线程批量导出，不阻塞请求；进程退出时导出剩余 span。
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.routing import route_template
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# 后台导出批量大小与间隔（秒）
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL = 2.0
+# 队列上限，导出跟不上时丢弃新 span 而不是占用内存
+QUEUE_SIZE = 10000
+# db span 记录的 SQL 最大长度
+STATEMENT_MAX_LENGTH = 500
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    """跨进程传递的 trace 上下文（W3C traceparent）"""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """解析 traceparent 头，格式错误或全零 ID 时返回 None"""
+    match = TRACEPARENT_PATTERN.match((value or "").strip().lower())
+    if not match:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
+
+
+class Span:
+    """一个计时区间，end() 后交给导出器"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "_token")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64).to_bytes(8, "big").hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "unset"
+        self.status_message = None
+        self._token = None
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = "error"
+        self.status_message = str(error)[:500]
+        if isinstance(error, BaseException):
+            self.attributes["exception.type"] = type(error).__name__
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # 在其他上下文中结束（如流式响应），只恢复为父 span
+                pass
+            self._token = None
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.submit(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+            "resource": resource_attributes(),
+        }
+
+
+class _NoopSpan:
+    """关闭追踪或未采样时使用，所有操作为空"""
+
+    trace_id = None
+    span_id = None
+    context = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enabled() -> bool:
+    return bool(get_settings().trace_exporter)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, kind: str = "internal", attributes: Optional[Dict] = None,
+               parent: Optional[SpanContext] = None, root: bool = False):
+    """
+    开始一个 span 并设为当前 span，调用方负责 end()
+
+    Args:
+        parent: 显式的父上下文（来自 traceparent），优先于当前 span
+        root: 没有父 span 时是否新建 trace（入口处为 True）；
+              为 False 时没有父 span 就不记录，避免零散的孤立 span
+    """
+    if not enabled():
+        return NOOP_SPAN
+    if parent is None:
+        current = _current.get()
+        if current is not None:
+            parent = current.context
+    if parent is not None:
+        if not parent.sampled:
+            return NOOP_SPAN
+        span = Span(name, kind, parent.trace_id, parent.span_id, attributes)
+    elif root and random.random() < get_settings().trace_sample_ratio:
+        span = Span(name, kind, random.getrandbits(128).to_bytes(16, "big").hex(), None, attributes)
+    else:
+        return NOOP_SPAN
+    span._token = _current.set(span)
+    return span
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", attributes: Optional[Dict] = None,
+         parent: Optional[SpanContext] = None, root: bool = False):
+    """start_span 的上下文管理器形式，异常时标记 span 为 error"""
+    current = start_span(name, kind, attributes, parent=parent, root=root)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        current.end()
+
+
+def current_traceparent() -> Optional[str]:
+    """当前 span 的 traceparent（用于传给子进程），没有时返回 None"""
+    current = _current.get()
+    return current.context.to_traceparent() if current is not None else None
+
+
+def resource_attributes() -> Dict:
+    return {
+        "service.name": get_settings().trace_service_name,
+        "process.pid": os.getpid(),
+        "process.command": os.path.basename(sys.argv[0]) if sys.argv else "",
+    }
+
+
+# ==================== 导出 ====================
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+OTLP_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+OTLP_STATUS = {"unset": 0, "ok": 1, "error": 2}
+
+
+def to_otlp(spans: List[Span]) -> Dict:
+    """OTLP/HTTP JSON 格式的 ExportTraceServiceRequest"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes(resource_attributes())},
+        "scopeSpans": [{
+            "scope": {"name": "app.tracing"},
+            "spans": [{
+                "traceId": item.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": item.parent_id or "",
+                "name": item.name,
+                "kind": OTLP_KINDS.get(item.kind, 1),
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns),
+                "attributes": _otlp_attributes(item.attributes),
+                "status": {"code": OTLP_STATUS[item.status], "message": item.status_message or ""},
+            } for item in spans],
+        }],
+    }]}
+
+
+class SpanExporter:
+    """后台线程批量导出已结束的 span"""
+
+    def __init__(self, exporter: str, path: str = None, endpoint: str = None):
+        self.exporter = exporter
+        self.path = path
+        self.endpoint = endpoint
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, item: Span):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            pass
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """导出队列中所有 span"""
+        with self._lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    return
+                try:
+                    self._export(batch)
+                except Exception as e:
+                    logger.warning(f"导出 trace 失败（丢弃 {len(batch)} 个 span）: {e}")
+
+    def _export(self, batch: List[Span]):
+        if self.exporter == "otlp":
+            import httpx  # 只有 otlp 导出用到，避免 API 启动时加载
+            httpx.post(self.endpoint, json=to_otlp(batch), timeout=5).raise_for_status()
+        else:
+            lines = "".join(json.dumps(item.to_dict(), ensure_ascii=False) + "\n" for item in batch)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def _loop(self):
+        while not self._stopped.wait(EXPORT_INTERVAL):
+            self.flush()
+
+    def shutdown(self):
+        self._stopped.set()
+        self.flush()
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    """获取导出器单例（关闭追踪时为 None）"""
+    global _exporter
+    if _exporter is None:
+        settings = get_settings()
+        if settings.trace_exporter not in ("file", "otlp"):
+            return None
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = SpanExporter(
+                    settings.trace_exporter,
+                    path=settings.trace_file,
+                    endpoint=settings.trace_otlp_endpoint,
+                )
+    return _exporter
+
+
+# ==================== 数据库 ====================
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is None:
+        conn.info.setdefault("trace_spans", []).append(NOOP_SPAN)
+        return
+    operation = statement.lstrip()[:10].split(None, 1)[0].upper() if statement.strip() else ""
+    conn.info.setdefault("trace_spans", []).append(start_span(
+        f"db {operation}", kind="client", attributes={
+            "db.system": "postgresql",
+            "db.statement": statement[:STATEMENT_MAX_LENGTH],
+            "db.executemany": executemany,
+        },
+    ))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        current = spans.pop()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            current.set_attribute("db.rowcount", cursor.rowcount)
+        current.end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+    if spans:
+        current = spans.pop()
+        current.record_error(context.original_exception)
+        current.end()
+
+
+# ==================== HTTP ====================
+
+
+class TracingMiddleware:
+    """每个 HTTP 请求一个 server span，响应头 X-Trace-Id 返回 trace ID"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        method = scope["method"]
+        current = start_span(
+            f"{method} {scope['path']}", kind="server",
+            attributes={"http.method": method, "http.target": scope["path"]},
+            parent=parse_traceparent(traceparent), root=True,
+        )
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                current.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    current.record_error(f"HTTP {message['status']}")
+                if current.trace_id:
+                    MutableHeaders(scope=message).append("X-Trace-Id", current.trace_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            current.record_error(e)
+            raise
+        finally:
+            route = route_template(scope)
+            if route and isinstance(current, Span):
+                current.name = f"{method} {route}"
+                current.set_attribute("http.route", route)
+            current.end()
+
+
+# ==================== 查看 ====================
+
+
+def load_trace_file(path: str) -> Dict[str, List[Dict]]:
+    """读取 JSONL 文件，按 trace ID 分组"""
+    traces: Dict[str, List[Dict]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                item = json.loads(line)
+                traces.setdefault(item["traceId"], []).append(item)
+    return traces
+
+
+def render_waterfall(spans: List[Dict], width: int = 40) -> str:
+    """按父子关系缩进、按开始时间排序的文本瀑布图"""
+    start = min(item["startTimeUnixNano"] for item in spans)
+    end = max(item["endTimeUnixNano"] for item in spans)
+    total = max(end - start, 1)
+    span_ids = {item["spanId"] for item in spans}
+    children: Dict[Optional[str], List[Dict]] = {}
+    for item in spans:
+        parent = item["parentSpanId"] if item["parentSpanId"] in span_ids else None
+        children.setdefault(parent, []).append(item)
+
+    lines = [f"trace {spans[0]['traceId']}  {total / 1e6:.1f} ms  {len(spans)} spans"]
+
+    def walk(parent: Optional[str], depth: int):
+        for item in sorted(children.get(parent, []), key=lambda s: s["startTimeUnixNano"]):
+            offset = int((item["startTimeUnixNano"] - start) / total * width)
+            length = max(1, int((item["endTimeUnixNano"] - item["startTimeUnixNano"]) / total * width))
+            bar = " " * offset + "█" * min(length, width - offset)
+            duration = (item["endTimeUnixNano"] - item["startTimeUnixNano"]) / 1e6
+            marker = " ✗" if item["status"]["code"] == "error" else ""
+            label = ("  " * depth + item["name"])[:48]
+            lines.append(f"{bar:<{width}} {duration:>10.1f} ms  {label}{marker}")
+            walk(item["spanId"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def _spans_end(spans: List[Dict]) -> int:
+    return max(item["endTimeUnixNano"] for item in spans)
+
+
+def main(argv: List[str]) -> int:
+    """python -m app.tracing [trace_id 或前缀] [--file 路径]；不传 trace_id 时显示最近一条"""
+    path = get_settings().trace_file
+    if "--file" in argv:
+        index = argv.index("--file")
+        path = argv[index + 1]
+        argv = argv[:index] + argv[index + 2:]
+    if not os.path.exists(path):
+        print(f"trace 文件不存在: {path}")
+        return 1
+    traces = load_trace_file(path)
+    if argv:
+        matched = [spans for trace_id, spans in traces.items() if trace_id.startswith(argv[0])]
+    else:
+        matched = sorted(traces.values(), key=_spans_end)[-1:]
+    if not matched:
+        print("未找到 trace")
+        return 1
+    for spans in matched:
+        print(render_waterfall(spans))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+"""
+A 股交易日历
+
+- 交易日: 周一至周五且不在休市日期中（调休的周末不开市）
+- 交易时段: TRADING_SESSIONS，默认 09:30-11:30、13:00-15:00
+- 休市日期: 内置沪深交易所公布的节假日休市安排（每年年底公布次年安排后需更新
+  HOLIDAYS），可用 TRADING_HOLIDAYS 追加（临时休市等）
+
+内置数据未覆盖的年份按「周一至周五均为交易日」处理并输出警告。
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.config import get_settings
+
+# 沪深交易所节假日休市（只列工作日）
+HOLIDAYS = {
+    2025: (
+        "2025-01-01",
+        "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-03", "2025-02-04",
+        "2025-04-04",
+        "2025-05-01", "2025-05-02", "2025-05-05",
+        "2025-06-02",
+        "2025-10-01", "2025-10-02", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08",
+    ),
+    2026: (
+        "2026-01-01", "2026-01-02",
+        "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-23",
+        "2026-04-06",
+        "2026-05-01", "2026-05-04", "2026-05-05",
+        "2026-06-19",
+        "2026-09-25",
+        "2026-10-01", "2026-10-02", "2026-10-05", "2026-10-06", "2026-10-07",
+    ),
+}
+
+Session = Tuple[time, time]
+
+
+def parse_sessions(value: str) -> List[Session]:
+    """解析交易时段 "09:30-11:30,13:00-15:00"（按开始时间排序）"""
+    sessions = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        start, sep, end = item.partition("-")
+        if not sep:
+            raise ValueError(f"交易时段格式错误（应为 HH:MM-HH:MM）: {item}")
+        start, end = time.fromisoformat(start.strip()), time.fromisoformat(end.strip())
+        if end <= start:
+            raise ValueError(f"交易时段结束时间应晚于开始时间: {item}")
+        sessions.append((start, end))
+    return sorted(sessions)
+
+
+def parse_dates(value: str) -> Set[date]:
+    return {date.fromisoformat(item.strip()) for item in value.split(",") if item.strip()}
+
+
+class TradingCalendar:
+    """交易日与交易时段判断"""
+
+    def __init__(self, holidays: Iterable[date], sessions: List[Session],
+                 known_years: Iterable[int] = ()):
+        self.holidays = set(holidays)
+        self.sessions = sessions
+        self.known_years = set(known_years)
+        self._warned_years: Set[int] = set()
+
+    def is_trading_day(self, day: date) -> bool:
+        if day.weekday() >= 5:
+            return False
+        if day.year not in self.known_years and day.year not in self._warned_years:
+            self._warned_years.add(day.year)
+            logger.warning(f"交易日历未包含 {day.year} 年的休市安排，按周一至周五均为交易日处理")
+        return day not in self.holidays
+
+    def next_trading_day(self, day: date) -> date:
+        """day 之后（不含当天）的第一个交易日"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def current_session(self, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """now 所在的交易时段（开始、结束），不在交易时段时返回 None"""
+        if not self.is_trading_day(now.date()):
+            return None
+        for start, end in self.sessions:
+            if start <= now.time() < end:
+                return datetime.combine(now.date(), start), datetime.combine(now.date(), end)
+        return None
+
+    def next_session_start(self, now: datetime) -> Optional[datetime]:
+        """当天 now 之后的下一个交易时段开始时间（非交易日或已收盘时返回 None）"""
+        if not self.is_trading_day(now.date()):
+            return None
+        for start, _ in self.sessions:
+            if start > now.time():
+                return datetime.combine(now.date(), start)
+        return None
+
+
+# 全局实例
+_calendar: TradingCalendar = None
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """获取交易日历单例"""
+    global _calendar
+    if _calendar is None:
+        settings = get_settings()
+        holidays = {date.fromisoformat(day) for days in HOLIDAYS.values() for day in days}
+        _calendar = TradingCalendar(
+            holidays | parse_dates(settings.trading_holidays),
+            parse_sessions(settings.trading_sessions),
+            known_years=HOLIDAYS,
+        )
+    return _calendar
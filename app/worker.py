@@ -0,0 +1,348 @@
+"""
+抓取 worker
+
+从 scrape_job 队列领取任务，在子进程（python -m app.run_scrape）中执行抓取。
+可以运行任意数量，互不重复执行同一任务:
+
+    python -m app.worker          # 持续运行（SIGTERM/SIGINT 在当前任务结束后退出）
+    python -m app.worker --once   # 只执行一个任务（没有任务时直接退出）
+
+API 进程默认内置一个 worker（SCRAPE_EMBEDDED_WORKER=true），单容器部署无需额外进程；
+独立部署 worker 时在 API 侧关闭该选项。
+
+空闲时 LISTEN scrape_job 等待入队通知，通知连接不可用时按 JOB_POLL_INTERVAL 轮询。
+
+子进程的 stdout 是 JSON 事件流（见 app.ipc），逐行读取：日志转写到 worker 日志，
+阶段与数据集事件更新任务进度（scrape_job.progress，/api/status 可见）。
+stderr 单独读取，其输出（未捕获异常的堆栈等）计入任务错误信息。
+"""
+
+import argparse
+import os
+import re
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app import ipc
+from app.config import get_settings
+from app.database import SessionLocal
+from app.jobs import EXIT_STATUSES, NOTIFY_CHANNEL, claim_job, expire_jobs, finish_job, heartbeat, job_timeout
+from app.models import ScrapeJob
+from app.tracing import current_traceparent, parse_traceparent, span
+
+# 子进程输出写入任务错误信息的最大长度
+ERROR_TAIL = 2000
+
+# 抓取子进程命令
+SCRAPE_COMMAND = [sys.executable, "-m", "app.run_scrape"]
+
+# 单行输出的最大长度（超出部分按下一行处理）
+LINE_LIMIT = 64 * 1024
+
+# stdout 中的非事件行按错误处理的日志级别（标准库/loguru 文本格式的日志）
+ERROR_LINE_PATTERN = re.compile(r"\b(ERROR|CRITICAL)\b")
+
+# 子进程结束后等待 stderr 读取完成的时间（秒，浏览器进程可能继承并保持 stderr）
+STDERR_JOIN_TIMEOUT = 5.0
+
+# 执行进度有变化时保存到任务的间隔（秒）
+PROGRESS_INTERVAL = 2.0
+
+# 非失败的结果状态写入任务的说明
+STATUS_MESSAGES = {
+    "partial": "部分数据集失败，各数据集结果见抓取日志",
+    "skipped": "集思录连续失败已熔断，跳过本次抓取",
+}
+
+
+class ScrapeWorker:
+    """抓取任务 worker"""
+
+    def __init__(self, on_finished: Optional[Callable[[ScrapeJob, str], None]] = None):
+        self.settings = get_settings()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.on_finished = on_finished
+        self.current_job: Optional[int] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listen_engine = None
+        self._listen_conn = None
+
+    # ---------- 等待通知 ----------
+
+    def _listen(self):
+        """建立 LISTEN 连接（失败时返回 None，退化为轮询）"""
+        if self._listen_conn is not None:
+            return self._listen_conn
+        try:
+            if self._listen_engine is None:
+                self._listen_engine = create_engine(
+                    self.settings.database_url, poolclass=NullPool, isolation_level="AUTOCOMMIT"
+                )
+            self._listen_conn = self._listen_engine.raw_connection()
+            cursor = self._listen_conn.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            cursor.close()
+        except Exception as e:
+            logger.warning(f"LISTEN 连接失败，改为轮询: {e}")
+            self._close_listen()
+        return self._listen_conn
+
+    def _close_listen(self):
+        if self._listen_conn is not None:
+            try:
+                self._listen_conn.close()
+            except Exception:
+                pass
+            self._listen_conn = None
+
+    def _wait(self):
+        """等待入队通知或轮询间隔"""
+        timeout = self.settings.job_poll_interval
+        conn = self._listen()
+        if conn is None:
+            self._stopped.wait(timeout)
+            return
+        try:
+            dbapi_conn = conn.dbapi_connection
+            if select.select([dbapi_conn], [], [], timeout)[0]:
+                dbapi_conn.poll()
+                dbapi_conn.notifies.clear()
+        except Exception as e:
+            logger.warning(f"等待任务通知失败: {e}")
+            self._close_listen()
+            self._stopped.wait(timeout)
+
+    # ---------- 执行 ----------
+
+    def _heartbeat_loop(self, job_id: int, progress: ipc.JobProgress, done: threading.Event):
+        """定期更新心跳；执行进度有变化时每 PROGRESS_INTERVAL 秒保存一次"""
+        interval = max(1, self.settings.job_stale_seconds // 4)
+        last_beat = time.monotonic()
+        while not done.wait(PROGRESS_INTERVAL):
+            if not progress.dirty and time.monotonic() - last_beat < interval:
+                continue
+            db = SessionLocal()
+            try:
+                heartbeat(db, job_id, progress.to_dict() if progress.dirty else None)
+                last_beat = time.monotonic()
+            except Exception as e:
+                logger.warning(f"任务 #{job_id} 心跳失败: {e}")
+            finally:
+                db.close()
+
+    def _relay(self, job_id: int, line: str, progress: ipc.JobProgress):
+        """处理子进程的一行输出"""
+        event = ipc.parse_line(line)
+        if event is None:
+            # 第三方库直接写入的输出，只有错误级别的日志计入任务错误
+            line = line.rstrip()
+            if not line:
+                return
+            if ERROR_LINE_PATTERN.search(line):
+                logger.warning(f"[任务 #{job_id}] {line}")
+                progress.add_error(line)
+            else:
+                logger.debug(f"[任务 #{job_id}] {line}")
+            return
+        progress.apply(event)
+        if event["event"] == "log":
+            message = f"[任务 #{job_id}] {event.get('name')}:{event.get('function')}:{event.get('line')} - {event.get('message')}"
+            if event.get("exception"):
+                message += "\n" + event["exception"]
+            try:
+                logger.log(event.get("level", "INFO"), message)
+            except ValueError:
+                # 子进程的自定义日志级别
+                logger.info(message)
+
+    def _drain_stderr(self, job_id: int, stream, progress: ipc.JobProgress):
+        """读取子进程的 stderr（读取线程）"""
+        try:
+            for line in iter(lambda: stream.readline(LINE_LIMIT), ""):
+                line = line.rstrip()
+                if line:
+                    logger.warning(f"[任务 #{job_id}] {line}")
+                    progress.add_error(line)
+        except (OSError, ValueError) as e:
+            logger.debug(f"任务 #{job_id} stderr 读取结束: {e}")
+        finally:
+            stream.close()
+
+    def _stream(self, job_id: int, env: dict, timeout: float, progress: ipc.JobProgress) -> Optional[int]:
+        """
+        启动抓取子进程并逐行读取输出
+
+        Returns:
+            子进程返回码，超时返回 None（子进程已被结束）
+        """
+        process = subprocess.Popen(
+            SCRAPE_COMMAND,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+        )
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+        stderr_reader = threading.Thread(
+            target=self._drain_stderr, args=(job_id, process.stderr, progress), daemon=True
+        )
+        stderr_reader.start()
+        try:
+            for line in iter(lambda: process.stdout.readline(LINE_LIMIT), ""):
+                self._relay(job_id, line, progress)
+            returncode = process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            stderr_reader.join(STDERR_JOIN_TIMEOUT)
+        return None if timed_out.is_set() else returncode
+
+    def execute(self, job: ScrapeJob) -> str:
+        """在子进程中执行任务，返回结果状态（success/partial/skipped/failed）"""
+        env = os.environ.copy()
+        env["SCRAPE_DATASETS"] = job.datasets or ""
+        env[ipc.EVENTS_ENV] = "1"
+        if job.profile:
+            logger.info("本次抓取开启性能分析")
+            env["SCRAPE_PROFILE"] = "true"
+
+        status, returncode, error = "failed", None, None
+        timeout = job_timeout(job)
+        # 子进程据此安排各数据集的截止时间，在被强制结束前提交已抓取的数据集
+        env["SCRAPE_DEADLINE"] = str(time.time() + timeout)
+        progress = ipc.JobProgress()
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat_loop, args=(job.id, progress, done), daemon=True).start()
+        self.current_job = job.id
+
+        with span("scrape.job", parent=parse_traceparent(job.traceparent), root=True,
+                  attributes={"job.id": job.id, "job.datasets": job.datasets or "all"}) as job_span:
+            traceparent = current_traceparent()
+            if traceparent:
+                # 子进程延续本 trace
+                env["TRACEPARENT"] = traceparent
+            try:
+                # 使用 subprocess 执行抓取，彻底隔离环境
+                logger.info(f"执行抓取任务 #{job.id}（数据集: {job.datasets or '全部'}，超时 {timeout:.0f} 秒）")
+                returncode = self._stream(job.id, env, timeout, progress)
+
+                if returncode is None:
+                    logger.error(f"抓取任务 #{job.id} 超时（{timeout:.0f} 秒）")
+                    error = f"超时（{timeout:.0f} 秒）"
+                    job_span.record_error("超时")
+                elif returncode in EXIT_STATUSES:
+                    job_span.set_attribute("scrape.returncode", returncode)
+                    # success / partial（部分数据集成功）/ skipped（熔断中）
+                    status = EXIT_STATUSES[returncode]
+                    logger.info(f"抓取任务 #{job.id} 完成（{status}）")
+                    error = STATUS_MESSAGES.get(status)
+                else:
+                    job_span.set_attribute("scrape.returncode", returncode)
+                    logger.error(f"抓取任务 #{job.id} 失败，返回码: {returncode}")
+                    error = progress.error_tail(ERROR_TAIL) or f"返回码 {returncode}"
+                    job_span.record_error(f"返回码 {returncode}")
+
+            except Exception as e:
+                logger.error(f"抓取任务 #{job.id} 异常: {e}")
+                error = str(e)
+                job_span.record_error(e)
+            finally:
+                done.set()
+                self.current_job = None
+
+        db = SessionLocal()
+        try:
+            finish_job(db, job.id, status, returncode=returncode, error_message=error,
+                       progress=progress.to_dict())
+        finally:
+            db.close()
+        if self.on_finished is not None:
+            try:
+                self.on_finished(job, status)
+            except Exception as e:
+                logger.warning(f"任务完成回调失败: {e}")
+        return status
+
+    def run_once(self) -> bool:
+        """领取并执行一个任务，没有任务时返回 False"""
+        db = SessionLocal()
+        try:
+            expire_jobs(db, self.settings.job_stale_seconds)
+            job = claim_job(db, self.worker_id)
+        finally:
+            db.close()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def run(self):
+        """持续领取任务直到 stop()"""
+        logger.info(f"抓取 worker 已启动（{self.worker_id}）")
+        while not self._stopped.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"领取抓取任务失败: {e}")
+                self._stopped.wait(self.settings.job_poll_interval)
+                continue
+            self._wait()
+        self._close_listen()
+        logger.info(f"抓取 worker 已停止（{self.worker_id}）")
+
+    def start(self):
+        """在后台线程中运行（API 进程内置 worker）"""
+        self._thread = threading.Thread(target=self.run, name="scrape-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止领取新任务（正在执行的任务继续完成）"""
+        self._stopped.set()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="抓取 worker")
+    parser.add_argument("--once", action="store_true", help="只执行一个任务")
+    args = parser.parse_args(argv)
+
+    worker = ScrapeWorker()
+    if args.once:
+        return 0 if worker.run_once() else 1
+
+    def handle_signal(signum, frame):
+        logger.info("收到退出信号，当前任务结束后退出")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
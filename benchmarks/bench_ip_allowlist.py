@@ -0,0 +1,74 @@
+"""
+IP 白名单查找基准
+
+生成不同条目数（单个地址与 CIDR 网段混合，IPv4 / IPv6）的白名单，对比编译后
+的区间查找与原先的列表逐项比较，确认单次请求开销不随条目数增长。
+
+用法:
+    python -m benchmarks.bench_ip_allowlist
+    python -m benchmarks.bench_ip_allowlist --sizes 10,1000,10000 --lookups 200000
+"""
+
+import argparse
+import ipaddress
+import random
+import time
+
+from app.ip_allowlist import IPAllowlist
+
+
+def build_entries(size: int, rng: random.Random) -> list:
+    """约一半单个地址、四分之一 IPv4 网段、四分之一 IPv6 网段"""
+    entries = []
+    for i in range(size):
+        kind = i % 4
+        if kind < 2:
+            entries.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+        elif kind == 2:
+            prefix = rng.choice([16, 20, 24, 28])
+            entries.append(str(ipaddress.ip_network(f"{ipaddress.IPv4Address(rng.getrandbits(32))}/{prefix}", strict=False)))
+        else:
+            entries.append(str(ipaddress.ip_network(f"{ipaddress.IPv6Address(rng.getrandbits(128))}/48", strict=False)))
+    return entries
+
+
+def build_probes(entries: list, count: int, rng: random.Random) -> list:
+    """一半命中白名单中的单个地址，一半随机地址"""
+    singles = [entry for entry in entries if "/" not in entry] or ["127.0.0.1"]
+    return [
+        rng.choice(singles) if i % 2 else str(ipaddress.IPv4Address(rng.getrandbits(32)))
+        for i in range(count)
+    ]
+
+
+def per_lookup_ns(check, probes: list) -> float:
+    start = time.perf_counter()
+    for ip in probes:
+        check(ip)
+    return (time.perf_counter() - start) / len(probes) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IP 白名单查找基准")
+    parser.add_argument("--sizes", default="10,100,1000,5000,20000", help="白名单条目数，逗号分隔")
+    parser.add_argument("--lookups", type=int, default=100000, help="每组查找次数")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'条目数':>8} {'编译(ms)':>10} {'区间查找(ns)':>14} {'列表比较(ns)':>14}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        entries = build_entries(size, rng)
+        probes = build_probes(entries, args.lookups, rng)
+
+        start = time.perf_counter()
+        allowlist = IPAllowlist(entries)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        compiled = per_lookup_ns(allowlist.is_allowed, probes)
+        # 原实现：精确字符串列表逐项比较（不支持网段）
+        linear = per_lookup_ns(entries.__contains__, probes[:max(1000, args.lookups // 100)])
+        print(f"{size:>8} {compile_ms:>10.1f} {compiled:>14.0f} {linear:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
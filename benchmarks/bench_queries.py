@@ -0,0 +1,164 @@
+"""
+筛选/排序 DSL 查询基准
+
+对 LOFData / QDIIData / LOFIndexData 执行典型的 DSL 查询，输出耗时与执行计划
+中使用的扫描方式，用于确认推荐索引（migrations/010_add_query_indexes.sql）生效。
+
+用法:
+    # 使用 DATABASE_URL 中的现有数据（只读）
+    python -m benchmarks.bench_queries
+
+    # 在临时 schema 中生成 N 行/表的合成数据后测试（结束后删除）
+    python -m benchmarks.bench_queries --synthetic 50000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.models import LOFData, QDIIData, LOFIndexData
+from app.api.query import ListQuery, order_clauses, paginate, select_columns
+
+BENCH_SCHEMA = "bench_queries"
+
+# (名称, 模型, DSL 参数, 字段投影, 每页条数)
+CASES = [
+    ("lof 默认排序 首页", LOFData, {}, ("fund_code", "fund_name", "premium_rate"), 50),
+    ("lof 溢价区间+公司", LOFData,
+     {"premium_min": 3, "premium_max": 10, "fund_company": "华夏,易方达"}, None, 50),
+    ("lof 标签", LOFData, {"tag": "T+0"}, ("fund_code", "fund_tags"), 50),
+    ("lof 成交额倒序", LOFData, {"volume_min": 100, "sort": "-volume"}, None, 50),
+    ("qdii 涨跌幅区间", QDIIData, {"change_pct_min": -1, "change_pct_max": 1}, None, 50),
+    ("qdii 多列排序", QDIIData, {"sort": "fund_company,-premium"}, None, 50),
+    ("index 溢价率下限", LOFIndexData, {"premium_min": 5}, ("fund_code", "premium_rate"), 50),
+    ("index 全量", LOFIndexData, {}, None, None),
+]
+
+COMPANIES = ["华夏", "易方达", "国投", "南方", "嘉实", "广发", "博时", "招商"]
+
+
+def build_list_query(params: dict) -> ListQuery:
+    """以普通参数构造 ListQuery（绕过 FastAPI 依赖注入）"""
+    names = (
+        "premium_min", "premium_max", "volume_min", "volume_max",
+        "change_pct_min", "change_pct_max", "fund_company", "tag", "sort",
+    )
+    return ListQuery(**{name: params.get(name) for name in names})
+
+
+def seed_synthetic(db: Session, rows: int):
+    """生成合成数据"""
+    rng = random.Random(42)
+    for i in range(rows):
+        premium = Decimal(f"{rng.uniform(-10, 40):.3f}")
+        change = Decimal(f"{rng.uniform(-10, 10):.3f}")
+        volume = Decimal(f"{rng.uniform(0, 50000):.2f}")
+        company = rng.choice(COMPANIES)
+        db.add(LOFData(
+            fund_code=f"{i:06d}", fund_name=f"LOF{i}",
+            fund_tags=rng.choice([None, "T+0", "QD", "T+0,QD"]),
+            premium_rate=premium, change_pct=change, amount=volume,
+            fund_company=company, apply_status=rng.choice(["open", "limited", "suspended"]),
+        ))
+        for model in (QDIIData, LOFIndexData):
+            db.add(model(
+                fund_code=f"{i:06d}", fund_name=f"{model.__name__}{i}",
+                premium_rate_value=premium if rng.random() > 0.05 else None,
+                change_pct_value=change, volume_value=volume, fund_company=company,
+            ))
+        if i % 5000 == 0:
+            db.flush()
+    db.commit()
+    for table in ("lof_data", "qdii_data", "lof_index_data"):
+        db.execute(text(f"ANALYZE {table}"))
+
+
+def scan_types(plan: dict) -> set:
+    """提取执行计划中的扫描节点类型"""
+    found = set()
+    if "Scan" in plan.get("Node Type", ""):
+        found.add(f"{plan['Node Type']}({plan.get('Index Name') or plan.get('Relation Name')})")
+    for child in plan.get("Plans", []):
+        found |= scan_types(child)
+    return found
+
+
+def run_case(db: Session, model, params: dict, fields, limit, repeat: int):
+    list_query = build_list_query(params)
+    sort_keys = list_query.sort_keys(model)
+
+    def build():
+        query = db.query(*select_columns(model, fields, sort_keys))
+        return query.filter(*list_query.filters(model))
+
+    timings = []
+    rows = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows, _ = paginate(build(), sort_keys, limit, None)
+        [model.serialize(row, fields) for row in rows]
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # 执行计划
+    query = build()
+    query = query.order_by(*order_clauses(sort_keys))
+    if limit:
+        query = query.limit(limit + 1)
+    sql = query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+
+    return {
+        "rows": len(rows),
+        "p50_ms": statistics.median(timings),
+        "max_ms": max(timings),
+        "db_ms": plan[0]["Execution Time"],
+        "scans": ", ".join(sorted(scan_types(plan[0]["Plan"]))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="筛选/排序 DSL 查询基准")
+    parser.add_argument("--synthetic", type=int, default=0, help="在临时 schema 中生成 N 行/表合成数据")
+    parser.add_argument("--repeat", type=int, default=20, help="每个用例重复次数")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        if args.synthetic:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+            conn.execute(text(f"SET search_path TO {BENCH_SCHEMA}"))
+            Base.metadata.create_all(
+                bind=conn, tables=[LOFData.__table__, QDIIData.__table__, LOFIndexData.__table__]
+            )
+            conn.commit()
+
+        db = Session(bind=conn)
+        try:
+            if args.synthetic:
+                print(f"生成合成数据: {args.synthetic} 行/表 ...")
+                seed_synthetic(db, args.synthetic)
+
+            print(f"{'用例':<20} {'行数':>6} {'p50(ms)':>9} {'max(ms)':>9} {'DB(ms)':>8}  扫描方式")
+            for name, model, params, fields, limit in CASES:
+                result = run_case(db, model, params, fields, limit, args.repeat)
+                print(
+                    f"{name:<20} {result['rows']:>6} {result['p50_ms']:>9.2f} "
+                    f"{result['max_ms']:>9.2f} {result['db_ms']:>8.2f}  {result['scans']}"
+                )
+        finally:
+            db.close()
+            if args.synthetic:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+                conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+API 启动基准
+
+- 导入: 在全新子进程中导入 app.main，输出导入耗时、已加载模块数，以及是否加载了
+  Playwright / 抓取代码（API 进程不应加载）
+- 首个请求: 用 uvicorn 启动服务（含 lifespan 中的 init_db、调度器启动），
+  从启动进程到 /healthz 首次返回 200 的时间，以及此时的 RSS
+
+需要可连接的 DATABASE_URL（与服务相同的环境变量）。服务在首个请求后即被终止，
+不会执行抓取。
+
+用法:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({
+    "import_ms": (time.perf_counter() - start) * 1000,
+    "modules": len(sys.modules),
+    "playwright": any(name.startswith("playwright") for name in sys.modules),
+    "scraper": "app.scraper" in sys.modules,
+}))
+"""
+
+
+def probe_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def probe_first_request(timeout: float = 60) -> dict:
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(server.stderr.read().decode()[-2000:])
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as response:
+                    if response.status == 200:
+                        return {
+                            "first_request_ms": (time.perf_counter() - start) * 1000,
+                            "rss_mb": _rss_mb(server.pid),
+                        }
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("服务启动超时")
+    finally:
+        server.kill()
+        server.wait()
+
+
+def _report(name: str, values):
+    print(f"{name:>18}: 中位数 {statistics.median(values):>9.1f}  最小 {min(values):>9.1f}  最大 {max(values):>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 启动基准")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数（取中位数）")
+    args = parser.parse_args()
+
+    imports = [probe_import() for _ in range(args.runs)]
+    servers = [probe_first_request() for _ in range(args.runs)]
+    _report("import_ms", [item["import_ms"] for item in imports])
+    _report("modules", [item["modules"] for item in imports])
+    _report("first_request_ms", [item["first_request_ms"] for item in servers])
+    _report("rss_mb", [item["rss_mb"] for item in servers])
+    print(f"{'playwright 已加载':>18}: {imports[-1]['playwright']}")
+    print(f"{'app.scraper 已加载':>18}: {imports[-1]['scraper']}")
+
+
+if __name__ == "__main__":
+    main()
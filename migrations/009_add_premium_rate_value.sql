@@ -0,0 +1,22 @@
+-- 为 qdii_data / lof_index_data 添加溢价率数值列（用于排序与游标分页）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/009_add_premium_rate_value.sql
+
+-- qdii_data（来源: rt_premium_rate）
+ALTER TABLE qdii_data ADD COLUMN IF NOT EXISTS premium_rate_value NUMERIC(10, 3);
+COMMENT ON COLUMN qdii_data.premium_rate_value IS '实时溢价率数值(%)';
+
+UPDATE qdii_data
+SET premium_rate_value = CAST(REPLACE(rt_premium_rate, '%', '') AS NUMERIC)
+WHERE premium_rate_value IS NULL AND rt_premium_rate ~ '^-?[0-9]+(\.[0-9]+)?%?$';
+
+-- lof_index_data（来源: premium_rate）
+ALTER TABLE lof_index_data ADD COLUMN IF NOT EXISTS premium_rate_value NUMERIC(10, 3);
+COMMENT ON COLUMN lof_index_data.premium_rate_value IS '溢价率数值(%)';
+
+UPDATE lof_index_data
+SET premium_rate_value = CAST(REPLACE(premium_rate, '%', '') AS NUMERIC)
+WHERE premium_rate_value IS NULL AND premium_rate ~ '^-?[0-9]+(\.[0-9]+)?%?$';
+
+-- 游标分页索引（与 ORDER BY ... DESC NULLS LAST, id 一致）
+CREATE INDEX IF NOT EXISTS ix_qdii_data_premium_rate_value ON qdii_data (premium_rate_value DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_lof_index_data_premium_rate_value ON lof_index_data (premium_rate_value DESC NULLS LAST, id);
@@ -0,0 +1,52 @@
+-- 筛选/排序 DSL 所需的数值列与推荐索引
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/010_add_query_indexes.sql
+
+-- 1. qdii_data / lof_index_data 数值列（由原始文本解析）
+ALTER TABLE qdii_data ADD COLUMN IF NOT EXISTS change_pct_value NUMERIC(10, 3);
+ALTER TABLE qdii_data ADD COLUMN IF NOT EXISTS volume_value NUMERIC(15, 2);
+COMMENT ON COLUMN qdii_data.change_pct_value IS '涨幅数值(%)';
+COMMENT ON COLUMN qdii_data.volume_value IS '成交额数值(万元)';
+
+ALTER TABLE lof_index_data ADD COLUMN IF NOT EXISTS change_pct_value NUMERIC(10, 3);
+ALTER TABLE lof_index_data ADD COLUMN IF NOT EXISTS volume_value NUMERIC(15, 2);
+COMMENT ON COLUMN lof_index_data.change_pct_value IS '涨幅数值(%)';
+COMMENT ON COLUMN lof_index_data.volume_value IS '成交额数值(万元)';
+
+UPDATE qdii_data
+SET change_pct_value = CAST(REPLACE(change_pct, '%', '') AS NUMERIC)
+WHERE change_pct_value IS NULL AND change_pct ~ '^-?[0-9]+(\.[0-9]+)?%?$';
+
+UPDATE qdii_data
+SET volume_value = CAST(volume AS NUMERIC)
+WHERE volume_value IS NULL AND volume ~ '^-?[0-9]+(\.[0-9]+)?$';
+
+UPDATE lof_index_data
+SET change_pct_value = CAST(REPLACE(change_pct, '%', '') AS NUMERIC)
+WHERE change_pct_value IS NULL AND change_pct ~ '^-?[0-9]+(\.[0-9]+)?%?$';
+
+UPDATE lof_index_data
+SET volume_value = CAST(volume AS NUMERIC)
+WHERE volume_value IS NULL AND volume ~ '^-?[0-9]+(\.[0-9]+)?$';
+
+-- 2. 推荐索引（排序列与 ORDER BY ... DESC NULLS LAST, id 一致，范围筛选也可复用）
+-- lof_data（volume 对应 amount 列）
+CREATE INDEX IF NOT EXISTS ix_lof_data_amount ON lof_data (amount DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_lof_data_change_pct ON lof_data (change_pct DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_lof_data_fund_company ON lof_data (fund_company);
+CREATE INDEX IF NOT EXISTS ix_lof_data_apply_status ON lof_data (apply_status);
+-- 标签筛选: string_to_array(fund_tags, ',') @> ARRAY[...]
+CREATE INDEX IF NOT EXISTS ix_lof_data_fund_tags ON lof_data USING gin (string_to_array(fund_tags, ','));
+
+-- qdii_data
+CREATE INDEX IF NOT EXISTS ix_qdii_data_change_pct_value ON qdii_data (change_pct_value DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_qdii_data_volume_value ON qdii_data (volume_value DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_qdii_data_fund_company ON qdii_data (fund_company);
+
+-- lof_index_data
+CREATE INDEX IF NOT EXISTS ix_lof_index_data_change_pct_value ON lof_index_data (change_pct_value DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_lof_index_data_volume_value ON lof_index_data (volume_value DESC NULLS LAST, id);
+CREATE INDEX IF NOT EXISTS ix_lof_index_data_fund_company ON lof_index_data (fund_company);
+
+ANALYZE lof_data;
+ANALYZE qdii_data;
+ANALYZE lof_index_data;
@@ -0,0 +1,46 @@
+-- 溢价率历史表（每次发布快照时追加，按 HISTORY_RETENTION_DAYS 清理）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/011_add_premium_history.sql
+
+CREATE TABLE IF NOT EXISTS premium_history (
+    id BIGSERIAL PRIMARY KEY,
+    version INTEGER NOT NULL,
+    recorded_at TIMESTAMP NOT NULL,
+    dataset VARCHAR(20) NOT NULL,
+    fund_code VARCHAR(20) NOT NULL,
+    premium_rate NUMERIC(10, 3),
+    price NUMERIC(10, 4),
+    nav NUMERIC(10, 4)
+);
+
+COMMENT ON TABLE premium_history IS '溢价率历史';
+COMMENT ON COLUMN premium_history.version IS '快照版本(抓取日志 id)';
+COMMENT ON COLUMN premium_history.recorded_at IS '记录时间';
+COMMENT ON COLUMN premium_history.dataset IS '数据集: lof/qdii/lof_index';
+COMMENT ON COLUMN premium_history.fund_code IS '基金代码';
+COMMENT ON COLUMN premium_history.premium_rate IS '溢价率(%)';
+COMMENT ON COLUMN premium_history.price IS '场内价格';
+COMMENT ON COLUMN premium_history.nav IS '基金净值';
+
+-- 单只基金按时间范围查询
+CREATE INDEX IF NOT EXISTS ix_premium_history_fund_time ON premium_history (fund_code, dataset, recorded_at);
+
+-- 按保留期清理
+CREATE INDEX IF NOT EXISTS ix_premium_history_recorded_at ON premium_history (recorded_at);
+
+-- 日汇总表（发布快照时重新汇总当日数据，用于长时间范围查询）
+CREATE TABLE IF NOT EXISTS premium_history_daily (
+    fund_code VARCHAR(20) NOT NULL,
+    dataset VARCHAR(20) NOT NULL,
+    day DATE NOT NULL,
+    premium_rate NUMERIC(10, 3),
+    price NUMERIC(10, 4),
+    nav NUMERIC(10, 4),
+    sample_count INTEGER NOT NULL,
+    PRIMARY KEY (fund_code, dataset, day)
+);
+
+COMMENT ON TABLE premium_history_daily IS '溢价率日汇总';
+COMMENT ON COLUMN premium_history_daily.premium_rate IS '当日平均溢价率(%)';
+COMMENT ON COLUMN premium_history_daily.price IS '当日平均价格';
+COMMENT ON COLUMN premium_history_daily.nav IS '当日平均净值';
+COMMENT ON COLUMN premium_history_daily.sample_count IS '当日记录数';
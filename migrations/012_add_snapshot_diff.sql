@@ -0,0 +1,35 @@
+-- 快照差异表（发布快照时保存相对上一版本的变化行，用于 /api/changes 增量同步）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/012_add_snapshot_diff.sql
+
+CREATE TABLE IF NOT EXISTS snapshot_diff (
+    version INTEGER PRIMARY KEY,
+    previous_version INTEGER,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+COMMENT ON TABLE snapshot_diff IS '快照差异记录';
+COMMENT ON COLUMN snapshot_diff.version IS '快照版本(抓取日志 id)';
+COMMENT ON COLUMN snapshot_diff.previous_version IS '上一快照版本';
+COMMENT ON COLUMN snapshot_diff.created_at IS '创建时间';
+
+-- 按保留期清理
+CREATE INDEX IF NOT EXISTS ix_snapshot_diff_created_at ON snapshot_diff (created_at);
+
+CREATE TABLE IF NOT EXISTS snapshot_change (
+    id BIGSERIAL PRIMARY KEY,
+    version INTEGER NOT NULL,
+    dataset VARCHAR(20) NOT NULL,
+    fund_code VARCHAR(20) NOT NULL,
+    op VARCHAR(10) NOT NULL,
+    row JSONB
+);
+
+COMMENT ON TABLE snapshot_change IS '快照变化的行';
+COMMENT ON COLUMN snapshot_change.version IS '快照版本';
+COMMENT ON COLUMN snapshot_change.dataset IS '数据集: lof/qdii/lof_index';
+COMMENT ON COLUMN snapshot_change.fund_code IS '基金代码';
+COMMENT ON COLUMN snapshot_change.op IS 'upsert/remove';
+COMMENT ON COLUMN snapshot_change.row IS '变化后的行（与列表接口格式一致），删除时为空';
+
+-- 按数据集拉取某版本之后的变化
+CREATE INDEX IF NOT EXISTS ix_snapshot_change_dataset_version ON snapshot_change (dataset, version);
@@ -0,0 +1,8 @@
+-- 抓取日志增加分阶段耗时与各数据集记录数
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/013_add_scrape_log_phases.sql
+
+ALTER TABLE scrape_log ADD COLUMN IF NOT EXISTS phases JSON;
+ALTER TABLE scrape_log ADD COLUMN IF NOT EXISTS dataset_counts JSON;
+
+COMMENT ON COLUMN scrape_log.phases IS '各阶段耗时(秒)';
+COMMENT ON COLUMN scrape_log.dataset_counts IS '各数据集抓取记录数';
@@ -0,0 +1,11 @@
+-- 表结构指纹（启动时与模型一致则跳过 create_all；应用本文件后首次启动会写入）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/014_add_schema_fingerprint.sql
+
+CREATE TABLE IF NOT EXISTS schema_fingerprint (
+    id INTEGER PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP DEFAULT NOW()
+);
+
+COMMENT ON COLUMN schema_fingerprint.fingerprint IS '模型 DDL 的 SHA-256';
+COMMENT ON COLUMN schema_fingerprint.applied_at IS '应用时间';
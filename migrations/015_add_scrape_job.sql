@@ -0,0 +1,41 @@
+-- 抓取任务队列（调度器或 API 入队，app.worker 用 FOR UPDATE SKIP LOCKED 领取）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/015_add_scrape_job.sql
+
+CREATE TABLE IF NOT EXISTS scrape_job (
+    id SERIAL PRIMARY KEY,
+    datasets VARCHAR(100),
+    priority INTEGER NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    source VARCHAR(20) NOT NULL DEFAULT 'schedule',
+    profile BOOLEAN NOT NULL DEFAULT FALSE,
+    traceparent VARCHAR(55),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    deadline TIMESTAMP,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    worker VARCHAR(100),
+    returncode INTEGER,
+    error_message TEXT
+);
+
+COMMENT ON TABLE scrape_job IS '抓取任务队列';
+COMMENT ON COLUMN scrape_job.datasets IS '数据集范围，逗号分隔，空为全部';
+COMMENT ON COLUMN scrape_job.priority IS '优先级，越大越先执行';
+COMMENT ON COLUMN scrape_job.status IS '状态: queued/running/success/failed/expired';
+COMMENT ON COLUMN scrape_job.source IS '来源: schedule/api';
+COMMENT ON COLUMN scrape_job.profile IS '是否做性能分析';
+COMMENT ON COLUMN scrape_job.traceparent IS '入队时的 trace 上下文';
+COMMENT ON COLUMN scrape_job.created_at IS '入队时间';
+COMMENT ON COLUMN scrape_job.deadline IS '截止时间，未在此前完成则过期/超时';
+COMMENT ON COLUMN scrape_job.started_at IS '开始执行时间';
+COMMENT ON COLUMN scrape_job.heartbeat_at IS 'worker 最近心跳时间';
+COMMENT ON COLUMN scrape_job.finished_at IS '结束时间';
+COMMENT ON COLUMN scrape_job.worker IS '执行的 worker（主机名:PID）';
+COMMENT ON COLUMN scrape_job.returncode IS '抓取子进程返回码';
+COMMENT ON COLUMN scrape_job.error_message IS '错误信息';
+
+CREATE INDEX IF NOT EXISTS ix_scrape_job_created_at ON scrape_job (created_at);
+
+-- 领取顺序：只索引排队中的任务
+CREATE INDEX IF NOT EXISTS ix_scrape_job_queue ON scrape_job (priority DESC, id) WHERE status = 'queued';
@@ -0,0 +1,8 @@
+-- 抓取日志按数据集记录（各数据集独立调度，每次抓取每个数据集一条日志）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/016_add_scrape_log_dataset.sql
+
+ALTER TABLE scrape_log ADD COLUMN IF NOT EXISTS dataset VARCHAR(20);
+
+CREATE INDEX IF NOT EXISTS ix_scrape_log_dataset_time ON scrape_log (dataset, scrape_time);
+
+COMMENT ON COLUMN scrape_log.dataset IS '数据集: lof/qdii/lof_index（旧记录为空，表示全部）';
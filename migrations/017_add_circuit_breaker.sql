@@ -0,0 +1,22 @@
+-- 抓取熔断器、抓取日志的尝试次数与任务的 partial/skipped 状态
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/017_add_circuit_breaker.sql
+
+CREATE TABLE IF NOT EXISTS circuit_breaker (
+    name VARCHAR(50) PRIMARY KEY,
+    failures INTEGER NOT NULL DEFAULT 0,
+    cooldown_seconds INTEGER,
+    opened_until TIMESTAMP,
+    last_error TEXT,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE scrape_log ADD COLUMN IF NOT EXISTS attempts INTEGER;
+
+COMMENT ON COLUMN circuit_breaker.name IS '熔断器名称';
+COMMENT ON COLUMN circuit_breaker.failures IS '连续失败次数';
+COMMENT ON COLUMN circuit_breaker.cooldown_seconds IS '当前冷却时间(秒)，熔断后每次试探失败加倍';
+COMMENT ON COLUMN circuit_breaker.opened_until IS '熔断截止时间，为空表示未熔断';
+COMMENT ON COLUMN circuit_breaker.last_error IS '最近一次失败原因';
+COMMENT ON COLUMN circuit_breaker.updated_at IS '更新时间';
+COMMENT ON COLUMN scrape_log.attempts IS '尝试次数（含重试）';
+COMMENT ON COLUMN scrape_job.status IS '状态: queued/running/success/partial/skipped/failed/expired';
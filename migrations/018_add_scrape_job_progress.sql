@@ -0,0 +1,6 @@
+-- 抓取任务的执行进度（worker 读取抓取子进程的事件流后定期保存）
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/018_add_scrape_job_progress.sql
+
+ALTER TABLE scrape_job ADD COLUMN IF NOT EXISTS progress JSON;
+
+COMMENT ON COLUMN scrape_job.progress IS '执行进度（当前阶段、各数据集结果）';
@@ -0,0 +1,47 @@
+-- 抓取运行记录（一次抓取一条），抓取日志通过 run_id 关联到所属运行
+-- 执行方式: psql -U lof -d lof_monitor -f migrations/019_add_scrape_run.sql
+
+CREATE TABLE IF NOT EXISTS scrape_run (
+    id SERIAL PRIMARY KEY,
+    started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    datasets VARCHAR(100),
+    record_count INTEGER NOT NULL DEFAULT 0,
+    duration_seconds NUMERIC(6, 2),
+    phases JSON,
+    error_message TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_scrape_run_finished_at ON scrape_run (finished_at);
+
+ALTER TABLE scrape_log ADD COLUMN IF NOT EXISTS run_id INTEGER;
+CREATE INDEX IF NOT EXISTS ix_scrape_log_run_id ON scrape_log (run_id);
+
+-- 回填：已有日志按抓取时间归为运行（同一次发布的日志抓取时间相同）；
+-- 旧日志的 phases 含公共阶段，对应运行记录的 phases 留空
+INSERT INTO scrape_run (started_at, finished_at, status, record_count, duration_seconds)
+SELECT scrape_time,
+       scrape_time,
+       CASE WHEN bool_and(status = 'success') THEN 'success'
+            WHEN bool_or(status = 'success') THEN 'partial'
+            ELSE 'failed' END,
+       COALESCE(SUM(record_count) FILTER (WHERE status = 'success'), 0),
+       MAX(duration_seconds)
+FROM scrape_log
+WHERE run_id IS NULL AND scrape_time IS NOT NULL
+GROUP BY scrape_time;
+
+UPDATE scrape_log l SET run_id = r.id
+FROM scrape_run r
+WHERE l.run_id IS NULL AND r.phases IS NULL AND r.started_at = l.scrape_time AND r.finished_at = l.scrape_time;
+
+COMMENT ON COLUMN scrape_run.started_at IS '开始时间';
+COMMENT ON COLUMN scrape_run.finished_at IS '结束时间，为空表示执行中或进程被结束';
+COMMENT ON COLUMN scrape_run.status IS '状态: running/success/partial/failed';
+COMMENT ON COLUMN scrape_run.datasets IS '数据集范围，逗号分隔，空为全部';
+COMMENT ON COLUMN scrape_run.record_count IS '成功数据集的记录数之和';
+COMMENT ON COLUMN scrape_run.duration_seconds IS '总耗时(秒)';
+COMMENT ON COLUMN scrape_run.phases IS '公共阶段耗时(秒)';
+COMMENT ON COLUMN scrape_run.error_message IS '最近一次错误';
+COMMENT ON COLUMN scrape_log.run_id IS '所属抓取运行 (scrape_run.id)';